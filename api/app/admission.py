@@ -0,0 +1,105 @@
+"""
+Admission control for generation jobs
+
+Rejects new jobs before any credit is deducted when the user already has too
+many live (paid or free lane) jobs in flight, or when the shared work queue
+is so deep that the job would wait longer than we are willing to promise.
+"""
+from fastapi import HTTPException, status
+import logging
+import math
+import time
+
+from config import (
+    ADMISSION_MAX_ACTIVE_JOBS_PER_USER,
+    ADMISSION_MAX_QUEUE_DEPTH,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_QUEUE_DEPTH_CACHE_SECONDS,
+    ESTIMATED_JOB_SECONDS,
+    WORKER_PARALLELISM
+)
+from app.utils.firestore import count_jobs
+
+logger = logging.getLogger(__name__)
+
+# Lanes counted against a user's active-job limit. Bulk jobs (worker/bulk.py)
+# run under real users' IDs but must not lock them out of live generation
+LIVE_LANES = ["paid", "free"]
+
+# Cached global queue depth: (monotonic timestamp, depth)
+_queue_depth_cache = (0.0, 0)
+
+
+def estimate_queue_wait_seconds(queue_depth: int) -> int:
+    """Seconds a newly queued job waits before a worker picks it up"""
+    return math.ceil(queue_depth / WORKER_PARALLELISM) * ESTIMATED_JOB_SECONDS
+
+
+async def get_queue_depth() -> int:
+    """
+    Number of queued jobs across all users
+
+    The aggregation query is cached for ADMISSION_QUEUE_DEPTH_CACHE_SECONDS so
+    bursts of requests don't each pay for a count.
+    """
+    global _queue_depth_cache
+
+    fetched_at, depth = _queue_depth_cache
+    if time.monotonic() - fetched_at < ADMISSION_QUEUE_DEPTH_CACHE_SECONDS:
+        return depth
+
+    depth = await count_jobs(["queued"])
+    _queue_depth_cache = (time.monotonic(), depth)
+    return depth
+
+
+def _record_admitted() -> None:
+    """Account for a job we just admitted until the next cache refresh"""
+    global _queue_depth_cache
+    fetched_at, depth = _queue_depth_cache
+    _queue_depth_cache = (fetched_at, depth + 1)
+
+
+async def admit_job(user_id: str) -> int:
+    """
+    Decide whether a new generation job may be queued
+
+    Args:
+        user_id: Firebase user ID
+
+    Returns:
+        Estimated seconds until the job's result is ready
+
+    Raises:
+        HTTPException: 429 if the user has too many active jobs,
+            503 if the queue is saturated (both with Retry-After)
+    """
+    try:
+        active_jobs = await count_jobs(["queued", "processing"], user_id=user_id, lanes=LIVE_LANES)
+        queue_depth = await get_queue_depth()
+    except Exception as e:
+        # Fail open - a broken count must not take generation down with it
+        logger.warning(f"Admission check unavailable, admitting job: {str(e)}")
+        return ESTIMATED_JOB_SECONDS
+
+    if active_jobs >= ADMISSION_MAX_ACTIVE_JOBS_PER_USER:
+        logger.info(f"Rejecting job for user {user_id}: {active_jobs} jobs already active")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"You already have {active_jobs} avatars generating. Please wait for one to finish.",
+            headers={"Retry-After": str(ESTIMATED_JOB_SECONDS)}
+        )
+
+    queue_wait = estimate_queue_wait_seconds(queue_depth)
+
+    if queue_depth >= ADMISSION_MAX_QUEUE_DEPTH or queue_wait > ADMISSION_MAX_WAIT_SECONDS:
+        logger.warning(f"Rejecting job for user {user_id}: queue depth {queue_depth}, estimated wait {queue_wait}s")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="We're generating a lot of avatars right now. Please try again shortly.",
+            headers={"Retry-After": str(max(1, min(queue_wait, ADMISSION_MAX_WAIT_SECONDS)))}
+        )
+
+    _record_admitted()
+
+    return queue_wait + ESTIMATED_JOB_SECONDS
@@ -2,7 +2,7 @@
 Pydantic models for API requests and responses
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List, Literal
+from typing import Optional, List, Dict, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -29,6 +29,7 @@ class GenerateResponse(BaseModel):
     job_id: str
     status: JobStatus
     message: str = "Job created successfully"
+    estimated_wait_seconds: Optional[int] = None  # Until the result should be ready
 
 
 # Job Endpoint Models
@@ -38,7 +39,13 @@ class JobMetadata(BaseModel):
     generated_prompt: Optional[str] = None
     style: str = "lego"
     processing_time_ms: Optional[int] = None
+    model: Optional[str] = None  # Image model that produced the avatar
+    provider: Optional[str] = None  # Worker image provider (gpt_reference, claude_dalle, ...)
     avatar_url: Optional[str] = None  # Isolated avatar for customization
+    renditions: Optional[Dict[str, str]] = None  # Height (px) -> URL of a pixel-exact PNG rendition
+    thumbnail_url: Optional[str] = None  # Small WebP for job lists
+    avatar_webp_url: Optional[str] = None  # Lossless WebP copy of the avatar (small encoding profile)
+    sprite_url: Optional[str] = None  # True-resolution indexed sprite (when a pixel grid was found)
 
 
 class JobResponse(BaseModel):
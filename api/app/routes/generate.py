@@ -6,23 +6,30 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
 from fastapi.responses import JSONResponse
 import logging
 import uuid
+from typing import Optional
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 from config import (
     PROJECT_ID,
     GCS_UPLOAD_BUCKET,
-    PUBSUB_TOPIC,
+    PUBSUB_LANE_TOPICS,
     MAX_UPLOAD_SIZE,
     ALLOWED_EXTENSIONS,
-    ALLOWED_MIME_TYPES,
-    FREE_CREDITS
+    ALLOWED_MIME_TYPES
 )
 from app.models.schemas import GenerateResponse, JobStatus
-from app.utils.firestore import get_user, create_job, increment_user_usage
+from app.utils.firestore import (
+    create_job,
+    deduct_credit,
+    refund_credit,
+    InsufficientCreditsError,
+    CreditContentionError
+)
 from app.utils.gcs import upload_to_gcs
 from app.utils.pubsub import publish_job
 from app.auth import get_current_user
+from app.admission import admit_job
 
 logger = logging.getLogger(__name__)
 
@@ -57,12 +64,16 @@ def validate_image_file(file: UploadFile) -> None:
         )
 
 
-async def check_and_deduct_credit(user_id: str) -> dict:
+async def check_and_deduct_credit(user_id: str, job_id: Optional[str] = None) -> dict:
     """
     Check if user has available credits and deduct one
 
+    The check and the deduction run in a single Firestore transaction and are
+    recorded in the credit ledger against the job.
+
     Args:
         user_id: Firebase user ID
+        job_id: Job being paid for (a new ID is generated if omitted)
 
     Returns:
         dict with "has_watermark" boolean (True if using free credit)
@@ -70,42 +81,24 @@ async def check_and_deduct_credit(user_id: str) -> dict:
     Raises:
         HTTPException if no credits available
     """
-    user = await get_user(user_id)
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    credits = user.get("credits", 0)
-    free_credits_used = user.get("free_credits_used", 0)
-
-    # Check if user has paid credits
-    if credits > 0:
-        # Deduct paid credit (no watermark)
-        from app.utils.firestore import db
-        db.collection("users").document(user_id).update({
-            "credits": credits - 1,
-            "total_generated": user.get("total_generated", 0) + 1
-        })
-        logger.info(f"Deducted 1 paid credit from user {user_id}. Remaining: {credits - 1}")
-        return {"has_watermark": False}
-
-    # Check if user has free credits available
-    elif free_credits_used < FREE_CREDITS:
-        # Use free credit (with watermark)
-        from app.utils.firestore import db
-        db.collection("users").document(user_id).update({
-            "free_credits_used": free_credits_used + 1,
-            "total_generated": user.get("total_generated", 0) + 1
-        })
-        logger.info(f"Used 1 free credit for user {user_id}. Used: {free_credits_used + 1}/{FREE_CREDITS}")
-        return {"has_watermark": True}
-
-    # No credits available
-    else:
+    try:
+        result = await deduct_credit(user_id, job_id or str(uuid.uuid4()))
+    except InsufficientCreditsError:
         raise HTTPException(
             status_code=402,  # Payment Required
             detail="No credits available. Please purchase credits to generate avatars."
         )
+    except CreditContentionError:
+        raise HTTPException(
+            status_code=409,
+            detail="Too many concurrent requests for this account. Please retry.",
+            headers={"Retry-After": "1"}
+        )
+
+    if not result:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return result
 
 
 @router.post("/generate", response_model=GenerateResponse, status_code=201)
@@ -119,10 +112,11 @@ async def generate(
     Upload image and create generation job
 
     - Validates image file
+    - Applies queue backpressure (429/503 with Retry-After)
     - Checks user usage limits
     - Uploads to GCS
     - Creates job in Firestore
-    - Publishes to Pub/Sub for processing
+    - Publishes to the paid or free Pub/Sub lane for processing
     - Returns job ID for status polling
 
     Requires: Firebase authentication token in Authorization header
@@ -136,33 +130,55 @@ async def generate(
         # Validate file
         validate_image_file(file)
 
-        # Check and deduct credit (also determines if watermark needed)
-        credit_result = await check_and_deduct_credit(user_id)
+        # Backpressure: reject before charging a credit if the queue can't take it
+        estimated_wait = await admit_job(user_id)
 
         # Generate job ID
         job_id = str(uuid.uuid4())
         logger.info(f"Generated job ID: {job_id}")
 
-        # Upload to GCS
-        blob_name = f"{job_id}.jpg"
-        input_url = await upload_to_gcs(
-            file=file.file,
-            bucket_name=GCS_UPLOAD_BUCKET,
-            blob_name=blob_name,
-            content_type=file.content_type or "image/jpeg"
-        )
+        # Check and deduct credit (also determines if watermark needed)
+        credit_result = await check_and_deduct_credit(user_id, job_id)
+
+        # Free-tier jobs go on the low-priority lane
+        lane = "free" if credit_result["has_watermark"] else "paid"
+
+        try:
+            # Upload to GCS
+            blob_name = f"{job_id}.jpg"
+            input_url = await upload_to_gcs(
+                file=file.file,
+                bucket_name=GCS_UPLOAD_BUCKET,
+                blob_name=blob_name,
+                content_type=file.content_type or "image/jpeg"
+            )
 
-        # Create job in Firestore with watermark flag
-        await create_job(job_id, user_id, input_url, credit_result["has_watermark"])
+            # Create job in Firestore with watermark flag
+            await create_job(job_id, user_id, input_url, credit_result["has_watermark"], lane=lane)
+
+            # Publish to the lane's Pub/Sub topic
+            message_id = await publish_job(
+                PROJECT_ID,
+                PUBSUB_LANE_TOPICS[lane],
+                job_id,
+                ordering_key=user_id,
+                attributes={"lane": lane}
+            )
+            logger.info(f"Published job {job_id} to Pub/Sub ({lane} lane): {message_id}")
 
-        # Publish to Pub/Sub
-        message_id = await publish_job(PROJECT_ID, PUBSUB_TOPIC, job_id)
-        logger.info(f"Published job {job_id} to Pub/Sub: {message_id}")
+        except Exception:
+            # Job never reached the queue - give the credit back
+            try:
+                await refund_credit(user_id, job_id, reason="enqueue_failed")
+            except Exception as refund_error:
+                logger.error(f"Failed to refund credit for job {job_id}: {str(refund_error)}")
+            raise
 
         return GenerateResponse(
             job_id=job_id,
             status=JobStatus.QUEUED,
-            message="Job created successfully. Use job_id to check status."
+            message="Job created successfully. Use job_id to check status.",
+            estimated_wait_seconds=estimated_wait
         )
 
     except HTTPException:
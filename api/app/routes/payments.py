@@ -74,7 +74,7 @@ async def create_checkout_session(
 
             # Update user in Firestore
             from app.utils.firestore import db
-            db.collection("users").document(user_id).update({
+            await db.collection("users").document(user_id).update({
                 "stripe_customer_id": stripe_customer_id
             })
             logger.info(f"Created Stripe customer: {stripe_customer_id}")
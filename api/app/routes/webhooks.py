@@ -4,10 +4,9 @@ Webhook routes - Stripe webhook event handlers
 from fastapi import APIRouter, Request, HTTPException, Header
 import stripe
 import logging
-from google.cloud import firestore
 
 from config import STRIPE_SECRET_KEY, STRIPE_WEBHOOK_SECRET, CREDIT_PACKAGES
-from app.utils.firestore import db
+from app.utils.firestore import grant_credits
 
 logger = logging.getLogger(__name__)
 
@@ -76,10 +75,12 @@ async def handle_checkout_completed(session):
             logger.error(f"Invalid package in session metadata: {package}")
             return
 
-        # Add credits to user account
-        db.collection("users").document(firebase_uid).update({
-            "credits": firestore.Increment(credits)
-        })
+        # Add credits to user account (idempotent per checkout session)
+        granted = await grant_credits(firebase_uid, credits, reference=session["id"])
+
+        if not granted:
+            logger.info(f"Checkout session {session['id']} already credited, skipping")
+            return
 
         logger.info(f"Added {credits} credits to user {firebase_uid} (package: {package})")
 
@@ -2,15 +2,26 @@
 Firestore database helper functions for API
 """
 from google.cloud import firestore
+from google.api_core import exceptions
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import logging
 import uuid
 
+from config import FREE_CREDITS, CREDIT_LEDGER_COLLECTION, CREDIT_TRANSACTION_MAX_ATTEMPTS
+
 logger = logging.getLogger(__name__)
 
-# Initialize Firestore client
-db = firestore.Client()
+# Initialize Firestore client (async, so calls don't block the event loop)
+db = firestore.AsyncClient()
+
+
+class InsufficientCreditsError(Exception):
+    """Raised when a user has neither paid nor free credits left"""
+
+
+class CreditContentionError(Exception):
+    """Raised when a credit transaction keeps aborting on a contended user document"""
 
 
 async def create_user(user_id: str, email: str) -> Dict[str, Any]:
@@ -38,7 +49,7 @@ async def create_user(user_id: str, email: str) -> Dict[str, Any]:
             "stripe_customer_id": None
         }
 
-        db.collection("users").document(user_id).set(user_data)
+        await db.collection("users").document(user_id).set(user_data)
         logger.info(f"Created user: {user_id}")
 
         return user_data
@@ -52,7 +63,7 @@ async def get_user(user_id: str) -> Optional[Dict[str, Any]]:
     """Get user from Firestore"""
     try:
         doc_ref = db.collection("users").document(user_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
 
         if doc.exists:
             return doc.to_dict()
@@ -71,7 +82,7 @@ async def get_or_create_user(user_id: str, email: str) -> Dict[str, Any]:
         user = await create_user(user_id, email)
 
     # Update last login
-    db.collection("users").document(user_id).update({
+    await db.collection("users").document(user_id).update({
         "last_login": datetime.utcnow()
     })
 
@@ -82,7 +93,7 @@ async def increment_user_usage(user_id: str) -> None:
     """Increment user's usage count"""
     try:
         user_ref = db.collection("users").document(user_id)
-        user_ref.update({
+        await user_ref.update({
             "usage_count": firestore.Increment(1)
         })
         logger.info(f"Incremented usage for user: {user_id}")
@@ -92,7 +103,211 @@ async def increment_user_usage(user_id: str) -> None:
         raise
 
 
-async def create_job(job_id: str, user_id: str, input_image_url: str, has_watermark: bool = False) -> str:
+# Credit ledger
+#
+# Every balance change is written inside the same transaction as an
+# append-only entry in CREDIT_LEDGER_COLLECTION. Each entry is its own
+# document with a deterministic ID (per job / per Stripe session), so appends
+# never contend with each other and replays of the same operation are no-ops.
+
+def _ledger_entry(
+    user_id: str,
+    kind: str,
+    credit_type: str,
+    amount: int,
+    job_id: Optional[str] = None,
+    reference: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build a credit ledger document"""
+    return {
+        "user_id": user_id,
+        "kind": kind,  # debit, refund, purchase
+        "credit_type": credit_type,  # paid or free
+        "amount": amount,
+        "job_id": job_id,
+        "reference": reference,
+        "created_at": datetime.utcnow()
+    }
+
+
+async def _run_credit_transaction(callable_, *args) -> Any:
+    """Run a transactional credit callable, mapping exhausted retries to CreditContentionError"""
+    transaction = db.transaction(max_attempts=CREDIT_TRANSACTION_MAX_ATTEMPTS)
+    try:
+        return await callable_(transaction, *args)
+    except ValueError as e:
+        if isinstance(e.__cause__, exceptions.Aborted):
+            raise CreditContentionError(str(e)) from e
+        raise
+
+
+@firestore.async_transactional
+async def _deduct_credit_in_transaction(transaction, user_ref, ledger_ref, job_id: str) -> Optional[Dict[str, Any]]:
+    snapshot = await user_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+
+    # Idempotency: this job was already charged
+    ledger_snapshot = await ledger_ref.get(transaction=transaction)
+    if ledger_snapshot.exists:
+        credit_type = ledger_snapshot.to_dict().get("credit_type")
+        return {"has_watermark": credit_type == "free", "credit_type": credit_type}
+
+    user = snapshot.to_dict()
+    credits = user.get("credits", 0)
+    free_credits_used = user.get("free_credits_used", 0)
+
+    if credits > 0:
+        # Paid credit (no watermark)
+        credit_type = "paid"
+        updates = {"credits": credits - 1}
+    elif free_credits_used < FREE_CREDITS:
+        # Free credit (with watermark)
+        credit_type = "free"
+        updates = {"free_credits_used": free_credits_used + 1}
+    else:
+        raise InsufficientCreditsError(f"User {snapshot.id} has no credits available")
+
+    updates["total_generated"] = user.get("total_generated", 0) + 1
+
+    transaction.update(user_ref, updates)
+    transaction.set(ledger_ref, _ledger_entry(snapshot.id, "debit", credit_type, -1, job_id=job_id))
+
+    return {"has_watermark": credit_type == "free", "credit_type": credit_type}
+
+
+async def deduct_credit(user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Atomically deduct one credit for a job and append a ledger entry
+
+    Paid credits are consumed before free ones. The read and the write happen
+    in one Firestore transaction, so concurrent generates (or a concurrent
+    webhook Increment) cannot double-spend or lose a deduction; Firestore
+    retries the transaction on contention. Charging the same job twice is a
+    no-op.
+
+    Args:
+        user_id: Firebase user ID
+        job_id: Job being paid for
+
+    Returns:
+        dict with "has_watermark" and "credit_type", or None if user doesn't exist
+
+    Raises:
+        InsufficientCreditsError: If no paid or free credits are left
+        CreditContentionError: If the transaction kept aborting
+    """
+    try:
+        user_ref = db.collection("users").document(user_id)
+        ledger_ref = db.collection(CREDIT_LEDGER_COLLECTION).document(f"{job_id}_debit")
+
+        result = await _run_credit_transaction(_deduct_credit_in_transaction, user_ref, ledger_ref, job_id)
+
+        if result:
+            logger.info(f"Deducted 1 {result['credit_type']} credit from user {user_id} for job {job_id}")
+        return result
+
+    except InsufficientCreditsError:
+        raise
+    except Exception as e:
+        logger.error(f"Error deducting credit for user {user_id}: {str(e)}")
+        raise
+
+
+@firestore.async_transactional
+async def _refund_credit_in_transaction(transaction, user_ref, debit_ref, refund_ref, job_id: str, reason: str) -> bool:
+    debit_snapshot = await debit_ref.get(transaction=transaction)
+    refund_snapshot = await refund_ref.get(transaction=transaction)
+
+    # Nothing to refund, or already refunded
+    if not debit_snapshot.exists or refund_snapshot.exists:
+        return False
+
+    debit = debit_snapshot.to_dict()
+    credit_type = debit.get("credit_type")
+
+    if credit_type == "paid":
+        updates = {"credits": firestore.Increment(1)}
+    else:
+        updates = {"free_credits_used": firestore.Increment(-1)}
+    updates["total_generated"] = firestore.Increment(-1)
+
+    transaction.update(user_ref, updates)
+    transaction.set(refund_ref, _ledger_entry(debit["user_id"], "refund", credit_type, 1, job_id=job_id, reference=reason))
+    return True
+
+
+async def refund_credit(user_id: str, job_id: str, reason: str) -> bool:
+    """
+    Return the credit charged for a job (e.g. when the job could not be queued)
+
+    Args:
+        user_id: Firebase user ID
+        job_id: Job whose debit should be reversed
+        reason: Short reason stored on the ledger entry
+
+    Returns:
+        True if a refund was applied, False if there was nothing to refund
+    """
+    try:
+        user_ref = db.collection("users").document(user_id)
+        debit_ref = db.collection(CREDIT_LEDGER_COLLECTION).document(f"{job_id}_debit")
+        refund_ref = db.collection(CREDIT_LEDGER_COLLECTION).document(f"{job_id}_refund")
+
+        refunded = await _run_credit_transaction(
+            _refund_credit_in_transaction, user_ref, debit_ref, refund_ref, job_id, reason
+        )
+
+        if refunded:
+            logger.info(f"Refunded credit to user {user_id} for job {job_id} ({reason})")
+        return refunded
+
+    except Exception as e:
+        logger.error(f"Error refunding credit for job {job_id}: {str(e)}")
+        raise
+
+
+@firestore.async_transactional
+async def _grant_credits_in_transaction(transaction, user_ref, ledger_ref, credits: int, reference: str) -> bool:
+    # Stripe retries webhooks, so the same session must only be credited once
+    if (await ledger_ref.get(transaction=transaction)).exists:
+        return False
+
+    transaction.update(user_ref, {"credits": firestore.Increment(credits)})
+    transaction.set(ledger_ref, _ledger_entry(user_ref.id, "purchase", "paid", credits, reference=reference))
+    return True
+
+
+async def grant_credits(user_id: str, credits: int, reference: str) -> bool:
+    """
+    Add purchased credits to a user, at most once per purchase reference
+
+    Args:
+        user_id: Firebase user ID
+        credits: Number of credits to add
+        reference: Unique purchase reference (Stripe checkout session ID)
+
+    Returns:
+        True if credits were added, False if this reference was already applied
+    """
+    try:
+        user_ref = db.collection("users").document(user_id)
+        ledger_ref = db.collection(CREDIT_LEDGER_COLLECTION).document(f"purchase_{reference}")
+
+        return await _run_credit_transaction(_grant_credits_in_transaction, user_ref, ledger_ref, credits, reference)
+
+    except Exception as e:
+        logger.error(f"Error granting credits to user {user_id}: {str(e)}")
+        raise
+
+
+async def create_job(
+    job_id: str,
+    user_id: str,
+    input_image_url: str,
+    has_watermark: bool = False,
+    lane: str = "paid"
+) -> str:
     """
     Create a new job in Firestore
 
@@ -101,6 +316,7 @@ async def create_job(job_id: str, user_id: str, input_image_url: str, has_waterm
         user_id: User ID
         input_image_url: GCS URL of uploaded image
         has_watermark: Whether to apply watermark (free tier)
+        lane: Priority lane the job is queued on ("paid" or "free")
 
     Returns:
         Job ID
@@ -116,11 +332,12 @@ async def create_job(job_id: str, user_id: str, input_image_url: str, has_waterm
             "output_image_url": None,
             "error_message": None,
             "has_watermark": has_watermark,  # Flag for worker
+            "lane": lane,
             "metadata": {}
         }
 
-        db.collection("jobs").document(job_id).set(job_data)
-        logger.info(f"Created job: {job_id} for user: {user_id} (watermark: {has_watermark})")
+        await db.collection("jobs").document(job_id).set(job_data)
+        logger.info(f"Created job: {job_id} for user: {user_id} (watermark: {has_watermark}, lane: {lane})")
 
         return job_id
 
@@ -133,7 +350,7 @@ async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
     """Get job from Firestore"""
     try:
         doc_ref = db.collection("jobs").document(job_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
 
         if doc.exists:
             return doc.to_dict()
@@ -167,11 +384,11 @@ async def get_user_jobs(
             .order_by("created_at", direction=firestore.Query.DESCENDING)
 
         # Get total count
-        total = len(list(jobs_ref.stream()))
+        total = len([doc async for doc in jobs_ref.stream()])
 
         # Get paginated results
         jobs_query = jobs_ref.limit(limit).offset(offset)
-        jobs = [doc.to_dict() for doc in jobs_query.stream()]
+        jobs = [doc.to_dict() async for doc in jobs_query.stream()]
 
         return jobs, total
 
@@ -180,6 +397,38 @@ async def get_user_jobs(
         raise
 
 
+async def count_jobs(
+    statuses: List[str],
+    user_id: Optional[str] = None,
+    lanes: Optional[List[str]] = None
+) -> int:
+    """
+    Count jobs in the given statuses with a server-side aggregation query
+
+    Args:
+        statuses: Job statuses to count (e.g. ["queued"])
+        user_id: Only count this user's jobs (optional)
+        lanes: Only count jobs on these priority lanes (optional)
+
+    Returns:
+        Number of matching jobs
+    """
+    try:
+        query = db.collection("jobs").where("status", "in", statuses)
+        if user_id:
+            query = query.where("user_id", "==", user_id)
+        if lanes:
+            query = query.where("lane", "in", lanes)
+
+        results = await query.count(alias="total").get()
+
+        return int(results[0][0].value) if results else 0
+
+    except Exception as e:
+        logger.error(f"Error counting jobs: {str(e)}")
+        raise
+
+
 # Stripe-related functions
 
 async def update_user_subscription(
@@ -225,7 +474,7 @@ async def update_user_subscription(
         if current_period_end:
             update_data["subscription_current_period_end"] = current_period_end
 
-        user_ref.update(update_data)
+        await user_ref.update(update_data)
         logger.info(f"Updated subscription for user {user_id}: {tier}")
 
     except Exception as e:
@@ -246,7 +495,7 @@ async def get_user_by_stripe_customer_id(customer_id: str) -> Optional[Dict[str,
     try:
         users_ref = db.collection("users")
         query = users_ref.where("stripe_customer_id", "==", customer_id).limit(1)
-        docs = list(query.stream())
+        docs = [doc async for doc in query.stream()]
 
         if docs:
             return docs[0].to_dict()
@@ -266,7 +515,7 @@ async def cancel_user_subscription(user_id: str) -> None:
     """
     try:
         user_ref = db.collection("users").document(user_id)
-        user_ref.update({
+        await user_ref.update({
             "subscription_tier": "free",
             "subscription_status": "cancelled",
             "stripe_subscription_id": None,
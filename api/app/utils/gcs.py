@@ -2,6 +2,7 @@
 Google Cloud Storage helper functions for API
 """
 from google.cloud import storage
+from fastapi.concurrency import run_in_threadpool
 from google.auth import compute_engine
 from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
@@ -14,6 +15,9 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# The storage SDK is synchronous, so every network call below is dispatched to
+# the threadpool to keep the event loop free for other requests.
+
 # Initialize GCS client with service account if available
 def _get_storage_client():
     """Get storage client with service account credentials if available"""
@@ -55,7 +59,7 @@ async def upload_to_gcs(
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
 
-        blob.upload_from_file(file, content_type=content_type, rewind=True)
+        await run_in_threadpool(blob.upload_from_file, file, content_type=content_type, rewind=True)
         logger.info(f"Uploaded to gs://{bucket_name}/{blob_name}")
 
         # Return public HTTP URL instead of gs:// URI
@@ -87,7 +91,8 @@ async def get_signed_url(
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
 
-        url = blob.generate_signed_url(
+        url = await run_in_threadpool(
+            blob.generate_signed_url,
             version="v4",
             expiration=datetime.timedelta(seconds=expiration),
             method="GET"
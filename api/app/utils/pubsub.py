@@ -2,16 +2,67 @@
 Google Cloud Pub/Sub helper functions
 """
 from google.cloud import pubsub_v1
+from typing import Dict, List, Optional
+import asyncio
 import logging
 import json
 
+from config import (
+    PUBSUB_BATCH_MAX_MESSAGES,
+    PUBSUB_BATCH_MAX_BYTES,
+    PUBSUB_BATCH_MAX_LATENCY,
+    PUBSUB_ENABLE_MESSAGE_ORDERING
+)
+
 logger = logging.getLogger(__name__)
 
 # Initialize Pub/Sub publisher
-publisher = pubsub_v1.PublisherClient()
+# Messages are batched in the background; publish() returns immediately with a
+# future that resolves once the batch containing the message is sent.
+publisher = pubsub_v1.PublisherClient(
+    batch_settings=pubsub_v1.types.BatchSettings(
+        max_messages=PUBSUB_BATCH_MAX_MESSAGES,
+        max_bytes=PUBSUB_BATCH_MAX_BYTES,
+        max_latency=PUBSUB_BATCH_MAX_LATENCY
+    ),
+    publisher_options=pubsub_v1.types.PublisherOptions(
+        enable_message_ordering=PUBSUB_ENABLE_MESSAGE_ORDERING
+    )
+)
+
+
+def _publish(
+    topic_path: str,
+    job_id: str,
+    ordering_key: Optional[str] = None,
+    attributes: Optional[Dict[str, str]] = None
+) -> asyncio.Future:
+    """Queue a job message on the publisher and return an awaitable for its message ID"""
+    kwargs = dict(attributes or {})
+    if ordering_key and PUBSUB_ENABLE_MESSAGE_ORDERING:
+        kwargs["ordering_key"] = ordering_key
+
+    # Encode job_id as bytes
+    future = publisher.publish(topic_path, job_id.encode("utf-8"), **kwargs)
+
+    # Bridge the publisher's concurrent future onto the event loop
+    # instead of blocking on future.result()
+    return asyncio.wrap_future(future)
+
+
+def _resume_ordering(topic_path: str, ordering_key: Optional[str]) -> None:
+    """A failed publish pauses its ordering key; resume it so later jobs can go out"""
+    if ordering_key and PUBSUB_ENABLE_MESSAGE_ORDERING:
+        publisher.resume_publish(topic_path, ordering_key)
 
 
-async def publish_job(project_id: str, topic_name: str, job_id: str) -> str:
+async def publish_job(
+    project_id: str,
+    topic_name: str,
+    job_id: str,
+    ordering_key: Optional[str] = None,
+    attributes: Optional[Dict[str, str]] = None
+) -> str:
     """
     Publish job to Pub/Sub topic
 
@@ -19,24 +70,76 @@ async def publish_job(project_id: str, topic_name: str, job_id: str) -> str:
         project_id: GCP project ID
         topic_name: Pub/Sub topic name
         job_id: Job ID to publish
+        ordering_key: Optional ordering key (e.g. user ID); only used when
+            PUBSUB_ENABLE_MESSAGE_ORDERING is on
+        attributes: Optional message attributes (e.g. {"lane": "paid"})
 
     Returns:
         Message ID
     """
-    try:
-        topic_path = publisher.topic_path(project_id, topic_name)
-
-        # Encode job_id as bytes
-        data = job_id.encode("utf-8")
+    topic_path = publisher.topic_path(project_id, topic_name)
 
-        # Publish message
-        future = publisher.publish(topic_path, data)
-        message_id = future.result()
+    try:
+        message_id = await _publish(topic_path, job_id, ordering_key, attributes)
 
         logger.info(f"Published job {job_id} to {topic_name}, message ID: {message_id}")
 
         return message_id
 
     except Exception as e:
+        _resume_ordering(topic_path, ordering_key)
         logger.error(f"Error publishing to Pub/Sub: {str(e)}")
         raise
+
+
+async def publish_jobs(
+    project_id: str,
+    topic_name: str,
+    job_ids: List[str],
+    ordering_keys: Optional[Dict[str, str]] = None,
+    attributes: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """
+    Publish many jobs to a Pub/Sub topic in shared batches
+
+    All messages are handed to the publisher before any is awaited, so they
+    go out in as few publish requests as the batch settings allow.
+
+    Args:
+        project_id: GCP project ID
+        topic_name: Pub/Sub topic name
+        job_ids: Job IDs to publish
+        ordering_keys: Optional mapping of job ID to ordering key
+        attributes: Optional message attributes applied to every message
+
+    Returns:
+        Mapping of job ID to message ID
+
+    Raises:
+        Exception: The first publish error, after all messages have settled
+    """
+    topic_path = publisher.topic_path(project_id, topic_name)
+    ordering_keys = ordering_keys or {}
+
+    futures = [
+        _publish(topic_path, job_id, ordering_keys.get(job_id), attributes)
+        for job_id in job_ids
+    ]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+
+    message_ids = {}
+    errors = []
+    for job_id, result in zip(job_ids, results):
+        if isinstance(result, Exception):
+            _resume_ordering(topic_path, ordering_keys.get(job_id))
+            errors.append(result)
+        else:
+            message_ids[job_id] = result
+
+    logger.info(f"Published {len(message_ids)}/{len(job_ids)} jobs to {topic_name}")
+
+    if errors:
+        logger.error(f"Error publishing {len(errors)} jobs to Pub/Sub: {str(errors[0])}")
+        raise errors[0]
+
+    return message_ids
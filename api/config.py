@@ -39,7 +39,17 @@ if FIREBASE_CREDENTIALS_JSON:
             pass
 
 # Pub/Sub
-PUBSUB_TOPIC = "generation-jobs"
+PUBSUB_TOPIC = "generation-jobs"  # Paid (priority) lane
+PUBSUB_FREE_TOPIC = "generation-jobs-free"  # Free-tier lane, yields to paid work in the worker
+PUBSUB_LANE_TOPICS = {
+    "paid": PUBSUB_TOPIC,
+    "free": PUBSUB_FREE_TOPIC
+}
+PUBSUB_BATCH_MAX_MESSAGES = 100  # Flush a batch at this many messages...
+PUBSUB_BATCH_MAX_BYTES = 1024 * 1024  # ...or this many bytes...
+PUBSUB_BATCH_MAX_LATENCY = 0.01  # ...or after this many seconds
+# Per-user ordering keys (requires an ordered subscription; jobs are independent so off by default)
+PUBSUB_ENABLE_MESSAGE_ORDERING = os.getenv("PUBSUB_ENABLE_MESSAGE_ORDERING", "false").lower() == "true"
 
 # API Keys
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
@@ -65,8 +75,18 @@ ALLOWED_MIME_TYPES = {"image/jpeg", "image/png", "image/heic"}
 # Rate Limiting
 RATE_LIMIT_PER_MINUTE = 10
 
+# Admission Control (queue backpressure on /api/generate)
+ESTIMATED_JOB_SECONDS = int(os.getenv("ESTIMATED_JOB_SECONDS", "30"))  # Typical end-to-end worker time
+WORKER_PARALLELISM = int(os.getenv("WORKER_PARALLELISM", "5"))  # Worker max-instances x concurrency
+ADMISSION_MAX_ACTIVE_JOBS_PER_USER = int(os.getenv("ADMISSION_MAX_ACTIVE_JOBS_PER_USER", "3"))
+ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "200"))
+ADMISSION_MAX_WAIT_SECONDS = int(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "600"))
+ADMISSION_QUEUE_DEPTH_CACHE_SECONDS = 5
+
 # Pay-as-you-go Credit System
 FREE_CREDITS = 1  # Everyone gets 1 free avatar (with watermark)
+CREDIT_LEDGER_COLLECTION = "credit_ledger"  # Append-only audit trail of credit changes
+CREDIT_TRANSACTION_MAX_ATTEMPTS = 10  # Retries for credit transactions aborted by contention
 
 CREDIT_PACKAGES = {
     "1_credit": {
@@ -0,0 +1,130 @@
+"""
+Per-endpoint Firestore operation counting for in-process load tests
+
+install() wraps the async Firestore client classes so every document read,
+write, query, aggregation and commit is tallied against the endpoint that
+issued it. The endpoint is tracked in a context variable set by
+EndpointTagger, an ASGI wrapper around the app.
+
+Counts follow Firestore billing: a query is charged one read per document
+returned (minimum one), a count() aggregation at least one read.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict
+import functools
+import re
+
+from google.cloud.firestore_v1.async_aggregation import AsyncAggregationQuery
+from google.cloud.firestore_v1.async_document import AsyncDocumentReference
+from google.cloud.firestore_v1.async_query import AsyncQuery
+from google.cloud.firestore_v1.async_transaction import AsyncTransaction
+
+OPS = ("reads", "writes", "queries", "aggregations", "commits")
+
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="other")
+
+# endpoint -> op -> count
+counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+# (pattern, endpoint label) - first match wins
+_ENDPOINTS = [
+    (re.compile(r"^/api/generate$"), "POST /api/generate"),
+    (re.compile(r"^/api/jobs/[^/]+$"), "GET /api/jobs/{id}"),
+    (re.compile(r"^/api/jobs$"), "GET /api/jobs"),
+]
+
+_installed = False
+
+
+def endpoint_label(method: str, path: str) -> str:
+    """Route template for a request path (or "METHOD path" if unknown)"""
+    for pattern, label in _ENDPOINTS:
+        if pattern.match(path):
+            return label
+    return f"{method} {path}"
+
+
+def _count(op: str, n: int = 1) -> None:
+    counts[current_endpoint.get()][op] += n
+
+
+class EndpointTagger:
+    """ASGI wrapper that tags Firestore ops with the request's endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = current_endpoint.set(endpoint_label(scope["method"], scope["path"]))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_endpoint.reset(token)
+
+
+def _count_call(op: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        _count(op)
+        return await method(*args, **kwargs)
+    return wrapper
+
+
+def _count_stream(method, aggregation: bool = False):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        returned = 0
+        try:
+            async for item in method(*args, **kwargs):
+                returned += 1
+                yield item
+        finally:
+            if aggregation:
+                _count("aggregations")
+                _count("reads")
+            else:
+                _count("queries")
+                _count("reads", max(returned, 1))
+    return wrapper
+
+
+def _count_transaction_writes(method):
+    @functools.wraps(method)
+    def wrapper(self, write_pbs):
+        _count("writes", len(write_pbs))
+        return method(self, write_pbs)
+    return wrapper
+
+
+def install() -> None:
+    """Patch the async Firestore classes (idempotent)"""
+    global _installed
+    if _installed:
+        return
+
+    AsyncDocumentReference.get = _count_call("reads", AsyncDocumentReference.get)
+    for name in ("create", "set", "update", "delete"):
+        setattr(AsyncDocumentReference, name, _count_call("writes", getattr(AsyncDocumentReference, name)))
+
+    AsyncQuery.stream = _count_stream(AsyncQuery.stream)
+    AsyncAggregationQuery.stream = _count_stream(AsyncAggregationQuery.stream, aggregation=True)
+
+    # Transactional writes are buffered and sent in one commit; retries after
+    # contention show up as extra commits (and extra reads)
+    AsyncTransaction._add_write_pbs = _count_transaction_writes(AsyncTransaction._add_write_pbs)
+    AsyncTransaction._commit = _count_call("commits", AsyncTransaction._commit)
+
+    _installed = True
+
+
+def reset() -> None:
+    counts.clear()
+
+
+def snapshot() -> Dict[str, Dict[str, int]]:
+    """Counts per endpoint, with every op present"""
+    return {endpoint: {op: ops.get(op, 0) for op in OPS} for endpoint, ops in counts.items()}
@@ -0,0 +1,379 @@
+"""
+API load test against local emulators
+
+Each virtual user lists their jobs, submits a generation, then polls the job
+until it finishes (a stand-in worker completes jobs after --complete-after
+seconds) and starts over. Reports RPS, latency percentiles and response codes
+per endpoint and, when the app runs in-process, Firestore operations per
+endpoint (see loadtest/firestore_ops.py).
+
+Firebase auth is stubbed with the Auth emulator's unsigned tokens: with
+FIREBASE_AUTH_EMULATOR_HOST set, firebase_admin accepts them without
+contacting Google (the emulator itself doesn't need to be running).
+
+Usage (from api/):
+    docker compose -f loadtest/docker-compose.emulators.yml up -d
+    pip install -r requirements-loadtest.txt
+
+    # App in-process (ASGI), with Firestore op counts
+    python -m loadtest.run_load_test --users 50 --duration 60
+
+    # Cost of listing for users with a long history
+    python -m loadtest.run_load_test --users 20 --history 500
+
+    # Against a running server (no op counts); start it with the same
+    # emulator env vars and --proxy-headers --forwarded-allow-ips '*' so the
+    # per-IP rate limit sees each virtual user separately
+    python -m loadtest.run_load_test --target http://localhost:8000
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import math
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Point every client at the emulators before the app modules build them
+os.environ.setdefault('PROJECT_ID', 'mini-aura')
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', os.environ['PROJECT_ID'])
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+os.environ.setdefault('PUBSUB_EMULATOR_HOST', 'localhost:8085')
+os.environ.setdefault('STORAGE_EMULATOR_HOST', 'http://localhost:4443')
+os.environ.setdefault('FIREBASE_AUTH_EMULATOR_HOST', 'localhost:9099')
+
+import httpx
+from PIL import Image
+
+from loadtest import firestore_ops
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+def _b64(data: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def make_emulator_token(project_id: str, uid: str, email: str) -> str:
+    """Unsigned Firebase ID token, accepted when FIREBASE_AUTH_EMULATOR_HOST is set"""
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "aud": project_id,
+        "sub": uid,
+        "user_id": uid,
+        "email": email,
+        "iat": now,
+        "auth_time": now,
+        "exp": now + 24 * 3600,
+        "firebase": {"sign_in_provider": "password", "identities": {}}
+    }
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}."
+
+
+def make_upload(size: int = 512) -> bytes:
+    img = Image.new("RGB", (size, size), (180, 120, 90))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 1)
+
+
+class EndpointStats:
+    """Latency samples and response codes for one endpoint"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Dict[str, int] = defaultdict(int)
+
+    def record(self, latency_ms: float, status: str) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.statuses[status] += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        return {
+            "requests": len(self.latencies_ms),
+            "rps": round(len(self.latencies_ms) / duration, 2) if duration else None,
+            "p50_ms": percentile(self.latencies_ms, 50),
+            "p90_ms": percentile(self.latencies_ms, 90),
+            "p95_ms": percentile(self.latencies_ms, 95),
+            "p99_ms": percentile(self.latencies_ms, 99),
+            "max_ms": round(max(self.latencies_ms), 1) if self.latencies_ms else None,
+            "statuses": dict(sorted(self.statuses.items()))
+        }
+
+
+async def prepare_emulators() -> None:
+    """Create the upload bucket and Pub/Sub topics (no-op if they exist)"""
+    from google.api_core import exceptions
+    from google.cloud import pubsub_v1, storage
+    from config import PROJECT_ID, GCS_UPLOAD_BUCKET, PUBSUB_LANE_TOPICS
+
+    def create():
+        try:
+            storage.Client().create_bucket(GCS_UPLOAD_BUCKET)
+        except exceptions.Conflict:
+            pass
+
+        publisher = pubsub_v1.PublisherClient()
+        for topic in PUBSUB_LANE_TOPICS.values():
+            try:
+                publisher.create_topic(name=publisher.topic_path(PROJECT_ID, topic))
+            except exceptions.AlreadyExists:
+                pass
+
+    await asyncio.to_thread(create)
+
+
+async def seed_users(user_ids: List[str], credits: int, history: int) -> None:
+    """
+    Create users with paid credits and, optionally, past completed jobs
+
+    Args:
+        user_ids: Users to create
+        credits: Paid credits per user
+        history: Completed jobs to pre-create per user (exercises listing)
+    """
+    from app.utils.firestore import db, create_user, grant_credits
+
+    for user_id in user_ids:
+        await create_user(user_id, f"{user_id}@loadtest.local")
+        if credits:
+            await grant_credits(user_id, credits, reference=f"loadtest-{user_id}")
+
+        created_at = datetime.utcnow() - timedelta(days=1)
+        for start in range(0, history, 500):
+            batch = db.batch()
+            for i in range(start, min(start + 500, history)):
+                job_id = f"{user_id}-history-{i}"
+                batch.set(db.collection("jobs").document(job_id), {
+                    "job_id": job_id,
+                    "user_id": user_id,
+                    "status": "completed",
+                    "created_at": created_at + timedelta(seconds=i),
+                    "completed_at": created_at + timedelta(seconds=i + 30),
+                    "has_watermark": False,
+                    "lane": "paid",
+                    "metadata": {}
+                })
+            await batch.commit()
+
+
+async def complete_job_later(job_id: str, delay: float) -> None:
+    """Stand-in worker: mark a job processing, then completed"""
+    from app.utils.firestore import db
+
+    ref = db.collection("jobs").document(job_id)
+    await asyncio.sleep(delay / 2)
+    await ref.update({"status": "processing", "updated_at": datetime.utcnow()})
+    await asyncio.sleep(delay / 2)
+    # No output_image_url: signing needs a service account key, which the
+    # emulator setup doesn't have
+    await ref.update({
+        "status": "completed",
+        "updated_at": datetime.utcnow(),
+        "completed_at": datetime.utcnow()
+    })
+
+
+class VirtualUser:
+    """One simulated client: list, generate, poll until done, repeat"""
+
+    def __init__(self, client: httpx.AsyncClient, user_id: str, options: Dict[str, Any],
+                 stats: Dict[str, EndpointStats], worker_tasks: List[asyncio.Task]):
+        self.client = client
+        self.user_id = user_id
+        self.options = options
+        self.stats = stats
+        self.worker_tasks = worker_tasks
+
+    async def request(self, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        label = firestore_ops.endpoint_label(method, path)
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.stats[label].record((time.perf_counter() - start) * 1000, status)
+        return response
+
+    async def run(self, deadline: float, upload: bytes) -> None:
+        poll_interval = self.options["poll_interval"]
+
+        while time.monotonic() < deadline:
+            await self.request("GET", "/api/jobs", params={"limit": self.options["page_size"]})
+
+            response = await self.request(
+                "POST", "/api/generate",
+                files={"file": ("photo.jpg", upload, "image/jpeg")}
+            )
+
+            if response is not None and response.status_code == 201:
+                job_id = response.json()["job_id"]
+                if self.options["complete_after"] > 0:
+                    self.worker_tasks.append(asyncio.create_task(
+                        complete_job_later(job_id, self.options["complete_after"])
+                    ))
+
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(poll_interval)
+                    poll = await self.request("GET", f"/api/jobs/{job_id}")
+                    if poll is None or poll.status_code != 200 or poll.json()["status"] in TERMINAL_STATUSES:
+                        break
+            else:
+                # Back off as the API asks (admission control, rate limits)
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                await asyncio.sleep(min(float(retry_after or poll_interval), self.options["max_backoff"]))
+
+            await asyncio.sleep(self.options["think_time"])
+
+
+async def run_load_test(options: Dict[str, Any]) -> Dict[str, Any]:
+    from config import PROJECT_ID
+
+    run_id = uuid.uuid4().hex[:8]
+    user_ids = [f"loadtest-{run_id}-{i}" for i in range(options["users"])]
+
+    await prepare_emulators()
+    logger.info(f"Seeding {len(user_ids)} users ({options['history']} past jobs each)")
+    await seed_users(user_ids, options["credits"], options["history"])
+
+    in_process = not options["target"]
+    if in_process:
+        firestore_ops.install()
+        from app.auth import initialize_firebase
+        from app.main import app
+        initialize_firebase()
+        asgi_app = firestore_ops.EndpointTagger(app)
+
+    stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+    worker_tasks: List[asyncio.Task] = []
+    upload = make_upload(options["image_size"])
+    clients = []
+
+    for i, user_id in enumerate(user_ids):
+        # A distinct client address per user, so the per-IP rate limit
+        # applies per virtual user as it would in production
+        address = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        headers = {"Authorization": f"Bearer {make_emulator_token(PROJECT_ID, user_id, f'{user_id}@loadtest.local')}"}
+        if in_process:
+            transport = httpx.ASGITransport(app=asgi_app, client=(address, 50000))
+            client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", headers=headers, timeout=60)
+        else:
+            headers["X-Forwarded-For"] = address
+            client = httpx.AsyncClient(base_url=options["target"], headers=headers, timeout=60)
+        clients.append(client)
+
+    firestore_ops.reset()
+    users = [VirtualUser(client, user_id, options, stats, worker_tasks) for client, user_id in zip(clients, user_ids)]
+
+    start = time.monotonic()
+    deadline = start + options["duration"]
+    await asyncio.gather(*(user.run(deadline, upload) for user in users))
+    duration = time.monotonic() - start
+
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    for client in clients:
+        await client.aclose()
+
+    result = {
+        "options": options,
+        "duration_seconds": round(duration, 2),
+        "endpoints": {label: s.summary(duration) for label, s in sorted(stats.items())},
+        "firestore_ops": None
+    }
+
+    if in_process:
+        ops = firestore_ops.snapshot()
+        result["firestore_ops"] = {}
+        for label, s in sorted(stats.items()):
+            endpoint_ops = ops.get(label, {op: 0 for op in firestore_ops.OPS})
+            requests = max(len(s.latencies_ms), 1)
+            result["firestore_ops"][label] = {
+                **endpoint_ops,
+                "reads_per_request": round(endpoint_ops["reads"] / requests, 2),
+                "writes_per_request": round(endpoint_ops["writes"] / requests, 2)
+            }
+        # Stand-in worker and anything else outside a request
+        if "other" in ops:
+            result["firestore_ops"]["(outside requests)"] = ops["other"]
+
+    return result
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    options = result["options"]
+    print(f"\n=== {options['users']} users, {result['duration_seconds']}s, {options['history']} past jobs/user ===")
+    print(f"  {'endpoint':<22}{'reqs':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  statuses  (ms)")
+    for label, s in result["endpoints"].items():
+        statuses = " ".join(f"{code}:{n}" for code, n in s["statuses"].items())
+        print(f"  {label:<22}{s['requests']:>7}{s['rps']!s:>8}{s['p50_ms']!s:>9}{s['p95_ms']!s:>9}"
+              f"{s['p99_ms']!s:>9}{s['max_ms']!s:>9}  {statuses}")
+
+    if result["firestore_ops"] is None:
+        print("\n  Firestore op counts are only available in-process (no --target)")
+        return
+
+    print(f"\n  {'firestore ops':<22}" + "".join(f"{op:>13}" for op in firestore_ops.OPS)
+          + f"{'reads/req':>11}{'writes/req':>11}")
+    for label, ops in result["firestore_ops"].items():
+        print(f"  {label:<22}" + "".join(f"{ops.get(op, 0):>13}" for op in firestore_ops.OPS)
+              + f"{ops.get('reads_per_request', '')!s:>11}{ops.get('writes_per_request', '')!s:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against local emulators")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration (s)")
+    parser.add_argument("--target", help="Base URL of a running API (default: run the app in-process)")
+    parser.add_argument("--credits", type=int, default=1000, help="Paid credits seeded per user")
+    parser.add_argument("--history", type=int, default=0, help="Completed jobs seeded per user")
+    parser.add_argument("--page-size", type=int, default=20, help="limit for GET /api/jobs")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between job status polls")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Pause between a user's iterations (s)")
+    parser.add_argument("--max-backoff", type=float, default=10.0, help="Cap on Retry-After waits (s)")
+    parser.add_argument("--complete-after", type=float, default=6.0,
+                        help="Stand-in worker completes jobs after this many seconds (0 = never)")
+    parser.add_argument("--image-size", type=int, default=512, help="Uploaded JPEG size (px)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show API logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    # app.main configures INFO logging on import; keep the report readable
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    result = asyncio.run(run_load_test(vars(args)))
+    print_report(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
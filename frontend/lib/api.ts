@@ -194,6 +194,7 @@ export interface GenerateResponse {
   job_id: string;
   status: JobStatus;
   message: string;
+  estimated_wait_seconds?: number;  // Until the result should be ready
 }
 
 export interface JobResponse {
@@ -208,7 +209,12 @@ export interface JobResponse {
   metadata?: {
     processing_time?: number;
     model_used?: string;
+    provider?: string;  // Worker image provider (gpt_reference, claude_dalle, ...)
     avatar_url?: string;  // Isolated avatar for customization
+    renditions?: Record<string, string>;  // Height (px) -> URL of a pixel-exact PNG rendition
+    thumbnail_url?: string;  // Small WebP for job lists
+    avatar_webp_url?: string;  // Lossless WebP copy of the avatar (small encoding profile)
+    sprite_url?: string;  // True-resolution indexed sprite (when a pixel grid was found)
   };
 }
 
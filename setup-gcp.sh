@@ -121,6 +121,20 @@ gcloud pubsub subscriptions create generation-jobs-sub \
     --max-delivery-attempts=5 \
     --dead-letter-topic=generation-jobs-dlq
 
+# Create free-tier lane (same worker endpoint; the worker defers free jobs with
+# HTTP 429 while paid jobs are waiting, so it needs more delivery attempts and
+# an exponential retry backoff)
+gcloud pubsub topics create generation-jobs-free
+
+gcloud pubsub subscriptions create generation-jobs-free-sub \
+    --topic=generation-jobs-free \
+    --ack-deadline=300 \
+    --message-retention-duration=7d \
+    --min-retry-delay=10s \
+    --max-retry-delay=600s \
+    --max-delivery-attempts=50 \
+    --dead-letter-topic=generation-jobs-dlq
+
 # Grant Pub/Sub service account permissions for DLQ
 echo "🔑 Granting DLQ permissions..."
 
@@ -137,6 +151,10 @@ gcloud pubsub subscriptions add-iam-policy-binding generation-jobs-sub \
     --member="serviceAccount:$PUBSUB_SA" \
     --role="roles/pubsub.subscriber"
 
+gcloud pubsub subscriptions add-iam-policy-binding generation-jobs-free-sub \
+    --member="serviceAccount:$PUBSUB_SA" \
+    --role="roles/pubsub.subscriber"
+
 echo "✅ Pub/Sub configured with dead letter queue (max 5 retries)"
 
 # Create service account for the application
@@ -193,7 +211,7 @@ echo "  Project ID: $PROJECT_ID"
 echo "  Region: $REGION"
 echo "  Upload Bucket: gs://mini-me-uploads-$PROJECT_ID"
 echo "  Results Bucket: gs://mini-me-results-$PROJECT_ID"
-echo "  Pub/Sub Topic: generation-jobs"
+echo "  Pub/Sub Topics: generation-jobs (paid), generation-jobs-free (free tier)"
 echo "  Service Account: $SA_EMAIL"
 echo ""
 echo "📋 Next steps:"
@@ -201,6 +219,6 @@ echo "  1. Add API keys to Secret Manager (see commands above)"
 echo "  2. Set up Firebase Auth project at: https://console.firebase.google.com"
 echo "  3. Deploy API service: cd api && gcloud run deploy mini-me-api --source ."
 echo "  4. Deploy Worker service: cd worker && gcloud run deploy mini-me-worker --source ."
-echo "  5. Update Pub/Sub subscription with Worker URL"
+echo "  5. Update both Pub/Sub subscriptions with Worker URL (/process)"
 echo ""
 echo "🎉 You're ready to build!"
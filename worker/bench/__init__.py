@@ -0,0 +1 @@
+"""Offline benchmarks for the worker (no OpenAI, GCS or Firestore access)"""
@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the image_processing hot functions
+
+Synthetic sprites at 512², 1024², 1536² and 4096², with 1 to 20 figures,
+transparent (RGBA) and opaque variants. Each benchmark also records the peak
+Python-tracked allocation of one call in extra_info["peak_alloc_mb"]; the
+encode benchmarks also record output bytes and bytes saved per profile.
+
+Usage (from worker/):
+    pip install -r requirements-bench.txt
+
+    # Run and compare against the stored baseline
+    pytest bench/bench_image_processing.py \\
+        --benchmark-storage=file://bench/baselines --benchmark-compare
+
+    # Refresh the stored baseline
+    pytest bench/bench_image_processing.py \\
+        --benchmark-storage=file://bench/baselines --benchmark-save=baseline
+
+Opaque inputs and remove_background run rembg (U2Net); the model is
+downloaded on first use.
+"""
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from bench.fixtures import measure_peak_alloc_mb
+from utils.components import ISOLATION_BACKENDS, label_components
+from utils.encoding import ENCODING_PROFILES, encode_image
+from utils.image_processing import (
+    isolate_largest_character,
+    add_watermark,
+    composite_images,
+    remove_background
+)
+
+SIZES = [512, 1024, 1536, 4096]
+COMPONENTS = [1, 5, 20]
+VARIANTS = [pytest.param(True, id="rgba"), pytest.param(False, id="opaque")]
+
+
+def _rounds(size: int) -> int:
+    """Fewer rounds for the big inputs so the suite finishes in minutes"""
+    return 10 if size <= 1024 else 3
+
+
+def _run(benchmark, size: int, coroutine_fn, *args, **kwargs):
+    def call():
+        return asyncio.run(coroutine_fn(*args, **kwargs))
+
+    benchmark.extra_info["peak_alloc_mb"] = measure_peak_alloc_mb(call)
+    return benchmark.pedantic(call, rounds=_rounds(size), iterations=1, warmup_rounds=1)
+
+
+@pytest.mark.parametrize("rgba", VARIANTS)
+@pytest.mark.parametrize("components", COMPONENTS)
+@pytest.mark.parametrize("size", SIZES)
+def test_isolate_largest_character(benchmark, sprite_files, size, components, rgba):
+    benchmark.group = f"isolate-{size}"
+    path = sprite_files(size, components, rgba)
+    _run(benchmark, size, isolate_largest_character, path)
+
+
+@pytest.mark.parametrize("backend", list(ISOLATION_BACKENDS))
+@pytest.mark.parametrize("components", COMPONENTS)
+@pytest.mark.parametrize("size", SIZES)
+def test_label_components(benchmark, sprite_files, size, components, backend):
+    benchmark.group = f"label-{size}-{components}"
+    mask = np.asarray(Image.open(sprite_files(size, components, True)))[:, :, 3] > 128
+    benchmark.pedantic(label_components, args=(mask, backend), rounds=_rounds(size), iterations=1, warmup_rounds=1)
+
+
+@pytest.mark.parametrize("rgba", VARIANTS)
+@pytest.mark.parametrize("size", SIZES)
+def test_add_watermark(benchmark, sprite_files, size, rgba):
+    benchmark.group = f"watermark-{size}"
+    path = sprite_files(size, 1, rgba, suffix="_isolated")
+    _run(benchmark, size, add_watermark, path, text="mini-aura", position="bottom-right", opacity=0.6)
+
+
+@pytest.mark.parametrize("rgba", VARIANTS)
+@pytest.mark.parametrize("size", SIZES)
+def test_composite_images(benchmark, sprite_files, photo_files, size, rgba):
+    benchmark.group = f"composite-{size}"
+    _run(benchmark, size, composite_images, photo_files(size), sprite_files(size, 1, rgba, suffix="_fg"))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_remove_background(benchmark, photo_files, size):
+    benchmark.group = f"remove-background-{size}"
+    _run(benchmark, size, remove_background, photo_files(size))
+
+
+@pytest.mark.parametrize("profile", list(ENCODING_PROFILES))
+@pytest.mark.parametrize("size", SIZES)
+def test_encode_image(benchmark, sprite_files, size, profile):
+    benchmark.group = f"encode-{size}"
+    path = sprite_files(size, 1, True, suffix="_isolated")
+    result = _run(benchmark, size, encode_image, path, profile)
+    benchmark.extra_info["bytes"] = result["bytes"]
+    benchmark.extra_info["bytes_saved"] = result["source_bytes"] - result["bytes"]
+    if "webp_path" in result:
+        benchmark.extra_info["webp_bytes"] = os.path.getsize(result["webp_path"])
@@ -0,0 +1,48 @@
+"""
+Shared fixtures for the pytest-benchmark suites in bench/
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Benchmarks import the worker modules, which read these at import time
+os.environ.setdefault('CLAUDE_API_KEY', 'bench')
+os.environ.setdefault('OPENAI_API_KEY', 'bench')
+
+from bench.fixtures import make_sprite, make_photo
+
+
+@pytest.fixture(scope="session")
+def sprite_files(tmp_path_factory):
+    """Cache of synthetic sprite PNGs keyed by (size, components, rgba, suffix)"""
+    root = tmp_path_factory.mktemp("sprites")
+    cache = {}
+
+    def get(size: int, components: int, rgba: bool, suffix: str = "_pixel") -> str:
+        key = (size, components, rgba, suffix)
+        if key not in cache:
+            path = str(root / f"sprite_{size}_{components}_{int(rgba)}{suffix}.png")
+            make_sprite(size, components, rgba=rgba).save(path, "PNG")
+            cache[key] = path
+        return cache[key]
+
+    return get
+
+
+@pytest.fixture(scope="session")
+def photo_files(tmp_path_factory):
+    """Cache of synthetic input photos (JPEG) keyed by size"""
+    root = tmp_path_factory.mktemp("photos")
+    cache = {}
+
+    def get(size: int) -> str:
+        if size not in cache:
+            path = str(root / f"photo_{size}_input.jpg")
+            make_photo(size).save(path, "JPEG")
+            cache[size] = path
+        return cache[size]
+
+    return get
@@ -0,0 +1,147 @@
+"""
+Local stand-ins for the worker's external services
+
+- FakeImageModel: returns canned sprite PNGs after a configurable latency
+- LocalGCS: buckets are directories under a root folder
+- InMemoryFirestore: job documents in a dict
+
+install() swaps them into the pipeline module, which imports its service
+helpers by name.
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import os
+import random
+import shutil
+
+from bench.fixtures import make_sprite
+
+
+class FakeImageModel:
+    """Stand-in for generate_pixel_art_with_gpt_reference"""
+
+    def __init__(
+        self,
+        canned_dir: str,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        variants: int = 4,
+        size: int = 1024,
+        components: int = 1,
+        rgba: bool = True,
+        seed: int = 0
+    ):
+        """
+        Args:
+            canned_dir: Directory to write the canned PNGs to
+            latency: Base latency per call in seconds
+            jitter: Extra uniform random latency (0..jitter seconds)
+            variants: Number of distinct canned sprites to rotate through
+            size: Sprite size in pixels
+            components: Figures per sprite (>1 simulates character sheets)
+            rgba: Transparent sprites if True; opaque ones force rembg
+            seed: Random seed for latency and sprites
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+        os.makedirs(canned_dir, exist_ok=True)
+        self.canned: List[str] = []
+        for i in range(variants):
+            path = os.path.join(canned_dir, f"canned_{size}_{components}_{int(rgba)}_{i}.png")
+            if not os.path.exists(path):
+                make_sprite(size, components, rgba=rgba, seed=seed + i).save(path, "PNG")
+            self.canned.append(path)
+
+    async def __call__(self, reference_image_path: str, output_path: str, *args, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+        shutil.copyfile(self.canned[self.calls % len(self.canned)], output_path)
+        return output_path
+
+
+class LocalGCS:
+    """Filesystem-backed stand-in for utils.gcs"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.uploaded_bytes = 0
+
+    def path(self, bucket_name: str, blob_name: str) -> str:
+        return os.path.join(self.root, bucket_name, blob_name)
+
+    def put(self, bucket_name: str, blob_name: str, local_path: str) -> None:
+        """Seed an object (e.g. an input upload)"""
+        dest = self.path(bucket_name, blob_name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(local_path, dest)
+
+    async def download_from_gcs(self, bucket_name: str, blob_name: str, local_path: str) -> str:
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, self.path(bucket_name, blob_name), local_path)
+        return local_path
+
+    async def upload_to_gcs(self, local_path: str, bucket_name: str, blob_name: str, **kwargs) -> str:
+        dest = self.path(bucket_name, blob_name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, local_path, dest)
+        self.uploaded_bytes += os.path.getsize(dest)
+        return f"file://{dest}"
+
+
+class InMemoryFirestore:
+    """Dict-backed stand-in for utils.firestore"""
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def add_job(self, job_id: str, has_watermark: bool = False) -> None:
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "user_id": "bench-user",
+            "status": "queued",
+            "created_at": datetime.utcnow(),
+            "has_watermark": has_watermark,
+            "lane": "free" if has_watermark else "paid",
+            "metadata": {}
+        }
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def update_job_status(
+        self,
+        job_id: str,
+        status: str,
+        output_url: Optional[str] = None,
+        error_message: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> None:
+        job = self.jobs[job_id]
+        job.update({"status": status, "updated_at": datetime.utcnow()})
+        if output_url:
+            job["output_image_url"] = output_url
+        if error_message:
+            job["error_message"] = error_message
+        if metadata:
+            job["metadata"] = metadata
+
+
+def install(model: FakeImageModel, gcs: LocalGCS, firestore: InMemoryFirestore) -> None:
+    """Point the pipeline module at the stand-ins"""
+    import pipeline
+    from utils import providers, speculative
+    from utils.single_flight import single_flight
+
+    providers.PROVIDERS["gpt_reference"] = (model, "gpt-image-1")
+    speculative.generate_pixel_art_with_gpt_reference = model
+    pipeline.download_from_gcs = gcs.download_from_gcs
+    pipeline.upload_to_gcs = gcs.upload_to_gcs
+    pipeline.get_job = firestore.get_job
+    pipeline.update_job_status = firestore.update_job_status
+    single_flight.shared = False  # In-process coalescing only; the lease needs Firestore
@@ -0,0 +1,99 @@
+"""
+Synthetic inputs for benchmarks
+
+Sprites are drawn on a coarse grid and upscaled with nearest-neighbour, so
+they look like the pixel art the image model returns: flat colours, hard
+edges and a visible pixel grid.
+"""
+from PIL import Image
+import numpy as np
+import math
+import tracemalloc
+
+
+def make_sprite(
+    size: int = 1024,
+    components: int = 1,
+    rgba: bool = True,
+    pixel_size: int = 8,
+    seed: int = 0
+) -> Image.Image:
+    """
+    Draw a synthetic pixel-art sprite sheet
+
+    The first component is the "main character" (largest); the others are
+    smaller figures laid out in separate grid cells so they never touch.
+
+    Args:
+        size: Output width and height in pixels
+        components: Number of separate figures (1 to 20)
+        rgba: Transparent background if True, opaque white otherwise
+        pixel_size: Size of one sprite pixel in output pixels
+        seed: Random seed for colours and figure sizes
+
+    Returns:
+        RGBA (transparent background) or RGB (white background) image
+    """
+    rng = np.random.default_rng(seed)
+    low = max(8, size // pixel_size)
+
+    canvas = np.zeros((low, low, 4), dtype=np.uint8)
+    if not rgba:
+        canvas[:, :] = [255, 255, 255, 255]
+
+    palette = rng.integers(40, 230, size=(6, 3), dtype=np.uint8)
+    outline = np.array([20, 20, 20, 255], dtype=np.uint8)
+
+    grid = math.ceil(math.sqrt(components))
+    cell = low // grid
+
+    for i in range(components):
+        cell_y, cell_x = divmod(i, grid)
+        scale = 1.0 if i == 0 else rng.uniform(0.3, 0.7)
+
+        # Tall figure: head, torso and legs bands inside a 1-pixel outline
+        h = max(6, int((cell - 2) * 0.9 * scale))
+        w = max(4, int(h * 0.4))
+        top = cell_y * cell + (cell - h) // 2
+        left = cell_x * cell + (cell - w) // 2
+
+        canvas[top:top + h, left:left + w] = outline
+        bands = np.array_split(np.arange(top + 1, top + h - 1), 3)
+        for band, color in zip(bands, palette[rng.permutation(len(palette))[:3]]):
+            if len(band):
+                canvas[band[0]:band[-1] + 1, left + 1:left + w - 1, :3] = color
+                canvas[band[0]:band[-1] + 1, left + 1:left + w - 1, 3] = 255
+
+        # Speckle some detail pixels so the figure isn't just flat bands
+        inner_h, inner_w = h - 2, w - 2
+        detail = rng.random((inner_h, inner_w)) < 0.08
+        ys, xs = np.nonzero(detail)
+        canvas[top + 1 + ys, left + 1 + xs, :3] = palette[rng.integers(0, len(palette), len(ys))]
+
+    img = Image.fromarray(canvas, "RGBA").resize((size, size), Image.Resampling.NEAREST)
+    return img if rgba else img.convert("RGB")
+
+
+def make_photo(size: int = 1024, seed: int = 0) -> Image.Image:
+    """Draw a noisy RGB "photo" to stand in for an uploaded input image"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+    base = np.stack([x * 255 // size, y * 255 // size, (x + y) * 127 // size], axis=-1)
+    noise = rng.integers(0, 40, size=(size, size, 3))
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def measure_peak_alloc_mb(fn) -> float:
+    """
+    Peak Python-tracked allocation of one call, in MB
+
+    tracemalloc sees numpy buffers but not memory allocated inside Pillow or
+    ONNX Runtime, so treat this as a lower bound.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024 / 1024, 2)
@@ -0,0 +1,173 @@
+"""
+End-to-end pipeline benchmark against local stand-ins
+
+Runs run_pipeline() for a batch of jobs at one or more concurrency levels,
+with a fake image model, filesystem GCS and in-memory Firestore (see
+bench/fakes.py). Each concurrency level runs in a fresh process so peak RSS
+is measured per level.
+
+Usage (from worker/):
+    python -m bench.run_pipeline_bench --concurrency 1 4 8 --jobs 24
+    python -m bench.run_pipeline_bench --model-latency 2 --model-jitter 1 --opaque
+    python -m bench.run_pipeline_bench --json bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The real service clients are still constructed at import time, but every
+# call site the pipeline uses is replaced by a local stand-in. These keep the
+# constructors from looking for credentials.
+os.environ.setdefault('CLAUDE_API_KEY', 'bench')
+os.environ.setdefault('OPENAI_API_KEY', 'bench')
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'mini-aura-bench')
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:0')
+os.environ.setdefault('STORAGE_EMULATOR_HOST', 'http://localhost:0')
+
+
+def _run_level(options: Dict[str, Any], concurrency: int) -> Dict[str, Any]:
+    """Run one concurrency level (executed in a child process)"""
+    logging.basicConfig(level=logging.INFO if options["verbose"] else logging.WARNING)
+
+    from bench.fakes import FakeImageModel, LocalGCS, InMemoryFirestore, install
+    from bench.fixtures import make_photo
+    from config import GCS_UPLOAD_BUCKET
+    from utils.metrics import RollingStats
+    from utils.concurrency import IO_STAGES, CPU_STAGES, available_cpus, recommend_concurrency
+    import pipeline
+
+    root = tempfile.mkdtemp(prefix="mini-aura-bench-")
+    model = FakeImageModel(
+        canned_dir=os.path.join(root, "canned"),
+        latency=options["model_latency"],
+        jitter=options["model_jitter"],
+        size=options["size"],
+        components=options["components"],
+        rgba=not options["opaque"]
+    )
+    gcs = LocalGCS(os.path.join(root, "gcs"))
+    firestore = InMemoryFirestore()
+    install(model, gcs, firestore)
+
+    job_ids = []
+    for i in range(options["jobs"]):
+        job_id = str(uuid.uuid4())
+        # A distinct photo per job, or single-flight would coalesce them all
+        photo_path = os.path.join(root, f"photo_{i}.jpg")
+        make_photo(options["input_size"], seed=i).save(photo_path, "JPEG")
+        gcs.put(GCS_UPLOAD_BUCKET, f"{job_id}.jpg", photo_path)
+        firestore.add_job(job_id, has_watermark=i < options["jobs"] * options["watermark_ratio"])
+        job_ids.append(job_id)
+
+    unbounded = float("inf")
+    job_latency = RollingStats(max_samples=len(job_ids), max_age_seconds=unbounded)
+    stage_stats: Dict[str, RollingStats] = {}
+    failures = 0
+
+    async def run_job(semaphore: asyncio.Semaphore, job_id: str):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await firestore.update_job_status(job_id, "processing")
+                result = await pipeline.run_pipeline(job_id)
+                await firestore.update_job_status(job_id, "completed", metadata=result["metadata"])
+            except Exception:
+                failures += 1
+                logging.exception(f"Job {job_id} failed")
+                return
+            job_latency.record(int((time.perf_counter() - start) * 1000))
+            for stage, ms in result["metadata"].get("stage_timings_ms", {}).items():
+                stage_stats.setdefault(stage, RollingStats(max_samples=len(job_ids), max_age_seconds=unbounded)).record(ms)
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(run_job(semaphore, job_id) for job_id in job_ids))
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    asyncio.run(run_all())
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    shutil.rmtree(root, ignore_errors=True)
+
+    # Mean per-job I/O and CPU time, as the worker's autotuner sees them
+    def per_job_ms(stages):
+        return sum((stage_stats[s].mean() or 0) * stage_stats[s].count() for s in stages if s in stage_stats) / max(job_latency.count(), 1)
+
+    io_ms, cpu_ms = per_job_ms(IO_STAGES), per_job_ms(CPU_STAGES)
+
+    return {
+        "concurrency": concurrency,
+        "jobs": len(job_ids),
+        "failures": failures,
+        "wall_seconds": round(wall, 3),
+        "throughput_jobs_per_sec": round((len(job_ids) - failures) / wall, 3) if wall else None,
+        "cpu_utilization": round(cpu / wall, 3) if wall else None,
+        "job_ms": job_latency.snapshot(),
+        "stage_ms": {stage: stats.snapshot() for stage, stats in stage_stats.items()},
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "uploaded_bytes": gcs.uploaded_bytes,
+        "io_cpu_ratio": round(io_ms / cpu_ms, 2) if cpu_ms else None,
+        "recommended_concurrency": recommend_concurrency(available_cpus(), io_ms, cpu_ms)
+    }
+
+
+def _print_report(result: Dict[str, Any]) -> None:
+    print(f"\n=== concurrency={result['concurrency']} jobs={result['jobs']} failures={result['failures']} ===")
+    print(f"  throughput: {result['throughput_jobs_per_sec']} jobs/s over {result['wall_seconds']}s "
+          f"(cpu {result['cpu_utilization']}x, peak RSS {result['peak_rss_mb']} MB)")
+    print(f"  I/O:CPU {result['io_cpu_ratio']} -> recommended concurrency {result['recommended_concurrency']}")
+    print(f"  {'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    rows = dict(result["stage_ms"])
+    rows["total"] = result["job_ms"]
+    for stage, stats in rows.items():
+        print(f"  {stage:<12}{stats['p50']!s:>10}{stats['p95']!s:>10}{stats['p99']!s:>10}{stats['max']!s:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end worker pipeline benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Concurrency levels to run")
+    parser.add_argument("--jobs", type=int, default=16, help="Jobs per concurrency level")
+    parser.add_argument("--model-latency", type=float, default=0.5, help="Fake image model base latency (s)")
+    parser.add_argument("--model-jitter", type=float, default=0.0, help="Extra random model latency (s)")
+    parser.add_argument("--size", type=int, default=1024, help="Generated sprite size (px)")
+    parser.add_argument("--components", type=int, default=1, help="Figures per generated sprite")
+    parser.add_argument("--opaque", action="store_true", help="Opaque sprites (exercises rembg)")
+    parser.add_argument("--input-size", type=int, default=1024, help="Input photo size (px)")
+    parser.add_argument("--watermark-ratio", type=float, default=0.5, help="Fraction of free-tier jobs")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    args = parser.parse_args()
+
+    options = vars(args)
+    results = []
+
+    for concurrency in args.concurrency:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(_run_level, options, concurrency).result()
+        _print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": options, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Background-removal model comparison
+
+Runs every rembg model on the same fixture set and reports, per model:
+session load time, per-image latency, peak RSS, and mask IoU against u2net
+(the production reference) and, for synthetic sprites, against the true
+alpha. Each model runs in a fresh process so RSS is per model.
+
+Fixtures are opaque synthetic sprites (white and flat-colour backgrounds),
+plus any PNGs in --fixtures (e.g. real generated sprites saved from jobs).
+
+Usage (from worker/):
+    python -m bench.run_rembg_model_bench
+    python -m bench.run_rembg_model_bench --models u2net u2netp --fixtures ~/sprites --json rembg.json
+
+u2net_int8 has to be built first (`python -m utils.background` with
+REMBG_MODEL=u2net_int8, which needs the onnx package). Models are
+downloaded on first use.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('CLAUDE_API_KEY', 'bench')
+os.environ.setdefault('OPENAI_API_KEY', 'bench')
+
+REFERENCE_MODEL = "u2net"
+BACKGROUNDS = [(255, 255, 255), (236, 222, 250), (200, 230, 255)]
+
+
+def _write_fixtures(root: str, count: int, size: int, extra_dir: str = None) -> List[Dict[str, Any]]:
+    """Save fixture PNGs (and true masks for the synthetic ones)"""
+    from PIL import Image
+    from bench.fixtures import make_sprite
+
+    fixtures = []
+    for i in range(count):
+        sprite = make_sprite(size, components=1 + i % 3, seed=i)
+        background = Image.new("RGBA", sprite.size, BACKGROUNDS[i % len(BACKGROUNDS)] + (255,))
+        path = os.path.join(root, f"synthetic_{i}.png")
+        Image.alpha_composite(background, sprite).convert("RGB").save(path)
+
+        truth_path = os.path.join(root, f"synthetic_{i}_truth.npy")
+        np.save(truth_path, np.asarray(sprite)[:, :, 3] > 128)
+        fixtures.append({"name": f"synthetic_{i}", "path": path, "truth": truth_path})
+
+    if extra_dir:
+        for path in sorted(glob.glob(os.path.join(extra_dir, "*.png"))):
+            fixtures.append({"name": os.path.basename(path), "path": path, "truth": None})
+
+    return fixtures
+
+
+def _run_model(model_name: str, fixtures: List[Dict[str, Any]], out_dir: str, rounds: int) -> Dict[str, Any]:
+    """Load one model and predict every fixture (executed in a child process)"""
+    from PIL import Image
+    from utils.background import create_session
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    session = create_session(model_name)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for fixture in fixtures:
+        img = Image.open(fixture["path"]).convert("RGB")
+        session.predict(img)  # First run includes one-off allocation
+        for _ in range(rounds):
+            start = time.perf_counter()
+            mask = session.predict(img)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+        np.save(os.path.join(out_dir, f"{model_name}_{fixture['name']}.npy"), np.asarray(mask) > 128)
+
+    latencies.sort()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "model": model_name,
+        "load_ms": round(load_ms, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "max_ms": round(latencies[-1], 1),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "model_rss_mb": round((rss_after - rss_before) / 1024, 1)
+    }
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def _add_iou(result: Dict[str, Any], fixtures: List[Dict[str, Any]], out_dir: str) -> None:
+    vs_reference, vs_truth = [], []
+    for fixture in fixtures:
+        mask = np.load(os.path.join(out_dir, f"{result['model']}_{fixture['name']}.npy"))
+        reference_path = os.path.join(out_dir, f"{REFERENCE_MODEL}_{fixture['name']}.npy")
+        if os.path.exists(reference_path):
+            vs_reference.append(_iou(mask, np.load(reference_path)))
+        if fixture["truth"]:
+            vs_truth.append(_iou(mask, np.load(fixture["truth"])))
+
+    result["iou_vs_u2net_mean"] = round(float(np.mean(vs_reference)), 4) if vs_reference else None
+    result["iou_vs_u2net_min"] = round(float(np.min(vs_reference)), 4) if vs_reference else None
+    result["iou_vs_truth_mean"] = round(float(np.mean(vs_truth)), 4) if vs_truth else None
+
+
+def main():
+    from utils.background import REMBG_MODELS
+
+    parser = argparse.ArgumentParser(description="Compare rembg models on sprite fixtures")
+    parser.add_argument("--models", nargs="+", default=list(REMBG_MODELS), help="Models to compare")
+    parser.add_argument("--synthetic", type=int, default=9, help="Synthetic fixtures to generate")
+    parser.add_argument("--size", type=int, default=1024, help="Synthetic fixture size (px)")
+    parser.add_argument("--fixtures", help="Directory of extra PNG fixtures (e.g. real generated sprites)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed predictions per fixture")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    models = [REFERENCE_MODEL] + [m for m in args.models if m != REFERENCE_MODEL]
+    root = tempfile.mkdtemp(prefix="mini-aura-rembg-")
+    fixtures = _write_fixtures(root, args.synthetic, args.size, args.fixtures)
+
+    results = []
+    for model in models:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            try:
+                results.append(pool.submit(_run_model, model, fixtures, root, args.rounds).result())
+            except Exception as e:
+                print(f"{model}: skipped ({str(e)})")
+
+    for result in results:
+        _add_iou(result, fixtures, root)
+
+    print(f"\n{len(fixtures)} fixtures, {args.rounds} timed rounds each")
+    print(f"  {'model':<12}{'load ms':>10}{'p50 ms':>10}{'max ms':>10}{'RSS MB':>10}{'IoU u2net':>11}{'(min)':>8}{'IoU truth':>11}")
+    for r in results:
+        print(f"  {r['model']:<12}{r['load_ms']:>10}{r['p50_ms']:>10}{r['max_ms']:>10}{r['peak_rss_mb']:>10}"
+              f"{r['iou_vs_u2net_mean']!s:>11}{r['iou_vs_u2net_min']!s:>8}{r['iou_vs_truth_mean']!s:>11}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
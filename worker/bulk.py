@@ -0,0 +1,228 @@
+"""
+Bulk avatar generation (style refreshes for existing users, creator-pack orders)
+
+Bulk jobs don't go through Pub/Sub, so they never compete with interactive
+jobs for worker slots or count towards the API's queue-depth admission, and
+the API leaves the bulk lane out of each user's active-job limit. A
+batch is submitted as one Firestore document listing its inputs; the runner
+then works through it at BULK_CONCURRENCY jobs at a time, starts a job only
+while neither live lane has queued work, and writes each result with
+update_job_status like the worker does. Job documents are created as each
+job starts, so a large batch doesn't show up as queued work.
+
+    python -m bulk submit manifest.jsonl   # prints the batch ID
+    python -m bulk run <batch_id>          # resumable: finished jobs are skipped
+    python -m bulk status <batch_id>
+
+Each manifest line is a JSON object with a "user_id" and either a
+"source_job_id" (reuse that job's uploaded photo) or an "image" (local photo
+to upload), plus an optional "has_watermark" (default false).
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+
+from config import (
+    GCS_UPLOAD_BUCKET,
+    BULK_CONCURRENCY,
+    BULK_YIELD_LIVE_BACKLOG,
+    BULK_POLL_SECONDS
+)
+from pipeline import run_pipeline
+from utils.firestore import (
+    create_job,
+    create_batch,
+    get_batch,
+    update_batch,
+    get_job,
+    update_job_status,
+    count_queued_jobs
+)
+from utils.gcs import upload_to_gcs
+from utils.lanes import BULK_LANE, PAID_LANE, FREE_LANE
+
+logger = logging.getLogger(__name__)
+
+
+async def submit_batch(manifest_path: str, batch_id: Optional[str] = None) -> str:
+    """
+    Collect a manifest's inputs into a new batch
+
+    Args:
+        manifest_path: JSON-lines manifest (see module docstring)
+        batch_id: Batch ID (default: a new UUID)
+
+    Returns:
+        Batch ID
+    """
+    try:
+        batch_id = batch_id or str(uuid.uuid4())
+        items: List[Dict[str, Any]] = []
+
+        with open(manifest_path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        for entry in entries:
+            job_id = str(uuid.uuid4())
+
+            if entry.get("source_job_id"):
+                source = await get_job(entry["source_job_id"])
+                if not source:
+                    raise ValueError(f"Source job {entry['source_job_id']} not found")
+                input_blob = source.get("input_blob") or f"{entry['source_job_id']}.jpg"
+            else:
+                input_blob = f"{job_id}.jpg"
+                await upload_to_gcs(entry["image"], GCS_UPLOAD_BUCKET, input_blob, content_type="image/jpeg")
+
+            items.append({
+                "job_id": job_id,
+                "user_id": entry["user_id"],
+                "input_blob": input_blob,
+                "has_watermark": bool(entry.get("has_watermark", False))
+            })
+
+        await create_batch(batch_id, items)
+        return batch_id
+
+    except Exception as e:
+        logger.error(f"Error submitting batch: {str(e)}")
+        raise
+
+
+async def wait_for_idle_live_lanes() -> None:
+    """Return once fewer than BULK_YIELD_LIVE_BACKLOG paid and free jobs are queued"""
+    while True:
+        try:
+            backlog = await count_queued_jobs(lane=PAID_LANE) + await count_queued_jobs(lane=FREE_LANE)
+        except Exception as e:
+            # Bulk work can wait; don't start jobs while live traffic can't be seen
+            logger.warning(f"Live backlog unavailable, pausing bulk work: {str(e)}")
+        else:
+            if backlog < BULK_YIELD_LIVE_BACKLOG:
+                return
+            logger.info(f"⏸️  {backlog} live jobs queued, pausing bulk work")
+
+        await asyncio.sleep(BULK_POLL_SECONDS)
+
+
+async def run_bulk_job(batch_id: str, item: Dict[str, Any]) -> Optional[str]:
+    """
+    Run one batch item through the pipeline and record the result
+
+    Args:
+        batch_id: Batch ID
+        item: Batch item (see create_batch)
+
+    Returns:
+        Final job status, or None if the job had already finished
+    """
+    job_id = item["job_id"]
+    job = await get_job(job_id)
+
+    if job and job.get("status") in ("completed", "failed"):
+        return None
+
+    try:
+        if job:
+            # Interrupted by an earlier run
+            await update_job_status(job_id, "processing")
+        else:
+            await create_job(
+                job_id,
+                item["user_id"],
+                item["input_blob"],
+                lane=BULK_LANE,
+                status="processing",
+                has_watermark=item["has_watermark"],
+                batch_id=batch_id
+            )
+
+        result = await run_pipeline(job_id)
+        result['metadata']['lane'] = BULK_LANE
+        await update_job_status(job_id, "completed", output_url=result['output_url'], metadata=result['metadata'])
+        await update_batch(batch_id, completed=1)
+        return "completed"
+
+    except Exception as e:
+        logger.error(f"❌ Error processing bulk job {job_id}: {str(e)}")
+        await update_job_status(job_id, "failed", error_message=str(e))
+        await update_batch(batch_id, failed=1)
+        return "failed"
+
+
+async def run_batch(batch_id: str, concurrency: int = BULK_CONCURRENCY) -> Dict[str, int]:
+    """
+    Process every unfinished job in a batch
+
+    Args:
+        batch_id: Batch ID
+        concurrency: Jobs in flight at once
+
+    Returns:
+        Jobs completed, failed and skipped (already finished) by this run
+    """
+    batch = await get_batch(batch_id)
+    if not batch:
+        raise ValueError(f"Batch {batch_id} not found")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in batch["items"]:
+        queue.put_nowait(item)
+
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    await update_batch(batch_id, status="running")
+    logger.info(f"🚀 Running batch {batch_id}: {len(batch['items'])} jobs, concurrency {concurrency}")
+
+    async def drain() -> None:
+        while not queue.empty():
+            item = queue.get_nowait()
+            await wait_for_idle_live_lanes()
+            status = await run_bulk_job(batch_id, item)
+            counts[status or "skipped"] += 1
+
+    await asyncio.gather(*(drain() for _ in range(concurrency)))
+
+    await update_batch(batch_id, status="done")
+    logger.info(f"✅ Batch {batch_id} done: {counts}")
+    return counts
+
+
+async def batch_status(batch_id: str) -> Dict[str, Any]:
+    """Progress of a batch (status, total, completed, failed)"""
+    batch = await get_batch(batch_id)
+    if not batch:
+        raise ValueError(f"Batch {batch_id} not found")
+    return {key: batch.get(key) for key in ("batch_id", "status", "total", "completed", "failed")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk avatar generation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Create a batch from a JSON-lines manifest")
+    submit.add_argument("manifest", help="Manifest path")
+    submit.add_argument("--batch-id", help="Batch ID (default: a new UUID)")
+
+    run = commands.add_parser("run", help="Process a batch's unfinished jobs")
+    run.add_argument("batch_id")
+    run.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY, help="Jobs in flight at once")
+
+    status = commands.add_parser("status", help="Show a batch's progress")
+    status.add_argument("batch_id")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "submit":
+        print(asyncio.run(submit_batch(args.manifest, args.batch_id)))
+    elif args.command == "run":
+        print(json.dumps(asyncio.run(run_batch(args.batch_id, args.concurrency))))
+    else:
+        print(json.dumps(asyncio.run(batch_status(args.batch_id)), default=str))
+
+
+if __name__ == "__main__":
+    main()
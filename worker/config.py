@@ -2,9 +2,12 @@
 Configuration for Worker Service
 """
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Local development reads .env; Cloud Run (which sets K_SERVICE) passes
+# everything as env vars, so skip the import and file search there
+if not os.getenv("K_SERVICE"):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # GCP Configuration
 PROJECT_ID = os.getenv("PROJECT_ID", "mini-aura")
@@ -38,6 +41,19 @@ MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_FORMATS = {"jpg", "jpeg", "png", "heic"}
 OUTPUT_FORMAT = "PNG"
 OUTPUT_SIZE = (2000, 2000)
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")  # "u2net", "u2netp", "silueta" or "u2net_int8" (see utils/background.py)
+REMBG_OPTIMIZED_MODEL_DIR = os.getenv("U2NET_HOME", os.path.expanduser("~/.u2net"))  # Build-time optimized graphs live with the weights
+ISOLATION_BACKEND = os.getenv("ISOLATION_BACKEND", "opencv")  # Component labelling: "opencv" (~1.5-2x faster) or "scipy"
+RENDITION_HEIGHTS = (64, 128, 256, 512)  # Nearest-neighbour pixel-art renditions of the avatar
+THUMBNAIL_HEIGHT = 128  # WebP thumbnail for job lists
+THUMBNAIL_WEBP_QUALITY = 80
+ENCODING_PROFILE_PAID = os.getenv("ENCODING_PROFILE_PAID", "fast")  # "default", "fast" or "small" (see utils/encoding.py)
+ENCODING_PROFILE_FREE = os.getenv("ENCODING_PROFILE_FREE", "small")
+RESULT_CACHE_CONTROL = "public, max-age=31536000, immutable"  # Result blob names are content-hashed, so never rewritten
+PIXEL_SNAP_ENABLED = os.getenv("PIXEL_SNAP_ENABLED", "true").lower() == "true"  # Snap outputs to their pixel grid
+PIXEL_PALETTE_COLORS = 32  # Palette entries (including transparent) for snapped sprites
+PIXEL_GRID_MAX = 32  # Largest sprite pixel (in output pixels) to look for
+PIXEL_GRID_MIN_FIT = 0.8  # Share of edge gaps that must fit a grid to treat the output as pixel art
 
 # Compositing Configuration
 MINI_ME_SCALE = 0.3  # Mini-me is 30% of image height
@@ -45,7 +61,69 @@ MINI_ME_POSITION = "bottom-right"  # Default position
 WATERMARK_TEXT = "mini-me"
 WATERMARK_POSITION = "bottom-left"
 
+# Priority Lanes (paid jobs first; free jobs yield while paid work is waiting)
+FREE_LANE_YIELD_PAID_BACKLOG = 1  # Defer free jobs while at least this many paid jobs are queued
+FREE_LANE_MAX_DEFER_SECONDS = 300  # Never defer a free job that has already waited this long
+LANE_BACKLOG_CACHE_SECONDS = 5  # How long a paid-backlog count is reused
+
+# Bulk Jobs (style refreshes, creator packs; run by `python -m bulk`, see bulk.py)
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))  # Bulk jobs in flight at once
+BULK_YIELD_LIVE_BACKLOG = 1  # Don't start a bulk job while this many paid or free jobs are queued
+BULK_POLL_SECONDS = 10  # How often a paused runner re-checks the live queue
+
+# Job Concurrency (per instance; Cloud Run --concurrency must be >= WORKER_MAX_CONCURRENCY)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))  # Job slots at startup
+WORKER_MIN_CONCURRENCY = 1
+WORKER_MAX_CONCURRENCY = int(os.getenv("WORKER_MAX_CONCURRENCY", "4"))  # Memory bound: each job holds rembg buffers
+WORKER_CONCURRENCY_AUTOTUNE = os.getenv("WORKER_CONCURRENCY_AUTOTUNE", "false").lower() == "true"
+WORKER_TARGET_CPU_UTILIZATION = 0.8  # Size for this share of the instance's CPUs
+WORKER_AUTOTUNE_INTERVAL_SECONDS = 30  # How often CPU is sampled and slots are adjusted
+WORKER_AUTOTUNE_MIN_JOBS = 10  # Completed jobs needed before recommending a value
+WORKER_SLOT_WAIT_SECONDS = 30  # Wait this long for a free slot before handing the job back to Pub/Sub
+
+# Output Quality Checks (generated sprites)
+QUALITY_CHECK_MAX_SIDE = 256  # Quick checks run on a downscaled copy
+QUALITY_LARGE_COMPONENT_RATIO = 0.3  # Components at least this share of the largest count as extra characters
+QUALITY_MIN_COVERAGE = 0.02  # Less foreground than this is a near-empty output
+QUALITY_MAX_COVERAGE = 0.85  # More than this means the background wasn't separated
+QUALITY_MIN_MAIN_FRACTION = 0.03  # Main character must cover at least this share of the image
+QUALITY_MIN_ASPECT = 1.0  # Full-body figures are taller than wide (height / width)...
+QUALITY_MAX_ASPECT = 4.0  # ...but not a sliver
+
+QUALITY_MAX_REGENERATIONS = int(os.getenv("QUALITY_MAX_REGENERATIONS", "1"))  # Extra model calls per job when the output fails the check
+
+# Speculative Generation (paid jobs race K candidates; first good one wins)
+PAID_SPECULATIVE_CANDIDATES = int(os.getenv("PAID_SPECULATIVE_CANDIDATES", "1"))  # 1 = off
+SPECULATIVE_MAX_CANDIDATES = 4  # Hard cap on model calls per job
+SPECULATIVE_MODE = os.getenv("SPECULATIVE_MODE", "parallel")  # "parallel" (K calls) or "batch" (one call with n=K)
+
+# Image Providers (tried in order; see utils/providers.py)
+PROVIDER_ORDER = [p.strip() for p in os.getenv("PROVIDER_ORDER", "gpt_reference,claude_dalle").split(",") if p.strip()]
+PROVIDER_TIMEOUT_SECONDS = 120  # Give up on one provider call after this long
+PROVIDER_MAX_P95_SECONDS = 90  # Providers slower than this (rolling p95) are tried after healthy ones
+PROVIDER_MAX_ERROR_RATE = 0.5  # Rolling error rate that opens a provider's circuit...
+PROVIDER_MIN_SAMPLES = 5  # ...once it has at least this many calls
+PROVIDER_FAILURE_THRESHOLD = 3  # Consecutive failures that open a circuit
+PROVIDER_OPEN_SECONDS = 60  # How long an open circuit is skipped before a trial call
+
+# Single-Flight Generation (identical concurrent inputs share one generation; see utils/single_flight.py)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_SHARED = os.getenv("SINGLE_FLIGHT_SHARED", "true").lower() == "true"  # Also across instances (Firestore lease)
+SINGLE_FLIGHT_LEASE_SECONDS = 300  # A leader that hasn't finished by then is presumed dead
+SINGLE_FLIGHT_HANDOFF_SECONDS = 30  # How long jobs already waiting on a finished leader have to fetch its result
+SINGLE_FLIGHT_POLL_SECONDS = 2  # How often a job waiting on another instance checks the lease
+
+# Hedged Model Calls (a backup gpt-image-1 request when the first runs past the p90; see utils/hedging.py)
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_LANES = [l.strip() for l in os.getenv("HEDGE_LANES", "paid").split(",") if l.strip()]  # Lanes allowed to hedge
+HEDGE_MAX_PER_HOUR = int(os.getenv("HEDGE_MAX_PER_HOUR", "20"))  # Backup requests per instance per rolling hour
+HEDGE_PERCENTILE = 90  # Hedge once the first call is slower than this share of recent calls...
+HEDGE_MIN_SAMPLES = 20  # ...once that many calls have been seen
+HEDGE_MIN_DELAY_SECONDS = 10  # Never hedge sooner than this
+
 # AI Quality Settings
 VISION_ANALYSIS_MAX_TOKENS = 800  # Increased from 500 for richer analysis
 PROMPT_GENERATION_MAX_TOKENS = 400  # Increased from 200 for detailed prompts
 ENABLE_PROMPT_REFINEMENT = True  # Enable post-processing of prompts
+PROMPT_MEMO_MAX_ENTRIES = 256  # Memoized Claude prompts per instance (keyed by image digest)
+PROMPT_MEMO_TTL_SECONDS = 3600
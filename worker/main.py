@@ -4,17 +4,14 @@ Processes generation jobs from Pub/Sub queue
 """
 
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import base64
 import json
 import os
 import logging
 
-# Import pipeline
-from pipeline import run_pipeline
-from utils.firestore import update_job_status, get_job
-from rembg import new_session
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,23 +19,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Profile everything imported from here on (logged once startup finishes)
+from utils.startup import startup_profiler
+
+with startup_profiler.profile_imports():
+    from pipeline import run_pipeline
+    from utils.firestore import update_job_status, get_job
+    from utils.lanes import job_lane, queue_wait_seconds, should_defer, record_queue_wait
+    from utils.metrics import snapshot_all
+    from utils.concurrency import job_slots, record_stage_mix, run_concurrency_monitor, concurrency_snapshot
+    from utils.image_processing import warm_up
+    from utils.providers import provider_router
+    from utils.hedging import hedge_budget
+    from config import WORKER_SLOT_WAIT_SECONDS, REMBG_MODEL
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info("🚀 Mini-Me Worker starting up...")
-    logger.info("📦 Pre-loading rembg model (U2Net)...")
+    logger.info(f"📦 Pre-loading rembg model ({REMBG_MODEL})...")
 
-    # Pre-load rembg model into memory (faster processing)
+    # Load the shared rembg session and run one synthetic inference, so the
+    # first real job doesn't pay for model load and first-run JIT
     try:
-        new_session("u2net")
+        with startup_profiler.step("warm up"):
+            await warm_up()
         logger.info("✅ rembg model loaded successfully")
     except Exception as e:
         logger.error(f"❌ Failed to load rembg model: {str(e)}")
 
+    startup_profiler.log_summary()
+
+    # Track CPU utilization and (optionally) autotune job slots
+    monitor = asyncio.create_task(run_concurrency_monitor())
+
     yield
 
     # Shutdown
+    monitor.cancel()
     logger.info("👋 Mini-Me Worker shutting down...")
 
 app = FastAPI(
@@ -57,6 +76,30 @@ async def root():
         "version": "1.0.0"
     }
 
+@app.get("/warmup")
+async def warmup():
+    """
+    Warm the rembg session and isolation path (for startup probes)
+
+    Startup already does this; calling it again is cheap and confirms the
+    instance can process a job.
+    """
+    try:
+        return {"status": "warm", "timings_ms": await warm_up()}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Warm-up failed: {str(e)}")
+
+@app.get("/metrics")
+async def metrics():
+    """Rolling per-instance metrics (queue wait per lane, stage mix, job slots, provider health, hedge budget, cold start)"""
+    return {
+        **snapshot_all(),
+        "concurrency": concurrency_snapshot(),
+        "providers": provider_router.snapshot(),
+        "hedges_remaining": hedge_budget.remaining(),
+        "startup": startup_profiler.snapshot()
+    }
+
 @app.post("/process")
 async def process_job(request: Request):
     """
@@ -98,19 +141,45 @@ async def process_job(request: Request):
                 "message": f"Job already {current_status}, skipped duplicate processing"
             }
 
-        # Update job status to "processing"
-        await update_job_status(job_id, "processing")
-
-        # Run the pipeline
-        result = await run_pipeline(job_id)
-
-        # Update job status to "completed"
-        await update_job_status(
-            job_id,
-            "completed",
-            output_url=result['output_url'],
-            metadata=result['metadata']
-        )
+        # Free-tier jobs yield to waiting paid jobs (Pub/Sub redelivers later)
+        lane = job_lane(job, pubsub_message.get('attributes'))
+        waited = queue_wait_seconds(job)
+        if await should_defer(lane, waited):
+            logger.info(f"⏸️  Deferring {lane} job {job_id} (waited {int(waited)}s) - paid jobs waiting")
+            return JSONResponse(
+                status_code=429,
+                content={"status": "deferred", "job_id": job_id, "lane": lane}
+            )
+
+        # Wait for a job slot; if none frees up, Pub/Sub redelivers later
+        if not await job_slots.acquire(timeout=WORKER_SLOT_WAIT_SECONDS):
+            logger.info(f"⏸️  No free job slot for {job_id} ({job_slots.active}/{job_slots.limit} busy), deferring")
+            return JSONResponse(
+                status_code=429,
+                content={"status": "busy", "job_id": job_id}
+            )
+
+        try:
+            record_queue_wait(lane, waited)
+
+            # Update job status to "processing"
+            await update_job_status(job_id, "processing")
+
+            # Run the pipeline
+            result = await run_pipeline(job_id)
+            result['metadata']['lane'] = lane
+            result['metadata']['queue_wait_ms'] = int(waited * 1000)
+            record_stage_mix(result['metadata']['stage_timings_ms'])
+
+            # Update job status to "completed"
+            await update_job_status(
+                job_id,
+                "completed",
+                output_url=result['output_url'],
+                metadata=result['metadata']
+            )
+        finally:
+            await job_slots.release()
 
         logger.info(f"✅ Job {job_id} completed successfully")
 
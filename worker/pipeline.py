@@ -3,6 +3,8 @@ Main image processing pipeline
 Orchestrates: download → GPT-image-1 with reference → isolation → upload
 Note: Compositing now happens on frontend
 """
+import asyncio
+import os
 import time
 import uuid
 import logging
@@ -12,15 +14,43 @@ from config import (
     GCS_UPLOAD_BUCKET,
     GCS_RESULT_BUCKET,
     MINI_ME_SCALE,
-    MINI_ME_POSITION
+    MINI_ME_POSITION,
+    PAID_SPECULATIVE_CANDIDATES,
+    HEDGE_LANES,
+    SINGLE_FLIGHT_ENABLED,
+    ENCODING_PROFILE_PAID,
+    ENCODING_PROFILE_FREE,
+    RESULT_CACHE_CONTROL,
+    PIXEL_SNAP_ENABLED,
+    PIXEL_PALETTE_COLORS,
+    PIXEL_GRID_MAX,
+    PIXEL_GRID_MIN_FIT,
+    QUALITY_MAX_REGENERATIONS,
+    RENDITION_HEIGHTS,
+    THUMBNAIL_HEIGHT,
+    THUMBNAIL_WEBP_QUALITY
 )
 from utils.firestore import update_job_status, get_job
-from utils.gcs import download_from_gcs, upload_to_gcs
-from utils.image_processing import isolate_largest_character, add_watermark
-from utils.ai import generate_pixel_art_with_gpt_reference
+from utils.gcs import download_from_gcs, upload_to_gcs, content_hashed_name
+from utils.image_processing import isolate_largest_character, add_watermark, create_renditions
+from utils.providers import provider_router, provider_model
+from utils.metrics import timed_stage
+from utils.lanes import job_lane, PAID_LANE
+from utils.speculative import generate_first_good
+from utils.single_flight import single_flight
+from utils.digest import file_digest
+from utils.pixel_grid import snap_pixel_art
+from utils.encoding import encode_image, save_options
 
 logger = logging.getLogger(__name__)
 
+# Content types of the result files, by extension; not guessed, since
+# Python's built-in table has no .webp and results are cached immutable
+CONTENT_TYPES = {".png": "image/png", ".webp": "image/webp"}
+
+# Free-tier watermark (add_watermark arguments)
+WATERMARK = {"text": "mini-aura", "position": "bottom-right", "opacity": 0.6}
+
 
 async def run_pipeline(job_id: str) -> Dict[str, Any]:
     """
@@ -28,7 +58,8 @@ async def run_pipeline(job_id: str) -> Dict[str, Any]:
 
     Pipeline steps:
     1. Download input image from GCS
-    2. Generate pixel art with GPT-image-1 (uses source as reference)
+    2. Generate pixel art with GPT-image-1 (uses source as reference), failing
+       over to another provider when it is unhealthy
     3. Isolate largest character (removes duplicates + background)
     4. Upload isolated avatar to GCS
 
@@ -41,6 +72,7 @@ async def run_pipeline(job_id: str) -> Dict[str, Any]:
         Dictionary with output_url (None) and metadata containing avatar_url
     """
     start_time = time.time()
+    stage_timings = {}
     logger.info(f"🚀 Starting pipeline for job {job_id}")
 
     try:
@@ -51,45 +83,173 @@ async def run_pipeline(job_id: str) -> Dict[str, Any]:
 
         # STEP 1: Download input image from GCS
         logger.info(f"📥 Step 1/6: Downloading input image")
-        input_blob_name = f"{job_id}.jpg"  # Assuming uploaded as JPG
+        # Bulk jobs can reuse an earlier upload; API jobs upload as {job_id}.jpg
+        input_blob_name = job.get("input_blob") or f"{job_id}.jpg"
         input_path = f"/tmp/{job_id}_input.jpg"
 
-        await download_from_gcs(
-            bucket_name=GCS_UPLOAD_BUCKET,
-            blob_name=input_blob_name,
-            local_path=input_path
-        )
+        with timed_stage(stage_timings, "download"):
+            await download_from_gcs(
+                bucket_name=GCS_UPLOAD_BUCKET,
+                blob_name=input_blob_name,
+                local_path=input_path
+            )
 
         # STEP 2: Generate pixel art with GPT-image-1 (uses source as reference)
         # GPT-image-1 sees the actual image, so no need for Claude analysis/prompt generation
-        logger.info(f"🎨 Step 2/6: Generating pixel art with GPT-image-1")
-        pixel_art_path = f"/tmp/{job_id}_pixel.png"
-        await generate_pixel_art_with_gpt_reference(input_path, pixel_art_path)
-
         # STEP 3: Isolate largest character (removes duplicates + background)
-        logger.info(f"✂️  Step 3/4: Isolating largest character")
-        pixel_art_isolated_path = await isolate_largest_character(pixel_art_path)
+        # Steps 2-3 repeat (up to QUALITY_MAX_REGENERATIONS times) while the
+        # isolated result fails the quality check, so the user doesn't have to
 
-        # STEP 3.5: Apply watermark if using free credits
+        # Paid jobs can race several candidates and keep the first good one
+        lane = job_lane(job)
+        is_paid = lane == PAID_LANE
+        candidates = PAID_SPECULATIVE_CANDIDATES if is_paid else 1
+        # Lanes allowed to send a backup request when a model call runs long
+        hedge = lane in HEDGE_LANES
+        # The encoding profile also sets how every stage saves its PNGs
+        encoding_profile = ENCODING_PROFILE_PAID if is_paid else ENCODING_PROFILE_FREE
+        png_options = save_options(encoding_profile)
+
+        async def generate_isolated() -> Dict[str, Any]:
+            speculation = None
+            rejected = []
+
+            for attempt in range(1 + QUALITY_MAX_REGENERATIONS):
+                logger.info(f"🎨 Step 2/6: Generating pixel art (attempt {attempt + 1})")
+                pixel_art_path = f"/tmp/{job_id}_pixel.png"
+                with timed_stage(stage_timings, "generate"):
+                    # Speculation races gpt-image-1 calls, so only while it's the healthy choice;
+                    # otherwise the router picks (and fails over between) providers
+                    if candidates > 1 and provider_router.preferred() == "gpt_reference":
+                        pixel_art_path, speculation = await generate_first_good(input_path, pixel_art_path, candidates)
+                        provider = "gpt_reference"
+                    else:
+                        pixel_art_path, provider = await provider_router.generate(input_path, pixel_art_path, hedge=hedge)
+
+                logger.info(f"✂️  Step 3/4: Isolating largest character")
+                quality = {}
+                with timed_stage(stage_timings, "isolate"):
+                    pixel_art_isolated_path = await isolate_largest_character(
+                        pixel_art_path, quality=quality, png_options=png_options
+                    )
+
+                if quality.get("ok", True):
+                    break
+
+                rejected.append({"attempt": attempt + 1, "reasons": quality["reasons"]})
+                logger.warning(f"⚠️  Output failed quality check: {quality['reasons']}")
+
+            quality["attempts"] = attempt + 1
+            quality["rejected"] = rejected
+            return {"path": pixel_art_isolated_path, "provider": provider, "quality": quality, "speculation": speculation}
+
+        # Duplicate submissions of the same photo share one generation
+        if SINGLE_FLIGHT_ENABLED:
+            input_hash = await asyncio.to_thread(file_digest, input_path)
+            wait_start = time.perf_counter()
+            generated, leader_job_id = await single_flight.run(
+                input_hash, job_id, f"/tmp/{job_id}_isolated.png", generate_isolated
+            )
+            if leader_job_id:
+                logger.info(f"🔗 Reusing job {leader_job_id}'s generation")
+                stage_timings["coalesce"] = int((time.perf_counter() - wait_start) * 1000)
+        else:
+            generated, leader_job_id = await generate_isolated(), None
+
+        pixel_art_isolated_path = generated["path"]
+        provider = generated["provider"]
+        quality = generated["quality"]
+        speculation = generated["speculation"]
+
+        # STEP 3.25: Snap to the model's pixel grid and quantize the palette
+        # (a crisp true-resolution sprite, and a much smaller PNG)
         final_avatar_path = pixel_art_isolated_path
-        if job.get("has_watermark", False):
+        pixel_grid = None
+        if PIXEL_SNAP_ENABLED:
+            try:
+                with timed_stage(stage_timings, "pixelate"):
+                    pixel_grid = await snap_pixel_art(
+                        pixel_art_isolated_path,
+                        palette_colors=PIXEL_PALETTE_COLORS,
+                        max_grid=PIXEL_GRID_MAX,
+                        min_fit=PIXEL_GRID_MIN_FIT,
+                        png_options=png_options
+                    )
+            except Exception as e:
+                # Snapping is an enhancement; ship the unsnapped avatar rather than fail the job
+                logger.warning(f"⚠️  Pixel snapping failed, keeping the isolated avatar: {str(e)}")
+                pixel_grid = None
+            if pixel_grid and pixel_grid["grid_size"] > 1:
+                final_avatar_path = pixel_grid["upscaled_path"]
+
+        # STEP 3.5: Apply watermark if using free credits
+        has_watermark = job.get("has_watermark", False)
+        clean_avatar_path = final_avatar_path
+        if has_watermark:
             logger.info(f"💧 Step 3.5/4: Applying watermark (free tier)")
-            final_avatar_path = await add_watermark(
-                image_path=pixel_art_isolated_path,
-                text="mini-aura",
-                position="bottom-right",
-                opacity=0.6
+            with timed_stage(stage_timings, "watermark"):
+                final_avatar_path = await add_watermark(
+                    image_path=final_avatar_path, png_options=png_options, **WATERMARK
+                )
+
+        # STEP 3.75: Renditions near fixed heights + WebP thumbnail (lists don't need the full image)
+        # Scaled from the clean image, each watermarked at its own size (scaling
+        # the full-size watermark down would erase it)
+        with timed_stage(stage_timings, "renditions"):
+            rendition_paths = await create_renditions(
+                clean_avatar_path,
+                heights=RENDITION_HEIGHTS,
+                thumbnail_height=THUMBNAIL_HEIGHT,
+                thumbnail_quality=THUMBNAIL_WEBP_QUALITY,
+                pixel_size=pixel_grid["upscale"] if pixel_grid and pixel_grid["grid_size"] > 1 else 1,
+                watermark=WATERMARK if has_watermark else None,
+                png_options=png_options
             )
 
-        # STEP 4: Upload isolated avatar to GCS
+        # STEP 3.9: Encode the PNGs we upload (paid: fast, free: small by default)
+        png_renditions = [name for name, path in rendition_paths.items() if path.endswith(".png")]
+        with timed_stage(stage_timings, "encode"):
+            encoded = await asyncio.gather(
+                encode_image(final_avatar_path, encoding_profile),
+                *(encode_image(rendition_paths[name], encoding_profile, webp_copy=False) for name in png_renditions)
+            )
+        avatar_encoding = encoded[0]
+        for name, result in zip(png_renditions, encoded[1:]):
+            rendition_paths[name] = result["path"]
+
+        # STEP 4: Upload isolated avatar and renditions to GCS (in parallel)
         # Note: Compositing now happens on frontend for better UX and lower costs
         logger.info(f"📤 Step 4/4: Uploading isolated avatar to GCS")
-        avatar_blob_name = f"{job_id}_avatar.png"
-        avatar_url = await upload_to_gcs(
-            local_path=final_avatar_path,
-            bucket_name=GCS_RESULT_BUCKET,
-            blob_name=avatar_blob_name
-        )
+        # Blob names carry a content hash, so every object can be cached forever
+        uploads = {"avatar": (avatar_encoding["path"], f"{job_id}_avatar")}
+        if "webp_path" in avatar_encoding:
+            uploads["avatar_webp"] = (avatar_encoding["webp_path"], f"{job_id}_avatar")
+        for name, path in rendition_paths.items():
+            uploads[name] = (path, f"{job_id}_avatar_{name}")
+        # The sprite is unwatermarked, so free-tier jobs don't get it
+        if pixel_grid and pixel_grid["grid_size"] > 1 and not has_watermark:
+            uploads["sprite"] = (pixel_grid["sprite_path"], f"{job_id}_sprite")
+
+        with timed_stage(stage_timings, "upload"):
+            # Hashing reads every file, so keep it off the event loop
+            blob_names = await asyncio.gather(*(
+                asyncio.to_thread(content_hashed_name, path, prefix) for path, prefix in uploads.values()
+            ))
+            urls = await asyncio.gather(*(
+                upload_to_gcs(
+                    local_path=path,
+                    bucket_name=GCS_RESULT_BUCKET,
+                    blob_name=blob_name,
+                    content_type=CONTENT_TYPES[os.path.splitext(path)[1]],
+                    cache_control=RESULT_CACHE_CONTROL
+                )
+                for (path, _), blob_name in zip(uploads.values(), blob_names)
+            ))
+        urls = dict(zip(uploads, urls))
+        avatar_url = urls.pop("avatar")
+        thumbnail_url = urls.pop("thumbnail")
+        sprite_url = urls.pop("sprite", None)
+        avatar_webp_url = urls.pop("avatar_webp", None)
 
         # Calculate processing time
         processing_time = int((time.time() - start_time) * 1000)
@@ -97,10 +257,32 @@ async def run_pipeline(job_id: str) -> Dict[str, Any]:
         # Prepare metadata
         metadata = {
             "style": "everskies-pixel-art",
-            "model": "gpt-image-1",
+            "model": provider_model(provider),
+            "provider": provider,  # Image provider that produced the avatar (see utils/providers.py)
             "processing_time_ms": processing_time,
-            "avatar_url": avatar_url  # Isolated avatar for frontend compositing
+            "stage_timings_ms": stage_timings,
+            "avatar_url": avatar_url,  # Isolated avatar for frontend compositing
+            "renditions": urls,  # Height (px) -> URL
+            "thumbnail_url": thumbnail_url,
+            "quality": quality,
+            "encoding": {
+                "profile": encoding_profile,
+                "bytes": sum(result["bytes"] for result in encoded),
+                "bytes_saved": sum(result["source_bytes"] - result["bytes"] for result in encoded),
+                "encode_ms": round(sum(result["encode_ms"] for result in encoded), 1)
+            }
         }
+        if avatar_webp_url:
+            metadata["avatar_webp_url"] = avatar_webp_url  # Lossless WebP copy (small profile)
+        if speculation:
+            metadata["speculation"] = speculation
+        if leader_job_id:
+            metadata["coalesced_with"] = leader_job_id  # Job whose generation this one reused
+        if sprite_url:
+            metadata["sprite_url"] = sprite_url  # True-resolution indexed sprite
+            metadata["pixel_grid"] = {
+                key: pixel_grid[key] for key in ("grid_size", "upscale", "sprite_size", "palette_colors")
+            }
 
         logger.info(f"✅ Pipeline complete! Processing time: {processing_time}ms")
         logger.info(f"📦 Avatar URL: {avatar_url}")
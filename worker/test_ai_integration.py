@@ -33,7 +33,7 @@ if not os.getenv('CLAUDE_API_KEY'):
 
 async def test_claude_json_extraction():
     """Test that we can handle Claude's JSON responses"""
-    from utils.ai import extract_json_from_text
+    from utils.json_extract import extract_json_from_text
 
     print("\n📝 Testing JSON extraction...")
 
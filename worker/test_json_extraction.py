@@ -1,15 +1,21 @@
 """
 Simple manual test for JSON extraction (no dependencies needed)
 Run with: python3 test_json_extraction.py
+
+Also benchmarks the scanner against the regex extraction it replaced on
+pathological responses.
 """
 import json
 import re
+import time
 from typing import Dict, Optional
 
+from utils.json_extract import extract_json_from_text
+
 
-def extract_json_from_text(text: str) -> Optional[Dict]:
+def extract_json_with_regexes(text: str) -> Optional[Dict]:
     """
-    Extract JSON from text that may contain markdown code blocks or extra text
+    The previous extraction (fence regex, nested-brace regex, whole-text parse), kept as a baseline
     """
     # Try to find JSON in markdown code blocks first
     json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
@@ -78,6 +84,21 @@ def test_extract_json():
             "name": "Nested JSON",
             "input": '{"primary_colors": ["#FF0000"], "metadata": {"confidence": 0.9}}',
             "expected_keys": ["primary_colors", "metadata"]
+        },
+        {
+            "name": "Deeply nested JSON with surrounding text",
+            "input": 'Here: {"pose": {"body": {"arms": {"left": "up"}}}} done',
+            "expected_keys": ["pose"]
+        },
+        {
+            "name": "Braces in prose before the JSON",
+            "input": 'Fill in {name}: {"primary_colors": ["#FF0000"]}',
+            "expected_keys": ["primary_colors"]
+        },
+        {
+            "name": "JSON array",
+            "input": '["#FF0000", "#0000FF"]',
+            "expected_keys": None
         }
     ]
 
@@ -111,7 +132,30 @@ def test_extract_json():
     return failed == 0
 
 
+def benchmark_pathological():
+    """Time both extractions on responses that defeat the regexes"""
+
+    cases = {
+        "Unclosed code fences": "```json\n{" * 3000,
+        "Deeper than recursion limit": '{"a": ' * 2000 + "1" + "}" * 2000,
+        "Long preamble with braces": "{not json} " * 5000 + '{"pose": "standing"}',
+        "Object-like fragments": '{"k"} ' * 5000,
+        "Unterminated string": '{"pose": "' + "a" * 500000,
+    }
+
+    print(f"\n{'Input':<28}{'regexes (ms)':>14}{'scanner (ms)':>14}  found (regexes / scanner)")
+    for name, text in cases.items():
+        timings, found = [], []
+        for extract in (extract_json_with_regexes, extract_json_from_text):
+            start = time.perf_counter()
+            result = extract(text)
+            timings.append((time.perf_counter() - start) * 1000)
+            found.append("yes" if result else "no")
+        print(f"{name:<28}{timings[0]:>14.1f}{timings[1]:>14.1f}  {found[0]} / {found[1]}")
+
+
 if __name__ == "__main__":
     import sys
     success = test_extract_json()
+    benchmark_pathological()
     sys.exit(0 if success else 1)
@@ -4,11 +4,14 @@ Unit tests for AI utilities
 import pytest
 import sys
 import os
+import time
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils.ai import extract_json_from_text
+from utils import ai
+from utils.ai import generate_prompt_for_image, PromptMemo
+from utils.json_extract import JsonObjectScanner, extract_json_from_text
 
 
 class TestExtractJsonFromText:
@@ -105,6 +108,137 @@ Hope this helps!'''
         # Function only extracts objects, not arrays
         assert result is None
 
+    def test_deeply_nested_json(self):
+        """Test extracting an object nested deeper than two levels, with surrounding text"""
+        text = 'Analysis: {"a": {"b": {"c": {"d": 1}}}, "e": "}{"} Hope this helps'
+        result = extract_json_from_text(text)
+        assert result == {"a": {"b": {"c": {"d": 1}}}, "e": "}{"}
+
+    def test_skips_braces_in_prose(self):
+        """Test that a non-JSON {...} before the object is skipped"""
+        text = 'Fill in {name} below:\n```json\n{"pose": "standing"}\n```'
+        assert extract_json_from_text(text) == {"pose": "standing"}
+
+    def test_object_inside_unclosed_brace(self):
+        """Test that a complete object after a stray unclosed brace is still found"""
+        text = 'Note { the following: {"pose": "standing"}'
+        assert extract_json_from_text(text) == {"pose": "standing"}
+
+
+class TestJsonExtractionPathological:
+    """Test that extraction stays fast on inputs that make regexes backtrack"""
+
+    # Generous bound: these take milliseconds; the old regexes took seconds or failed
+    MAX_SECONDS = 1.0
+
+    @pytest.mark.parametrize("text", [
+        "```json\n{" + "}" * 20000 + "```{" * 2000,  # Unterminated fences, many closing braces
+        "{" * 50000 + "}" * 50000,  # Balanced braces, no valid object at any depth
+        '{"a":' * 5000 + "1" + "}" * 5000,  # Nesting deeper than the JSON parser's recursion limit
+        "{" + '"x": "' + "a" * 500000,  # Unterminated string
+        '{"k": 1, ' * 20000,  # Many truncated objects
+        '{"k"} ' * 10000,  # Many brace pairs that look like objects but aren't
+    ], ids=["fences", "braces", "deep", "unterminated", "truncated", "invalid"])
+    def test_pathological_input_is_fast(self, text):
+        """Test that pathological responses are rejected quickly"""
+        start = time.perf_counter()
+        extract_json_from_text(text)
+        assert time.perf_counter() - start < self.MAX_SECONDS
+
+    def test_large_valid_object_after_noise(self):
+        """Test that a large object after a long noisy preamble is still found"""
+        noise = "{not json} " * 10000
+        text = noise + '{"colors": [' + ", ".join(f'"#{i:06X}"' for i in range(10000)) + "]}"
+
+        start = time.perf_counter()
+        result = extract_json_from_text(text)
+        assert time.perf_counter() - start < self.MAX_SECONDS
+        assert len(result["colors"]) == 10000
+
+
+class TestJsonObjectScanner:
+    """Test incremental parsing of streamed responses"""
+
+    def test_object_split_across_chunks(self):
+        """Test that an object is returned as soon as its last chunk arrives"""
+        text = 'Sure! ```json\n{"pose": "standing", "quote": "a \\"b\\" {c}"}\n``` Anything else?'
+        scanner = JsonObjectScanner()
+        end = text.index("}\n```") + 1
+
+        results = [scanner.feed(text[i:i + 3]) for i in range(0, end, 3)]
+        assert all(result is None for result in results[:-1])
+        assert results[-1] == {"pose": "standing", "quote": 'a "b" {c}'}
+
+    def test_escape_split_across_chunks(self):
+        """Test that a backslash at the end of a chunk doesn't end the string early"""
+        scanner = JsonObjectScanner()
+        for chunk in ['{"a": "x\\', '"}', '"}']:
+            scanner.feed(chunk)
+        assert scanner.finish() == {"a": 'x"}'}
+
+    def test_finish_without_object(self):
+        """Test that a response with no object yields None"""
+        scanner = JsonObjectScanner()
+        scanner.feed("I can't analyze this image.")
+        assert scanner.finish() is None
+
+
+class TestPromptMemo:
+    """Test memoization of Claude analysis -> prompt per image"""
+
+    @pytest.fixture
+    def claude_calls(self, monkeypatch):
+        calls = []
+
+        async def fake_analyze(image_path):
+            calls.append("analyze")
+            return {"skin_tone": "medium"}
+
+        async def fake_prompt(analysis):
+            calls.append("prompt")
+            return f"pixel art, {analysis['skin_tone']} skin"
+
+        monkeypatch.setattr(ai, "analyze_image_with_claude", fake_analyze)
+        monkeypatch.setattr(ai, "generate_dalle_prompt", fake_prompt)
+        monkeypatch.setattr(ai, "prompt_memo", PromptMemo())
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_same_image_reuses_prompt(self, claude_calls, tmp_path):
+        """Test that a second prompt for the same image bytes skips both Claude calls"""
+        first, second = tmp_path / "a.jpg", tmp_path / "b.jpg"
+        first.write_bytes(b"photo")
+        second.write_bytes(b"photo")
+
+        assert await generate_prompt_for_image(str(first)) == "pixel art, medium skin"
+        assert await generate_prompt_for_image(str(second)) == "pixel art, medium skin"
+        assert claude_calls == ["analyze", "prompt"]
+
+    @pytest.mark.asyncio
+    async def test_prompt_version_change_misses(self, claude_calls, tmp_path, monkeypatch):
+        """Test that bumping PROMPT_VERSION invalidates memoized prompts"""
+        photo = tmp_path / "a.jpg"
+        photo.write_bytes(b"photo")
+
+        await generate_prompt_for_image(str(photo))
+        monkeypatch.setattr(ai, "PROMPT_VERSION", ai.PROMPT_VERSION + 1)
+        await generate_prompt_for_image(str(photo))
+        assert claude_calls == ["analyze", "prompt", "analyze", "prompt"]
+
+    def test_lru_eviction_and_expiry(self, monkeypatch):
+        """Test that the memo evicts its oldest entry and drops expired ones"""
+        memo = PromptMemo(max_entries=2, ttl_seconds=60)
+        memo.put("a", "A")
+        memo.put("b", "B")
+        memo.get("a")
+        memo.put("c", "C")
+        assert memo.get("b") is None
+        assert memo.get("a") == "A"
+
+        now = ai.time.monotonic()
+        monkeypatch.setattr(ai.time, "monotonic", lambda: now + 61)
+        assert memo.get("c") is None
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,157 @@
+"""
+Unit tests for the bulk job runner
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The runner imports the Firestore and GCS clients; point them at (unused) emulators
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'mini-aura-test')
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:0')
+os.environ.setdefault('STORAGE_EMULATOR_HOST', 'http://localhost:0')
+
+import bulk
+
+
+class FakeBulkStore:
+    """Job and batch documents in dicts, plus a scripted live backlog"""
+
+    def __init__(self, items, jobs=None, backlog=None):
+        self.batch = {"batch_id": "batch", "items": items, "status": "submitted", "completed": 0, "failed": 0}
+        self.jobs = dict(jobs or {})
+        self.backlog = list(backlog or [])  # Per poll: paid + free queued jobs, or an exception
+        self.backlog_polls = 0
+        self.pipeline_runs = []
+
+    async def get_batch(self, batch_id):
+        return self.batch
+
+    async def update_batch(self, batch_id, status=None, completed=0, failed=0):
+        if status:
+            self.batch["status"] = status
+        self.batch["completed"] += completed
+        self.batch["failed"] += failed
+
+    async def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def create_job(self, job_id, user_id, input_blob, lane, status="queued", has_watermark=False, batch_id=None):
+        self.jobs[job_id] = {"job_id": job_id, "user_id": user_id, "lane": lane, "status": status, "batch_id": batch_id}
+
+    async def update_job_status(self, job_id, status, **kwargs):
+        self.jobs[job_id]["status"] = status
+
+    async def count_queued_jobs(self, lane=None):
+        # Called for the paid lane then the free lane; the scripted total goes on paid
+        if lane == bulk.FREE_LANE:
+            return 0
+        self.backlog_polls += 1
+        backlog = self.backlog.pop(0) if self.backlog else 0
+        if isinstance(backlog, Exception):
+            raise backlog
+        return backlog
+
+    async def run_pipeline(self, job_id):
+        self.pipeline_runs.append(job_id)
+        if job_id.startswith("broken"):
+            raise RuntimeError("model error")
+        return {"output_url": None, "metadata": {}}
+
+
+@pytest.fixture
+def patch_store(monkeypatch):
+    def install(store):
+        for name in ("get_batch", "update_batch", "get_job", "create_job", "update_job_status",
+                     "count_queued_jobs", "run_pipeline"):
+            monkeypatch.setattr(bulk, name, getattr(store, name))
+        monkeypatch.setattr(bulk, "BULK_POLL_SECONDS", 0)
+        return store
+    return install
+
+
+def _item(job_id):
+    return {"job_id": job_id, "user_id": "creator", "input_blob": f"{job_id}.jpg", "has_watermark": False}
+
+
+class TestRunBatch:
+    """Test resuming, skipping and counting batch jobs"""
+
+    @pytest.mark.asyncio
+    async def test_counts_and_resume(self, patch_store):
+        """Test that finished jobs are skipped, interrupted ones resumed and failures counted"""
+        store = patch_store(FakeBulkStore(
+            items=[_item("done"), _item("interrupted"), _item("new"), _item("broken")],
+            jobs={
+                "done": {"status": "completed"},
+                "interrupted": {"status": "processing", "lane": bulk.BULK_LANE}
+            }
+        ))
+
+        counts = await bulk.run_batch("batch", concurrency=2)
+
+        assert counts == {"completed": 2, "failed": 1, "skipped": 1}
+        assert sorted(store.pipeline_runs) == ["broken", "interrupted", "new"]
+        assert store.jobs["new"]["lane"] == bulk.BULK_LANE
+        assert store.jobs["new"]["batch_id"] == "batch"
+        assert store.jobs["interrupted"]["status"] == "completed"
+        assert store.jobs["broken"]["status"] == "failed"
+        assert (store.batch["status"], store.batch["completed"], store.batch["failed"]) == ("done", 2, 1)
+
+    @pytest.mark.asyncio
+    async def test_rerun_skips_everything_finished(self, patch_store):
+        """Test that running a finished batch again runs nothing"""
+        store = patch_store(FakeBulkStore(items=[_item("new"), _item("broken")]))
+        await bulk.run_batch("batch", concurrency=1)
+
+        counts = await bulk.run_batch("batch", concurrency=1)
+
+        assert counts == {"completed": 0, "failed": 0, "skipped": 2}
+        assert len(store.pipeline_runs) == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_batch(self, patch_store, monkeypatch):
+        """Test that a missing batch is rejected"""
+        patch_store(FakeBulkStore(items=[]))
+
+        async def missing(batch_id):
+            return None
+        monkeypatch.setattr(bulk, "get_batch", missing)
+
+        with pytest.raises(ValueError):
+            await bulk.run_batch("nope")
+
+
+class TestWaitForIdleLiveLanes:
+    """Test yielding to live traffic"""
+
+    @pytest.mark.asyncio
+    async def test_waits_while_live_jobs_queued(self, patch_store):
+        """Test that bulk work waits until the live backlog drains"""
+        store = patch_store(FakeBulkStore(items=[], backlog=[3, 1, 0]))
+
+        await asyncio.wait_for(bulk.wait_for_idle_live_lanes(), 1)
+
+        assert store.backlog_polls == 3
+
+    @pytest.mark.asyncio
+    async def test_pauses_while_backlog_unknown(self, patch_store):
+        """Test that a failing backlog count pauses bulk work instead of letting it run"""
+        store = patch_store(FakeBulkStore(items=[], backlog=[RuntimeError("firestore down")] * 2))
+
+        await asyncio.wait_for(bulk.wait_for_idle_live_lanes(), 1)
+
+        assert store.backlog_polls == 3
+
+    @pytest.mark.asyncio
+    async def test_jobs_start_only_when_idle(self, patch_store):
+        """Test that the runner doesn't start a job until live lanes are idle"""
+        store = patch_store(FakeBulkStore(items=[_item("new")], backlog=[2, 2, 0]))
+
+        await bulk.run_batch("batch", concurrency=1)
+
+        assert store.backlog_polls == 3
+        assert store.pipeline_runs == ["new"]
@@ -0,0 +1,54 @@
+"""
+Unit tests for the component labelling backends
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from bench.fixtures import make_sprite
+from utils.components import ISOLATION_BACKENDS, label_components
+
+
+def _summary(components):
+    """Backend-independent view: (area, box) per component, sorted"""
+    return sorted((int(area), tuple(int(v) for v in box)) for area, box in zip(components.areas, components.boxes))
+
+
+class TestLabelComponents:
+    """Test that every backend finds the same components"""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_backends_agree_on_random_masks(self, seed):
+        """Test that areas and boxes match on noisy masks (4-connectivity)"""
+        mask = np.random.default_rng(seed).random((97, 131)) > 0.55
+        results = [_summary(label_components(mask, backend)) for backend in ISOLATION_BACKENDS]
+        assert all(result == results[0] for result in results)
+
+    @pytest.mark.parametrize("backend", list(ISOLATION_BACKENDS))
+    def test_sprite_sheet(self, backend):
+        """Test that labels, areas and boxes describe the same components"""
+        mask = np.asarray(make_sprite(512, 5))[:, :, 3] > 128
+        components = label_components(mask, backend)
+
+        assert components.count == 5
+        for label, (area, (y_min, y_max, x_min, x_max)) in enumerate(zip(components.areas, components.boxes), 1):
+            region = components.labeled == label
+            assert region.sum() == area
+            assert region[y_min:y_max, x_min:x_max].sum() == area
+
+    @pytest.mark.parametrize("backend", list(ISOLATION_BACKENDS))
+    def test_empty_mask(self, backend):
+        """Test that an empty mask has no components"""
+        components = label_components(np.zeros((8, 8), dtype=bool), backend)
+        assert components.count == 0
+        assert components.boxes.shape == (0, 4)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend is rejected"""
+        with pytest.raises(ValueError):
+            label_components(np.zeros((8, 8), dtype=bool), "skimage")
@@ -0,0 +1,83 @@
+"""
+Unit tests for job slots and concurrency recommendations
+"""
+import asyncio
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import WORKER_MAX_CONCURRENCY, WORKER_MIN_CONCURRENCY
+from utils.concurrency import JobSlots, recommend_concurrency, next_limit
+
+
+class TestRecommendConcurrency:
+    """Test the N * U * (1 + W/C) sizing"""
+
+    def test_io_heavy_mix(self):
+        """Test that waiting on the model allows more jobs per CPU"""
+        # 2 CPUs at 80%, 1s of I/O per 1s of CPU -> 3.2 slots
+        assert recommend_concurrency(2, 1000, 1000, 0.8) == min(3, WORKER_MAX_CONCURRENCY)
+
+    def test_cpu_bound_mix(self):
+        """Test that a CPU-bound mix stays near the CPU count"""
+        assert recommend_concurrency(2, 0, 1000, 1.0) == min(2, WORKER_MAX_CONCURRENCY)
+
+    def test_bounds(self):
+        """Test that recommendations are clamped to the configured range"""
+        assert recommend_concurrency(2, 60000, 100) == WORKER_MAX_CONCURRENCY
+        assert recommend_concurrency(0.5, 0, 1000, 0.5) == WORKER_MIN_CONCURRENCY
+        assert recommend_concurrency(2, 1000, 0) == WORKER_MAX_CONCURRENCY
+
+
+class TestNextLimit:
+    """Test autotune steps"""
+
+    def test_steps_one_slot_at_a_time(self):
+        """Test that the limit moves by one towards the recommendation"""
+        assert next_limit(1, 4, 0.3) == 2
+        assert next_limit(4, 1, 0.3) == 3
+        assert next_limit(2, None, 0.3) == 2
+
+    def test_no_growth_when_busy(self):
+        """Test that slots aren't added at or above the target utilization"""
+        assert next_limit(2, 4, 0.85) == 2
+
+    def test_sheds_when_saturated(self):
+        """Test that a saturated instance sheds a slot regardless"""
+        assert next_limit(3, 4, 0.99) == 2
+
+
+class TestJobSlots:
+    """Test the resizable slot limiter"""
+
+    def test_acquire_times_out_when_full(self):
+        """Test that acquire gives up when no slot frees up"""
+        async def run():
+            slots = JobSlots(1)
+            assert await slots.acquire(timeout=0.1)
+            assert not await slots.acquire(timeout=0.05)
+            assert slots.active == 1
+            assert slots.waiting == 0
+
+        asyncio.run(run())
+
+    def test_resize_wakes_waiters(self):
+        """Test that growing the limit lets a waiting job start"""
+        async def run():
+            slots = JobSlots(1)
+            await slots.acquire()
+            waiter = asyncio.create_task(slots.acquire(timeout=1))
+            await asyncio.sleep(0.01)
+            assert slots.waiting == 1
+
+            await slots.resize(2)
+            assert await waiter
+            assert slots.active == 2
+
+            await slots.release()
+            await slots.release()
+            assert slots.active == 0
+
+        asyncio.run(run())
@@ -0,0 +1,86 @@
+"""
+Unit tests for output encoding profiles
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+import numpy as np
+
+from bench.fixtures import make_sprite
+from utils.encoding import ENCODING_PROFILES, encode_image, save_options
+
+
+class TestEncodeImage:
+    """Test encoding with each profile"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("profile", list(ENCODING_PROFILES))
+    async def test_lossless(self, tmp_path, profile):
+        """Test that every profile decodes to the same pixels"""
+        path = str(tmp_path / "job_isolated.png")
+        make_sprite(256, 1, pixel_size=8).save(path)
+
+        result = await encode_image(path, profile)
+
+        source = np.asarray(Image.open(path).convert("RGBA"))
+        assert np.array_equal(np.asarray(Image.open(result["path"]).convert("RGBA")), source)
+        if "webp_path" in result:
+            assert np.array_equal(np.asarray(Image.open(result["webp_path"]).convert("RGBA")), source)
+
+    @pytest.mark.asyncio
+    async def test_small_beats_fast(self, tmp_path):
+        """Test that the small profile indexes a sprite and is smaller than fast"""
+        path = str(tmp_path / "job_isolated.png")
+        make_sprite(512, 1, pixel_size=8).save(path)
+
+        fast = await encode_image(path, "fast")
+        small = await encode_image(path, "small")
+
+        assert small["indexed"]
+        assert Image.open(small["path"]).mode == "P"
+        assert small["bytes"] < fast["bytes"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("profile", ["default", "fast"])
+    async def test_keeps_saved_file(self, tmp_path, profile):
+        """Test that default and fast upload the file as saved instead of re-encoding it"""
+        path = str(tmp_path / "job_isolated.png")
+        make_sprite(256, 1, pixel_size=8).save(path)
+        mtime = os.path.getmtime(path)
+
+        result = await encode_image(path, profile)
+
+        assert result["path"] == path
+        assert result["bytes"] == result["source_bytes"] == os.path.getsize(path)
+        assert os.path.getmtime(path) == mtime
+        assert len(os.listdir(tmp_path)) == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_profile(self, tmp_path):
+        """Test that an unknown profile is rejected"""
+        with pytest.raises(ValueError):
+            await encode_image(str(tmp_path / "missing.png"), "tiny")
+
+
+class TestSaveOptions:
+    """Test the PNG options each profile gives the earlier stages"""
+
+    def test_fast_saves_at_low_zlib_level(self, tmp_path):
+        """Test that fast stages save quicker, bigger PNGs and default keeps stage defaults"""
+        assert save_options("default") is None
+        assert save_options("fast") == {"compress_level": 1}
+
+        img = make_sprite(512, 1, pixel_size=8)
+        img.save(tmp_path / "default.png", "PNG")
+        img.save(tmp_path / "fast.png", "PNG", **save_options("fast"))
+        assert os.path.getsize(tmp_path / "fast.png") > os.path.getsize(tmp_path / "default.png")
+
+    def test_unknown_profile(self):
+        """Test that an unknown profile is rejected"""
+        with pytest.raises(ValueError):
+            save_options("tiny")
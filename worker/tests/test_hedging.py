@@ -0,0 +1,72 @@
+"""
+Unit tests for hedged model calls
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import hedging
+from utils.hedging import HedgeBudget, hedged_call
+from utils.metrics import RollingStats
+
+
+class SlowThenFast:
+    """Model call whose first request stalls and later ones return quickly"""
+
+    def __init__(self, first_latency: float, latency: float = 0.01):
+        self.first_latency = first_latency
+        self.latency = latency
+        self.paths = []
+
+    async def __call__(self, output_path: str) -> str:
+        latency = self.first_latency if not self.paths else self.latency
+        self.paths.append(output_path)
+        await asyncio.sleep(latency)
+        with open(output_path, "w") as f:
+            f.write(output_path)
+        return output_path
+
+
+@pytest.fixture
+def hedging_on(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "hedge_delay", lambda: 0.05)
+    monkeypatch.setattr(hedging, "hedge_budget", HedgeBudget(per_hour=1))
+    monkeypatch.setattr(hedging, "get_stats", lambda name, stats={}: stats.setdefault(name, RollingStats()))
+
+
+class TestHedgedCall:
+    """Test the backup request, budget and tier restriction"""
+
+    @pytest.mark.asyncio
+    async def test_backup_wins_when_first_call_stalls(self, hedging_on, tmp_path):
+        """Test that a stalled call is hedged and the backup's image ends up at the output path"""
+        output_path = str(tmp_path / "job_pixel.png")
+        call = SlowThenFast(first_latency=5)
+
+        assert await asyncio.wait_for(hedged_call(call, output_path, hedge=True), 1) == output_path
+        assert len(call.paths) == 2
+        with open(output_path) as f:
+            assert f.read() == str(tmp_path / "job_pixel_hedge.png")
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_for_restricted_tier(self, hedging_on, tmp_path):
+        """Test that a job whose lane may not hedge waits for its single call"""
+        call = SlowThenFast(first_latency=0.2)
+
+        await hedged_call(call, str(tmp_path / "job_pixel.png"), hedge=False)
+        assert len(call.paths) == 1
+
+    @pytest.mark.asyncio
+    async def test_budget_limits_hedges(self, hedging_on, tmp_path):
+        """Test that hedging stops once the hourly budget is spent"""
+        first, second = SlowThenFast(first_latency=0.2), SlowThenFast(first_latency=0.2)
+
+        await hedged_call(first, str(tmp_path / "a.png"), hedge=True)
+        await hedged_call(second, str(tmp_path / "b.png"), hedge=True)
+        assert len(first.paths) == 2
+        assert len(second.paths) == 1
@@ -0,0 +1,81 @@
+"""
+Unit tests for image processing helpers
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+import numpy as np
+
+from bench.fixtures import make_sprite
+from utils.image_processing import create_renditions
+
+
+class TestRenditions:
+    """Test fixed-height renditions and the WebP thumbnail"""
+
+    @pytest.mark.asyncio
+    async def test_heights_and_formats(self, tmp_path):
+        """Test that renditions are whole-number scales of the sprite nearest each height"""
+        path = str(tmp_path / "job_isolated.png")
+        # A 25x50 sprite drawn at 8px per sprite pixel
+        make_sprite(400, pixel_size=8).crop((96, 0, 296, 400)).save(path)
+        sprite = Image.open(path).resize((25, 50), Image.Resampling.NEAREST)
+
+        outputs = await create_renditions(path, heights=(64, 512), thumbnail_height=32, pixel_size=8)
+
+        assert set(outputs) == {"64", "512", "thumbnail"}
+        for key, scale in (("64", 1), ("512", 10)):
+            img = Image.open(outputs[key])
+            assert img.mode == "RGBA"
+            assert img.size == (25 * scale, 50 * scale)
+            # Every sprite pixel is an even scale x scale block
+            expected = sprite.resize((25 * scale, 50 * scale), Image.Resampling.NEAREST)
+            assert np.array_equal(np.asarray(img), np.asarray(expected))
+
+        thumb = Image.open(outputs["thumbnail"])
+        assert thumb.format == "WEBP"
+        assert thumb.size == (12, 25)
+
+    @pytest.mark.asyncio
+    async def test_unsnapped_image_scales_by_whole_divisors(self, tmp_path):
+        """Test that without a grid, heights float to an integer reduction of the image"""
+        path = str(tmp_path / "job_isolated.png")
+        make_sprite(700).save(path)
+
+        outputs = await create_renditions(path, heights=(64, 512), thumbnail_height=128)
+
+        # Every 11th, 2nd and 6th row are the closest whole reductions to 64, 512 and 128
+        assert Image.open(outputs["64"]).height == 64
+        assert Image.open(outputs["512"]).height == 350
+        assert Image.open(outputs["thumbnail"]).height == 117
+
+        # Nearest-neighbour: no colours that weren't in the source
+        source_colours = {c for _, c in Image.open(path).getcolors(1 << 16)}
+        assert {c for _, c in Image.open(outputs["64"]).getcolors(1 << 16)} <= source_colours
+
+    @pytest.mark.asyncio
+    async def test_watermark_survives_smallest_rendition(self, tmp_path):
+        """Test that each rendition is watermarked at its own size, so even the smallest shows the text"""
+        os.makedirs(tmp_path / "clean")
+        os.makedirs(tmp_path / "marked")
+        sprite = make_sprite(1024, pixel_size=8).crop((256, 0, 768, 1024))
+        sprite.save(tmp_path / "clean" / "job_snapped.png")
+        sprite.save(tmp_path / "marked" / "job_snapped.png")
+        watermark = {"text": "mini-aura", "position": "bottom-right", "opacity": 0.6}
+
+        clean = await create_renditions(str(tmp_path / "clean" / "job_snapped.png"), heights=(64,), pixel_size=8)
+        marked = await create_renditions(
+            str(tmp_path / "marked" / "job_snapped.png"), heights=(64,), pixel_size=8, watermark=watermark
+        )
+
+        changed = np.any(
+            np.asarray(Image.open(clean["64"])) != np.asarray(Image.open(marked["64"])), axis=2
+        )
+        # Legible text strokes, in the bottom rows
+        assert changed.sum() > 100
+        assert not changed[:48].any()
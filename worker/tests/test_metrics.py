@@ -0,0 +1,58 @@
+"""
+Unit tests for rolling metrics
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import metrics
+from utils.metrics import RollingStats
+
+
+class TestRollingStats:
+    """Test percentile and window behaviour"""
+
+    def test_empty(self):
+        """Test that an empty window reports no values"""
+        stats = RollingStats()
+        assert stats.percentile(95) is None
+        assert stats.mean() is None
+        assert stats.snapshot()["count"] == 0
+
+    def test_nearest_rank_percentiles(self):
+        """Test nearest-rank percentiles over 1..100"""
+        stats = RollingStats()
+        for value in range(1, 101):
+            stats.record(value)
+        assert stats.percentile(50) == 50
+        assert stats.percentile(95) == 95
+        assert stats.percentile(100) == 100
+        assert stats.snapshot()["p99"] == 99
+
+    def test_max_samples_bounds_window(self):
+        """Test that old samples fall out of a bounded window"""
+        stats = RollingStats(max_samples=3)
+        for value in [100, 1, 2, 3]:
+            stats.record(value)
+        assert stats.count() == 3
+        assert stats.snapshot()["max"] == 3
+
+    def test_max_age_expires_samples(self, monkeypatch):
+        """Test that samples older than max_age_seconds are dropped"""
+        now = [1000.0]
+        monkeypatch.setattr(metrics.time, "monotonic", lambda: now[0])
+
+        stats = RollingStats(max_age_seconds=60)
+        stats.record(5)
+        now[0] += 30
+        stats.record(7)
+        now[0] += 45
+        assert stats.count() == 1
+        assert stats.percentile(50) == 7
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+"""
+Unit tests for the pipeline, run against the bench's local stand-ins
+"""
+import pytest
+import sys
+import os
+import uuid
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The pipeline imports the Firestore and GCS clients; point them at (unused) emulators
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'mini-aura-test')
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:0')
+os.environ.setdefault('STORAGE_EMULATOR_HOST', 'http://localhost:0')
+
+from bench.fakes import FakeImageModel, LocalGCS, InMemoryFirestore
+from bench.fixtures import make_photo
+from config import GCS_UPLOAD_BUCKET
+from utils import providers, speculative
+from utils.single_flight import single_flight
+import pipeline
+
+
+@pytest.fixture
+def services(tmp_path, monkeypatch):
+    """Fake model, GCS and Firestore swapped into the pipeline (as bench.fakes.install does)"""
+    model = FakeImageModel(str(tmp_path / "canned"), latency=0, variants=1)
+    gcs = LocalGCS(str(tmp_path / "gcs"))
+    firestore = InMemoryFirestore()
+
+    monkeypatch.setitem(providers.PROVIDERS, "gpt_reference", (model, "gpt-image-1"))
+    monkeypatch.setattr(speculative, "generate_pixel_art_with_gpt_reference", model)
+    monkeypatch.setattr(pipeline, "download_from_gcs", gcs.download_from_gcs)
+    async def upload_to_gcs(local_path, bucket_name, blob_name, **kwargs):
+        gcs.content_types[blob_name] = kwargs.get("content_type")
+        return await LocalGCS.upload_to_gcs(gcs, local_path, bucket_name, blob_name, **kwargs)
+
+    gcs.content_types = {}
+    monkeypatch.setattr(pipeline, "upload_to_gcs", upload_to_gcs)
+    monkeypatch.setattr(pipeline, "get_job", firestore.get_job)
+    monkeypatch.setattr(pipeline, "update_job_status", firestore.update_job_status)
+    monkeypatch.setattr(single_flight, "shared", False)
+
+    def add_job(has_watermark: bool) -> str:
+        job_id = str(uuid.uuid4())
+        photo_path = str(tmp_path / f"{job_id}.jpg")
+        make_photo(256, seed=len(firestore.jobs)).save(photo_path, "JPEG")
+        gcs.put(GCS_UPLOAD_BUCKET, f"{job_id}.jpg", photo_path)
+        firestore.add_job(job_id, has_watermark=has_watermark)
+        return job_id
+
+    add_job.gcs = gcs
+    return add_job
+
+
+class TestPipeline:
+    """Test what the pipeline publishes per tier"""
+
+    @pytest.mark.asyncio
+    async def test_paid_job_gets_sprite(self, services):
+        """Test that a job without a watermark gets the true-resolution sprite"""
+        result = await pipeline.run_pipeline(services(has_watermark=False))
+
+        metadata = result["metadata"]
+        assert metadata["sprite_url"]
+        assert metadata["pixel_grid"]["grid_size"] > 1
+
+    @pytest.mark.asyncio
+    async def test_free_job_gets_no_clean_sprite(self, services):
+        """Test that a watermarked job's metadata has no unwatermarked sprite URL"""
+        result = await pipeline.run_pipeline(services(has_watermark=True))
+
+        metadata = result["metadata"]
+        assert "sprite_url" not in metadata
+        assert not any("_sprite" in url for url in metadata["renditions"].values())
+
+    @pytest.mark.asyncio
+    async def test_uploads_have_explicit_content_types(self, services):
+        """Test that PNG and WebP results upload as image types, not guessed ones"""
+        await pipeline.run_pipeline(services(has_watermark=True))
+
+        content_types = services.gcs.content_types
+        assert any(name.endswith(".webp") for name in content_types)
+        for name, content_type in content_types.items():
+            expected = "image/webp" if name.endswith(".webp") else "image/png"
+            assert content_type == expected, name
@@ -0,0 +1,91 @@
+"""
+Unit tests for pixel-grid snapping and palette quantization
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+import numpy as np
+
+from bench.fixtures import make_sprite, make_photo
+from utils.pixel_grid import detect_grid, snap_to_grid, quantize_palette, snap_pixel_art
+
+
+def _resampled_sprite(pixel_size: int) -> Image.Image:
+    """A sprite drawn at 1024px, resampled to 1000px and shifted off the grid"""
+    src = make_sprite(1024, 5, pixel_size=pixel_size, seed=3)
+    return src.resize((1000, 1000), Image.Resampling.BILINEAR).crop((5, 3, 1000, 1000))
+
+
+class TestDetectGrid:
+    """Test grid detection on upscaled pixel art"""
+
+    @pytest.mark.parametrize("pixel_size", [4, 8, 16])
+    def test_fractional_blurred_grid(self, pixel_size):
+        """Test that the size is recovered from a blurred, misaligned grid"""
+        size, _, _ = detect_grid(_resampled_sprite(pixel_size))
+        assert size == pytest.approx(pixel_size * 1000 / 1024, rel=0.03)
+
+    def test_exact_grid_round_trips(self):
+        """Test that snapping a clean upscale recovers the original sprite"""
+        src = make_sprite(1024, 1, pixel_size=16, seed=1)
+        sprite = snap_to_grid(src, *detect_grid(src))
+
+        truth = src.resize((64, 64), Image.Resampling.NEAREST)
+        assert sprite.size == truth.size
+        assert np.array_equal(np.asarray(sprite), np.asarray(truth))
+
+    def test_photo_has_no_grid(self):
+        """Test that a photo isn't mistaken for pixel art"""
+        assert detect_grid(make_photo(512).convert("RGBA"))[0] == 1.0
+
+    @pytest.mark.parametrize("size", [(1, 1), (1, 64), (64, 1), (8, 8)])
+    def test_tiny_image_has_no_grid(self, size):
+        """Test that images too small to show a grid aren't snapped (and don't crash)"""
+        assert detect_grid(Image.new("RGBA", size, (255, 0, 0, 255)))[0] == 1.0
+
+
+class TestQuantizePalette:
+    """Test palette reduction"""
+
+    def test_palette_limit_and_transparency(self):
+        """Test that at most N colours are used and index 0 is the background"""
+        sprite = snap_to_grid(_resampled_sprite(8), *detect_grid(_resampled_sprite(8)))
+        indexed = quantize_palette(sprite, colors=16)
+
+        assert indexed.mode == "P"
+        assert indexed.info["transparency"] == 0
+        assert len(indexed.getcolors(256)) <= 16
+
+        alpha = np.asarray(sprite)[..., 3]
+        assert np.array_equal(np.asarray(indexed) == 0, alpha == 0)
+
+
+class TestSnapPixelArt:
+    """Test the snapping step end to end"""
+
+    @pytest.mark.asyncio
+    async def test_outputs_are_smaller(self, tmp_path):
+        """Test that the sprite and its upscale are much smaller than the input"""
+        path = str(tmp_path / "job_isolated.png")
+        _resampled_sprite(8).save(path)
+
+        result = await snap_pixel_art(path, palette_colors=32)
+
+        assert result["grid_size"] > 1
+        assert result["sprite_size"] == list(Image.open(result["sprite_path"]).size)
+        assert os.path.getsize(result["sprite_path"]) < os.path.getsize(path) / 10
+        assert os.path.getsize(result["upscaled_path"]) < os.path.getsize(path)
+
+    @pytest.mark.asyncio
+    async def test_photo_is_left_alone(self, tmp_path):
+        """Test that nothing is written when no grid is found"""
+        path = str(tmp_path / "job_isolated.png")
+        make_photo(256).save(path)
+
+        assert await snap_pixel_art(path) == {"grid_size": 1}
+        assert os.listdir(tmp_path) == ["job_isolated.png"]
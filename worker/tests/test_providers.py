@@ -0,0 +1,127 @@
+"""
+Unit tests for image provider routing and circuit breaking
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import PROVIDER_FAILURE_THRESHOLD, PROVIDER_MIN_SAMPLES, PROVIDER_MAX_P95_SECONDS
+from utils import providers
+from utils.providers import ProviderRouter, CLOSED, OPEN
+
+
+class StubProvider:
+    """Generator that fails while `failing` is set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+        self.latency = 0.0
+
+    async def __call__(self, reference_image_path: str, output_path: str, hedge: bool = False) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failing:
+            raise RuntimeError("brownout")
+        return output_path
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    primary, secondary = StubProvider(), StubProvider()
+    monkeypatch.setitem(providers.PROVIDERS, "gpt_reference", (primary, "gpt-image-1"))
+    monkeypatch.setitem(providers.PROVIDERS, "claude_dalle", (secondary, "dall-e-3"))
+    return primary, secondary
+
+
+class TestProviderRouter:
+    """Test failover, circuit breaking and latency ranking"""
+
+    @pytest.mark.asyncio
+    async def test_fails_over_to_secondary(self, stubs):
+        """Test that a failing primary falls back to the next provider"""
+        primary, secondary = stubs
+        primary.failing = True
+        router = ProviderRouter(["gpt_reference", "claude_dalle"])
+
+        assert await router.generate("in.jpg", "out.png") == ("out.png", "claude_dalle")
+        assert primary.calls == 1 and secondary.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_circuit_opens_and_recovers(self, stubs, monkeypatch):
+        """Test that an open circuit skips the primary until a trial call succeeds"""
+        primary, secondary = stubs
+        primary.failing = True
+        router = ProviderRouter(["gpt_reference", "claude_dalle"])
+
+        for _ in range(PROVIDER_FAILURE_THRESHOLD):
+            await router.generate("in.jpg", "out.png")
+        assert router.health["gpt_reference"].state == OPEN
+
+        # Open: the primary isn't called at all
+        await router.generate("in.jpg", "out.png")
+        assert primary.calls == PROVIDER_FAILURE_THRESHOLD
+
+        # After the cool-down one trial goes through and closes the circuit
+        monkeypatch.setattr(providers, "PROVIDER_OPEN_SECONDS", 0)
+        primary.failing = False
+        assert await router.generate("in.jpg", "out.png") == ("out.png", "gpt_reference")
+        assert router.health["gpt_reference"].state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_is_released(self, stubs, monkeypatch):
+        """Test that cancelling a half-open trial call lets the next call try the provider again"""
+        primary, secondary = stubs
+        primary.failing = True
+        router = ProviderRouter(["gpt_reference", "claude_dalle"])
+
+        for _ in range(PROVIDER_FAILURE_THRESHOLD):
+            await router.generate("in.jpg", "out.png")
+        assert router.health["gpt_reference"].state == OPEN
+
+        # The trial call is cancelled mid-flight (e.g. it lost a race)
+        monkeypatch.setattr(providers, "PROVIDER_OPEN_SECONDS", 0)
+        primary.failing = False
+        primary.latency = 5
+        trial = asyncio.create_task(router.generate("in.jpg", "out.png"))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        primary.latency = 0
+        assert await router.generate("in.jpg", "out.png") == ("out.png", "gpt_reference")
+        assert router.health["gpt_reference"].state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_is_last_resort(self, stubs):
+        """Test that open providers are still tried when everything else fails"""
+        primary, secondary = stubs
+        primary.failing = True
+        secondary.failing = True
+        router = ProviderRouter(["gpt_reference", "claude_dalle"])
+
+        for _ in range(PROVIDER_FAILURE_THRESHOLD):
+            with pytest.raises(RuntimeError):
+                await router.generate("in.jpg", "out.png")
+
+        primary.failing = False
+        assert await router.generate("in.jpg", "out.png") == ("out.png", "gpt_reference")
+
+    def test_slow_provider_ranks_last(self, stubs):
+        """Test that a provider whose p95 is over the limit is tried after healthy ones"""
+        router = ProviderRouter(["gpt_reference", "claude_dalle"])
+        for _ in range(PROVIDER_MIN_SAMPLES):
+            router.health["gpt_reference"].record_success(PROVIDER_MAX_P95_SECONDS * 1000 + 1)
+
+        assert router.ranked() == ["claude_dalle", "gpt_reference"]
+        assert router.preferred() == "claude_dalle"
+
+    def test_unknown_provider(self):
+        """Test that an unknown provider name is rejected"""
+        with pytest.raises(ValueError):
+            ProviderRouter(["midjourney"])
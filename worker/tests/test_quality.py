@@ -0,0 +1,129 @@
+"""
+Unit tests for sprite quality checks
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from PIL import Image
+
+from bench.fixtures import make_sprite
+from utils.quality import foreground_mask, sprite_stats, quality_verdict, quick_check
+
+
+def _mask(height=100, width=100):
+    return np.zeros((height, width), dtype=bool)
+
+
+class TestQualityVerdict:
+    """Test each failure mode on hand-drawn masks"""
+
+    def test_single_standing_figure_passes(self):
+        """Test that one tall, centred figure is accepted"""
+        mask = _mask()
+        mask[10:90, 35:65] = True
+        verdict = quality_verdict(sprite_stats(mask))
+        assert verdict == {"ok": True, "reasons": []}
+
+    def test_character_sheet(self):
+        """Test that two similar-sized figures are flagged"""
+        mask = _mask()
+        mask[10:90, 10:40] = True
+        mask[10:85, 60:88] = True
+        assert "multiple_characters" in quality_verdict(sprite_stats(mask))["reasons"]
+
+    def test_stray_pixels_are_not_characters(self):
+        """Test that small specks don't count as extra characters"""
+        mask = _mask()
+        mask[10:90, 35:65] = True
+        mask[5:7, 5:7] = True
+        stats = sprite_stats(mask)
+        assert stats["components"] == 2
+        assert stats["large_components"] == 1
+        assert quality_verdict(stats)["ok"]
+
+    def test_cropped_at_edge(self):
+        """Test that a figure running off the bottom is flagged"""
+        mask = _mask()
+        mask[20:100, 35:65] = True
+        assert "cropped_at_edge" in quality_verdict(sprite_stats(mask))["reasons"]
+
+    def test_near_empty(self):
+        """Test that an empty output is flagged only as near-empty"""
+        assert quality_verdict(sprite_stats(_mask()))["reasons"] == ["near_empty"]
+
+
+class TestQuickCheck:
+    """Test the quick check on synthetic sprites"""
+
+    @pytest.mark.asyncio
+    async def test_sprites(self, tmp_path):
+        """Test transparent and opaque sprites, single and sheets"""
+        for components, rgba, ok in [(1, True, True), (1, False, True), (5, True, False)]:
+            path = str(tmp_path / f"sprite_{components}_{rgba}.png")
+            make_sprite(512, components, rgba=rgba).save(path)
+            check = await quick_check(path)
+            assert check["ok"] is ok, (components, rgba, check)
+
+    def test_opaque_mask_uses_border_colour(self):
+        """Test that an opaque image is split against its border colour"""
+        img = Image.new("RGB", (20, 20), (255, 255, 255))
+        img.paste((200, 30, 30), (5, 5, 15, 15))
+        assert foreground_mask(img).sum() == 100
+
+
+class TestIsolationVerdict:
+    """Test the verdict isolate_largest_character reports"""
+
+    @pytest.mark.asyncio
+    async def test_character_sheet_verdict(self, tmp_path):
+        """Test that isolating a sheet reports every component it discarded"""
+        from utils.image_processing import isolate_largest_character
+
+        path = str(tmp_path / "sheet_pixel.png")
+        make_sprite(512, 5).save(path)
+
+        quality = {}
+        output_path = await isolate_largest_character(path, quality=quality)
+
+        assert output_path.endswith("sheet_isolated.png")
+        assert quality["components"] == 5
+        assert not quality["ok"]
+        assert "multiple_characters" in quality["reasons"]
+
+
+class TestGenerateFirstGood:
+    """Test speculative candidate selection with a fake model"""
+
+    @pytest.mark.asyncio
+    async def test_first_good_wins_and_rest_are_cancelled(self, tmp_path, monkeypatch):
+        """Test that a fast good candidate beats a sheet and a slow one"""
+        import asyncio
+        from utils import speculative
+
+        # candidate -> (delay, components)
+        plan = {"_c0_": (0.01, 5), "_c1_": (0.05, 1), "_c2_": (5, 1)}
+        cancelled = []
+
+        async def fake_generate(reference_image_path, output_path):
+            delay, components = next(v for k, v in plan.items() if k in output_path)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(output_path)
+                raise
+            make_sprite(256, components).save(output_path)
+            return output_path
+
+        monkeypatch.setattr(speculative, "generate_pixel_art_with_gpt_reference", fake_generate)
+
+        path, meta = await speculative.generate_first_good("ref.jpg", str(tmp_path / "job_pixel.png"), 3, mode="parallel")
+
+        assert path.endswith("job_c1_pixel.png")
+        assert meta["selected"] == 1 and meta["selected_ok"]
+        assert [c["candidate"] for c in meta["checks"]] == [0, 1]
+        assert len(cancelled) == 1
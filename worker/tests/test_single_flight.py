@@ -0,0 +1,124 @@
+"""
+Unit tests for single-flight generation
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The lease helpers import the Firestore and GCS clients; point them at (unused) emulators
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'mini-aura-test')
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:0')
+os.environ.setdefault('STORAGE_EMULATOR_HOST', 'http://localhost:0')
+
+from utils.single_flight import SingleFlight
+
+
+class CountingGenerator:
+    """Writes an "isolated avatar" after a delay, failing the first `failures` calls"""
+
+    def __init__(self, path: str, failures: int = 0):
+        self.path = path
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.calls <= self.failures:
+            raise RuntimeError("model error")
+        with open(self.path, "w") as f:
+            f.write("avatar")
+        return {"path": self.path, "provider": "gpt_reference", "quality": {"ok": True}, "speculation": None}
+
+
+class TestSingleFlight:
+    """Test in-process coalescing of identical inputs"""
+
+    @pytest.mark.asyncio
+    async def test_duplicates_share_one_generation(self, tmp_path):
+        """Test that concurrent jobs with the same key make one generation and each get a copy"""
+        flight = SingleFlight(shared=False)
+        leader = CountingGenerator(str(tmp_path / "a_isolated.png"))
+        follower = CountingGenerator(str(tmp_path / "unused.png"))
+
+        (result_a, leader_a), (result_b, leader_b) = await asyncio.gather(
+            flight.run("hash", "a", str(tmp_path / "a_copy.png"), leader),
+            flight.run("hash", "b", str(tmp_path / "b_isolated.png"), follower)
+        )
+
+        assert leader.calls == 1 and follower.calls == 0
+        assert leader_a is None and leader_b == "a"
+        assert result_b["path"] == str(tmp_path / "b_isolated.png")
+        assert result_b["provider"] == "gpt_reference"
+        with open(result_b["path"]) as f:
+            assert f.read() == "avatar"
+
+    @pytest.mark.asyncio
+    async def test_waiter_generates_when_leader_fails(self, tmp_path):
+        """Test that a waiting job generates itself if the leader's generation fails"""
+        flight = SingleFlight(shared=False)
+        leader = CountingGenerator(str(tmp_path / "a_isolated.png"), failures=1)
+        follower = CountingGenerator(str(tmp_path / "b_isolated.png"))
+
+        results = await asyncio.gather(
+            flight.run("hash", "a", str(tmp_path / "a_copy.png"), leader),
+            flight.run("hash", "b", str(tmp_path / "b_copy.png"), follower),
+            return_exceptions=True
+        )
+
+        assert isinstance(results[0], RuntimeError)
+        result_b, leader_b = results[1]
+        assert leader_b is None
+        assert result_b["path"] == str(tmp_path / "b_isolated.png")
+        assert leader.calls == 1 and follower.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_different_inputs_are_not_coalesced(self, tmp_path):
+        """Test that jobs with different keys each generate"""
+        flight = SingleFlight(shared=False)
+        first = CountingGenerator(str(tmp_path / "a_isolated.png"))
+        second = CountingGenerator(str(tmp_path / "b_isolated.png"))
+
+        await asyncio.gather(
+            flight.run("hash-a", "a", str(tmp_path / "a_copy.png"), first),
+            flight.run("hash-b", "b", str(tmp_path / "b_copy.png"), second)
+        )
+
+        assert first.calls == 1 and second.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_finished_generation_is_not_reused(self, tmp_path):
+        """Test that a job arriving after the leader finished generates afresh"""
+        flight = SingleFlight(shared=False)
+        first = CountingGenerator(str(tmp_path / "a_isolated.png"))
+        second = CountingGenerator(str(tmp_path / "b_isolated.png"))
+
+        await flight.run("hash", "a", str(tmp_path / "a_copy.png"), first)
+        result_b, leader_b = await flight.run("hash", "b", str(tmp_path / "b_copy.png"), second)
+
+        assert first.calls == 1 and second.calls == 1
+        assert leader_b is None
+        assert result_b["path"] == str(tmp_path / "b_isolated.png")
+
+    @pytest.mark.asyncio
+    async def test_waiter_generates_when_leader_cancelled(self, tmp_path):
+        """Test that cancelling the leader makes a waiting job generate instead of cancelling it too"""
+        flight = SingleFlight(shared=False)
+        leader = CountingGenerator(str(tmp_path / "a_isolated.png"))
+        follower = CountingGenerator(str(tmp_path / "b_isolated.png"))
+
+        leader_task = asyncio.create_task(flight.run("hash", "a", str(tmp_path / "a_copy.png"), leader))
+        await asyncio.sleep(0.01)
+        follower_task = asyncio.create_task(flight.run("hash", "b", str(tmp_path / "b_copy.png"), follower))
+        await asyncio.sleep(0.01)
+        leader_task.cancel()
+
+        result_b, leader_b = await follower_task
+        assert leader_task.cancelled()
+        assert leader_b is None
+        assert result_b["path"] == str(tmp_path / "b_isolated.png")
+        assert follower.calls == 1
@@ -0,0 +1,40 @@
+"""
+Unit tests for the cold-start profiler
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.startup import StartupProfiler
+
+
+class TestStartupProfiler:
+    """Test import and step timing"""
+
+    def test_nested_package_time_is_exclusive(self, tmp_path, monkeypatch):
+        """Test that a package's time excludes packages it imports"""
+        (tmp_path / "slow_inner.py").write_text("import time\ntime.sleep(0.05)\n")
+        (tmp_path / "slow_outer.py").write_text("import time\nimport slow_inner\ntime.sleep(0.02)\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+
+        profiler = StartupProfiler()
+        try:
+            with profiler.profile_imports():
+                import slow_outer  # noqa: F401
+        finally:
+            sys.modules.pop("slow_outer", None)
+            sys.modules.pop("slow_inner", None)
+
+        assert profiler.imports["slow_inner"] >= 50
+        assert 20 <= profiler.imports["slow_outer"] < 50
+        assert profiler.steps["imports"] >= 70
+
+    def test_already_imported_modules_are_free(self):
+        """Test that re-importing a loaded package records nothing"""
+        profiler = StartupProfiler()
+        with profiler.profile_imports():
+            import json  # noqa: F401
+
+        assert "json" not in profiler.imports
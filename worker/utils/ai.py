@@ -1,18 +1,18 @@
 """
 AI utilities (Claude for analysis/prompts, GPT-image-1 for generation)
 """
-import anthropic
+from functools import lru_cache
 from openai import OpenAI
 import requests
 import tempfile
 import os
-from google.cloud import aiplatform
-from vertexai.preview.vision_models import ImageGenerationModel
+import asyncio
 import base64
 import json
 import logging
-import re
-from typing import Dict, Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 from config import (
     CLAUDE_API_KEY,
     CLAUDE_MODEL,
@@ -25,58 +25,140 @@ from config import (
     PROJECT_ID,
     VISION_ANALYSIS_MAX_TOKENS,
     PROMPT_GENERATION_MAX_TOKENS,
-    ENABLE_PROMPT_REFINEMENT
+    ENABLE_PROMPT_REFINEMENT,
+    PROMPT_MEMO_MAX_ENTRIES,
+    PROMPT_MEMO_TTL_SECONDS
 )
+from utils.digest import file_digest
+from utils.hedging import hedged_call
+from utils.json_extract import JsonObjectScanner
+from utils.metrics import get_stats
+from utils.startup import startup_profiler
 
 logger = logging.getLogger(__name__)
 
-# Initialize Claude client
-claude_client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+# Clients are created on first use. The Claude and Vertex AI SDKs only serve
+# the older analysis/Imagen paths, and importing them (Vertex AI alone takes
+# ~2s) would slow every cold start.
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-# Initialize Vertex AI
-aiplatform.init(project=PROJECT_ID, location=REGION)
+@lru_cache(maxsize=None)
+def get_claude_client():
+    """Claude client (imports anthropic on first call)"""
+    with startup_profiler.step("init claude client"):
+        import anthropic
+        return anthropic.Anthropic(api_key=CLAUDE_API_KEY)
 
 
-def extract_json_from_text(text: str) -> Optional[Dict]:
+@lru_cache(maxsize=None)
+def get_openai_client() -> OpenAI:
+    """OpenAI client"""
+    with startup_profiler.step("init openai client"):
+        return OpenAI(api_key=OPENAI_API_KEY)
+
+
+@lru_cache(maxsize=None)
+def get_imagen_model_class():
+    """Vertex AI ImageGenerationModel (imports and initializes Vertex AI on first call)"""
+    with startup_profiler.step("init vertex ai"):
+        from google.cloud import aiplatform
+        from vertexai.preview.vision_models import ImageGenerationModel
+        aiplatform.init(project=PROJECT_ID, location=REGION)
+        return ImageGenerationModel
+
+
+# Bump when the analysis or prompt-writing instructions below change, so
+# memoized prompts from the old wording aren't reused
+PROMPT_VERSION = 1
+
+# Static instructions go in the system prompt, ahead of the per-request image
+# or analysis, and carry cache_control so Anthropic can cache the prefix.
+# Prefixes shorter than the model's minimum cacheable length (a few thousand
+# tokens for Haiku) are sent uncached; the prompt memo below covers repeats.
+ANALYSIS_INSTRUCTIONS = """Analyze this person's appearance for creating a detailed pixel art avatar.
+
+Return JSON with ALL of these fields:
+- primary_colors: array of 2-3 dominant hex colors from clothing (e.g., ["#FF6600", "#000000"])
+- accent_colors: array of 1-2 secondary/accent hex colors (e.g., ["#FFFFFF"], or [] if none)
+- skin_tone: one of "light", "medium", "tan", "dark", "olive"
+- facial_expression: describe expression (e.g., "smiling", "neutral", "serious", "playful")
+- pose: main pose (e.g., "standing front-facing", "sitting", "arms crossed")
+- pose_detail: specific details (e.g., "relaxed stance, hands in pockets, looking slightly left")
+- clothing: brief description (e.g., "orange hoodie and black pants")
+- clothing_detail: specific details (e.g., "hoodie has front pocket and drawstrings, pants are fitted")
+- accessories: array of accessories (e.g., ["glasses", "hat", "watch"], or [] if none)
+- accessory_detail: describe accessories (e.g., "round frame glasses, backwards baseball cap", or "" if no accessories)
+- hair_color: color name (e.g., "brown", "blonde", "black", "red")
+- hair_style: style description (e.g., "short and spiky", "long wavy", "curly medium length")
+- body_type: one of "slim", "average", "athletic", "stocky"
+- distinguishing_features: array of unique features (e.g., ["beard", "freckles"], or [] if none)
+
+Only return valid JSON, no explanation."""
+
+PROMPT_SYSTEM = "You are an expert prompt engineer for OpenAI DALL-E 3. You specialize in producing clean, consistent, centered, full-body 2D pixel-art fashion doll avatars in the Everskies style. You strictly avoid realism, 3D rendering, anime styles, painterly effects, and background scenes. You prioritize composition, proportion accuracy, and fashion detail."
+
+PROMPT_TEMPLATE_INSTRUCTIONS = """Using the analysis you are given, create a DALL-E 3 prompt following the exact template below.
+
+Template (fill in the bracketed sections):
+
+Create a single 2D pixel-art fashion doll avatar in the Everskies style, one person only, no duplicates, centered in frame.
+
+Front-facing stylized character with Everskies-style proportions: slightly oversized head, slim torso, long legs. True pixel-art style with visible pixel grid, crisp edges, clean outlines, soft flat shading, high readability at small sizes.
+
+[SPECIFIC SKIN TONE], [DETAILED HAIR DESCRIPTION], [FACIAL HAIR IF PRESENT], [SIMPLE FACIAL EXPRESSION ONLY — neutral calm expression or smiling], slightly chibi but proportional body.
+
+Outfit: [VERY DETAILED CLOTHING — fit, fabric texture, layers, patterns, exact colors, top-to-bottom].
+Accessories: [ONLY WORN ITEMS — necklaces, bags with strap placement, glasses, shoes].
+
+Neutral standing pose, arms relaxed at sides, feet slightly apart, full body visible from head to shoes. Symmetrical composition.
+
+Minimal lighting, flat colors, muted palette, no shadows, no background or transparent background.
+
+Fashion-focused, clean, modern. NOT realistic, NOT 3D, NOT anime, NOT painterly. No props, no handheld objects, no text, no logos.
+
+🚫 Avoid: photorealism, realism, 3D render, anime, cartoon, painterly style, sketch, watercolor, gradients, dramatic lighting, backgrounds, scenes, props, phones, cameras, text, logos, multiple people, duplicates, cropped body
+
+CRITICAL:
+- Use EXACT skin tone from analysis
+- NO actions (no "looking at phone", "holding objects")
+- NO props or handheld items
+- Full body visible, centered, symmetrical
+
+Return ONLY the filled prompt, no explanation."""
+
+
+def _cached_text_block(text: str) -> Dict[str, Any]:
+    """Text content block marked as the end of a cacheable prompt prefix"""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def _log_cache_usage(call: str, response) -> None:
+    """Log how much of a Claude call's input came from the prompt cache"""
+    usage = response.usage
+    logger.info(
+        f"Claude {call} tokens: input={usage.input_tokens} "
+        f"cache_read={getattr(usage, 'cache_read_input_tokens', None) or 0} "
+        f"cache_write={getattr(usage, 'cache_creation_input_tokens', None) or 0}"
+    )
+
+
+def _stream_json(**request) -> Tuple[Optional[Dict[str, Any]], str]:
     """
-    Extract JSON from text that may contain markdown code blocks or extra text
+    Stream a Claude message, parsing the first JSON object as text arrives (blocking)
 
-    Args:
-        text: Raw text that may contain JSON
+    Stops reading once the object is complete, so trailing commentary
+    doesn't add to the wait.
 
     Returns:
-        Parsed JSON dictionary or None if not found
+        Tuple of (parsed object or None, text received)
     """
-    # Try to find JSON in markdown code blocks first
-    json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-    match = re.search(json_pattern, text, re.DOTALL)
-
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-
-    # Try to find raw JSON object in the text
-    json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-    match = re.search(json_pattern, text, re.DOTALL)
-
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-
-    # Try parsing the entire text as JSON
-    try:
-        return json.loads(text.strip())
-    except json.JSONDecodeError:
-        pass
-
-    return None
+    scanner = JsonObjectScanner()
+    with get_claude_client().messages.stream(**request) as stream:
+        for text in stream.text_stream:
+            if scanner.feed(text) is not None:
+                break
+        _log_cache_usage("analysis", stream.current_message_snapshot)
+    return scanner.finish(), scanner.text
 
 
 async def analyze_image_with_claude(image_path: str) -> Dict[str, any]:
@@ -106,10 +188,13 @@ async def analyze_image_with_claude(image_path: str) -> Dict[str, any]:
         else:
             media_type = "image/jpeg"  # default
 
-        # Call Claude with vision
-        response = claude_client.messages.create(
+        # Call Claude with vision (the instructions are a cacheable system prefix),
+        # parsing the JSON as it streams in
+        analysis, analysis_text = await asyncio.to_thread(
+            _stream_json,
             model=CLAUDE_MODEL,
             max_tokens=VISION_ANALYSIS_MAX_TOKENS,
+            system=[_cached_text_block(ANALYSIS_INSTRUCTIONS)],
             messages=[{
                 "role": "user",
                 "content": [
@@ -123,37 +208,13 @@ async def analyze_image_with_claude(image_path: str) -> Dict[str, any]:
                     },
                     {
                         "type": "text",
-                        "text": """Analyze this person's appearance for creating a detailed pixel art avatar.
-
-Return JSON with ALL of these fields:
-- primary_colors: array of 2-3 dominant hex colors from clothing (e.g., ["#FF6600", "#000000"])
-- accent_colors: array of 1-2 secondary/accent hex colors (e.g., ["#FFFFFF"], or [] if none)
-- skin_tone: one of "light", "medium", "tan", "dark", "olive"
-- facial_expression: describe expression (e.g., "smiling", "neutral", "serious", "playful")
-- pose: main pose (e.g., "standing front-facing", "sitting", "arms crossed")
-- pose_detail: specific details (e.g., "relaxed stance, hands in pockets, looking slightly left")
-- clothing: brief description (e.g., "orange hoodie and black pants")
-- clothing_detail: specific details (e.g., "hoodie has front pocket and drawstrings, pants are fitted")
-- accessories: array of accessories (e.g., ["glasses", "hat", "watch"], or [] if none)
-- accessory_detail: describe accessories (e.g., "round frame glasses, backwards baseball cap", or "" if no accessories)
-- hair_color: color name (e.g., "brown", "blonde", "black", "red")
-- hair_style: style description (e.g., "short and spiky", "long wavy", "curly medium length")
-- body_type: one of "slim", "average", "athletic", "stocky"
-- distinguishing_features: array of unique features (e.g., ["beard", "freckles"], or [] if none)
-
-Only return valid JSON, no explanation."""
+                        "text": "Analyze this person."
                     }
                 ]
             }]
         )
-
-        # Parse JSON response
-        analysis_text = response.content[0].text
         logger.info(f"Claude response: {analysis_text}")
 
-        # Extract JSON from response (handles markdown code blocks)
-        analysis = extract_json_from_text(analysis_text)
-
         if not analysis:
             logger.error(f"Failed to extract JSON from Claude response: {analysis_text}")
             raise ValueError(f"Could not parse JSON from Claude response: {analysis_text[:200]}")
@@ -191,45 +252,20 @@ async def generate_dalle_prompt(analysis: Dict[str, any]) -> str:
     try:
         logger.info(f"Generating DALL-E 3 prompt from analysis: {analysis}")
 
-        response = claude_client.messages.create(
+        response = await asyncio.to_thread(
+            get_claude_client().messages.create,
             model=CLAUDE_MODEL,
             max_tokens=PROMPT_GENERATION_MAX_TOKENS,
-            system="You are an expert prompt engineer for OpenAI DALL-E 3. You specialize in producing clean, consistent, centered, full-body 2D pixel-art fashion doll avatars in the Everskies style. You strictly avoid realism, 3D rendering, anime styles, painterly effects, and background scenes. You prioritize composition, proportion accuracy, and fashion detail.",
+            system=[
+                {"type": "text", "text": PROMPT_SYSTEM},
+                _cached_text_block(PROMPT_TEMPLATE_INSTRUCTIONS)
+            ],
             messages=[{
                 "role": "user",
-                "content": f"""Using this analysis, create a DALL-E 3 prompt following the exact template below.
-
-Analysis:
-{json.dumps(analysis, indent=2)}
-
-Template (fill in the bracketed sections):
-
-Create a single 2D pixel-art fashion doll avatar in the Everskies style, one person only, no duplicates, centered in frame.
-
-Front-facing stylized character with Everskies-style proportions: slightly oversized head, slim torso, long legs. True pixel-art style with visible pixel grid, crisp edges, clean outlines, soft flat shading, high readability at small sizes.
-
-[SPECIFIC SKIN TONE], [DETAILED HAIR DESCRIPTION], [FACIAL HAIR IF PRESENT], [SIMPLE FACIAL EXPRESSION ONLY — neutral calm expression or smiling], slightly chibi but proportional body.
-
-Outfit: [VERY DETAILED CLOTHING — fit, fabric texture, layers, patterns, exact colors, top-to-bottom].
-Accessories: [ONLY WORN ITEMS — necklaces, bags with strap placement, glasses, shoes].
-
-Neutral standing pose, arms relaxed at sides, feet slightly apart, full body visible from head to shoes. Symmetrical composition.
-
-Minimal lighting, flat colors, muted palette, no shadows, no background or transparent background.
-
-Fashion-focused, clean, modern. NOT realistic, NOT 3D, NOT anime, NOT painterly. No props, no handheld objects, no text, no logos.
-
-🚫 Avoid: photorealism, realism, 3D render, anime, cartoon, painterly style, sketch, watercolor, gradients, dramatic lighting, backgrounds, scenes, props, phones, cameras, text, logos, multiple people, duplicates, cropped body
-
-CRITICAL:
-- Use EXACT skin tone from analysis
-- NO actions (no "looking at phone", "holding objects")
-- NO props or handheld items
-- Full body visible, centered, symmetrical
-
-Return ONLY the filled prompt, no explanation."""
+                "content": f"Analysis:\n{json.dumps(analysis, indent=2)}"
             }]
         )
+        _log_cache_usage("prompt", response)
 
         raw_prompt = response.content[0].text.strip()
         logger.info(f"Generated raw prompt: {raw_prompt}")
@@ -260,6 +296,60 @@ Return ONLY the filled prompt, no explanation."""
         raise
 
 
+class PromptMemo:
+    """Image prompts keyed by image digest and PROMPT_VERSION (LRU, entries expire)"""
+
+    def __init__(self, max_entries: int = PROMPT_MEMO_MAX_ENTRIES, ttl_seconds: float = PROMPT_MEMO_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored at, prompt)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, prompt: str) -> None:
+        self._entries[key] = (time.monotonic(), prompt)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+prompt_memo = PromptMemo()
+
+
+async def generate_prompt_for_image(image_path: str) -> str:
+    """
+    Claude analysis -> image prompt for a photo, memoized per image
+
+    A job whose DALL-E/Imagen output fails the quality check regenerates
+    from the same photo, and retries resubmit it; both reuse the prompt
+    instead of paying for two more Claude calls.
+
+    Args:
+        image_path: Path to the source photo
+
+    Returns:
+        Image generation prompt
+    """
+    key = f"{await asyncio.to_thread(file_digest, image_path)}:{PROMPT_VERSION}"
+
+    prompt = prompt_memo.get(key)
+    get_stats("prompt_memo_hit").record(0 if prompt is None else 1)
+    if prompt is not None:
+        logger.info("Reusing memoized prompt for this image")
+        return prompt
+
+    analysis = await analyze_image_with_claude(image_path)
+    prompt = await generate_dalle_prompt(analysis)
+    prompt_memo.put(key, prompt)
+    return prompt
+
+
 def refine_imagen_prompt(raw_prompt: str, analysis: dict) -> str:
     """
     Post-process the generated prompt to ensure quality keywords and structure.
@@ -343,18 +433,20 @@ async def generate_pixel_art_with_imagen(prompt: str, output_path: str) -> str:
         logger.info(f"Generating pixel art with Imagen. Prompt: {prompt}")
 
         # Initialize Imagen model
-        model = ImageGenerationModel.from_pretrained(IMAGEN_MODEL)
+        model_class = await asyncio.to_thread(get_imagen_model_class)  # First call imports Vertex AI
+        model = await asyncio.to_thread(model_class.from_pretrained, IMAGEN_MODEL)
 
         # Generate image with minimal parameters
         # Using only guaranteed supported parameters
-        response = model.generate_images(
+        response = await asyncio.to_thread(
+            model.generate_images,
             prompt=prompt,
             number_of_images=1
         )
 
         # Save first image
         if response.images:
-            response.images[0].save(output_path)
+            await asyncio.to_thread(response.images[0].save, output_path)
             logger.info(f"Pixel art generated and saved to {output_path}")
             return output_path
         else:
@@ -380,7 +472,8 @@ async def generate_pixel_art_with_dalle(prompt: str, output_path: str) -> str:
         logger.info(f"Generating pixel art with DALL-E 3. Prompt: {prompt}")
 
         # Generate image with DALL-E 3 using b64_json to avoid URL download issues
-        response = openai_client.images.generate(
+        response = await asyncio.to_thread(
+            get_openai_client().images.generate,
             model=DALLE_MODEL,
             prompt=prompt,
             size=DALLE_SIZE,
@@ -449,7 +542,75 @@ Avoid smooth gradients, painterly shading, semi-realistic pixel filtering.
 """
 
 
-async def generate_pixel_art_with_gpt_reference(reference_image_path: str, output_path: str) -> str:
+def _prepare_reference_image(reference_image_path: str) -> str:
+    """Write the reference as a PNG under the 4MB edit limit; returns the temp path"""
+    # Create temp file for the reference image (ensures proper format)
+    temp_path = tempfile.mktemp(suffix=".png")
+
+    # Read and potentially resize the image
+    from PIL import Image
+    img = Image.open(reference_image_path)
+
+    # Resize if too large (max 4MB for API)
+    max_size = 4 * 1024 * 1024
+    img.save(temp_path, "PNG")
+
+    if os.path.getsize(temp_path) > max_size:
+        # Resize to fit
+        scale = (max_size / os.path.getsize(temp_path)) ** 0.5
+        new_size = (int(img.width * scale), int(img.height * scale))
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+        img.save(temp_path, "PNG", optimize=True)
+        logger.info(f"Resized image to {new_size} for API limits")
+
+    return temp_path
+
+
+async def _save_image_result(result_data, output_path: str) -> None:
+    """Write one images API result (b64_json or URL) to output_path"""
+    # Handle response - could be URL or b64_json
+    if hasattr(result_data, 'b64_json') and result_data.b64_json:
+        image_bytes = base64.b64decode(result_data.b64_json)
+        with open(output_path, 'wb') as f:
+            f.write(image_bytes)
+    elif hasattr(result_data, 'url') and result_data.url:
+        img_response = await asyncio.to_thread(requests.get, result_data.url)
+        img_response.raise_for_status()
+        with open(output_path, 'wb') as f:
+            f.write(img_response.content)
+    else:
+        raise ValueError(f"No image data in response: {result_data}")
+
+
+async def _edit_with_gpt_reference(reference_image_path: str, output_paths: List[str]) -> List[str]:
+    """One images.edit call producing len(output_paths) images"""
+    temp_path = await asyncio.to_thread(_prepare_reference_image, reference_image_path)
+
+    try:
+        # Use images.edit() with the reference image. The SDK call blocks for
+        # tens of seconds; run it in a thread so other jobs keep making progress
+        with open(temp_path, 'rb') as img_file:
+            response = await asyncio.to_thread(
+                get_openai_client().images.edit,
+                model="gpt-image-1",
+                prompt=GPT_REF_PROMPT,
+                image=img_file,
+                size="1024x1024",
+                n=len(output_paths)
+            )
+
+        for result_data, output_path in zip(response.data, output_paths):
+            await _save_image_result(result_data, output_path)
+
+        return output_paths[:len(response.data)]
+
+    finally:
+        # Cleanup temp file
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+async def generate_pixel_art_with_gpt_reference(reference_image_path: str, output_path: str, hedge: bool = False) -> str:
     """
     Generate pixel art with GPT-image-1 using a reference image.
     This approach is more accurate as the model can see the source image directly.
@@ -457,6 +618,8 @@ async def generate_pixel_art_with_gpt_reference(reference_image_path: str, outpu
     Args:
         reference_image_path: Path to source/reference image
         output_path: Path to save generated image
+        hedge: Send a backup request if this one runs past the observed p90
+            (see utils/hedging.py)
 
     Returns:
         Path to generated image
@@ -464,56 +627,35 @@ async def generate_pixel_art_with_gpt_reference(reference_image_path: str, outpu
     try:
         logger.info(f"Generating pixel art with GPT-image-1 + reference. Source: {reference_image_path}")
 
-        # Create temp file for the reference image (ensures proper format)
-        temp_path = tempfile.mktemp(suffix=".png")
+        await hedged_call(lambda path: _edit_with_gpt_reference(reference_image_path, [path]), output_path, hedge)
 
-        # Read and potentially resize the image
-        from PIL import Image
-        img = Image.open(reference_image_path)
+        logger.info(f"Pixel art generated and saved to {output_path}")
+        return output_path
 
-        # Resize if too large (max 4MB for API)
-        max_size = 4 * 1024 * 1024
-        img.save(temp_path, "PNG")
+    except Exception as e:
+        logger.error(f"Error generating pixel art with GPT-image-1: {str(e)}")
+        raise
 
-        if os.path.getsize(temp_path) > max_size:
-            # Resize to fit
-            scale = (max_size / os.path.getsize(temp_path)) ** 0.5
-            new_size = (int(img.width * scale), int(img.height * scale))
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
-            img.save(temp_path, "PNG", optimize=True)
-            logger.info(f"Resized image to {new_size} for API limits")
 
-        # Use images.edit() with the reference image
-        with open(temp_path, 'rb') as img_file:
-            response = openai_client.images.edit(
-                model="gpt-image-1",
-                prompt=GPT_REF_PROMPT,
-                image=img_file,
-                size="1024x1024"
-            )
+async def generate_pixel_art_candidates_with_gpt_reference(reference_image_path: str, output_paths: List[str]) -> List[str]:
+    """
+    Generate several pixel art candidates in a single GPT-image-1 call (n > 1)
 
-        # Handle response - could be URL or b64_json
-        result_data = response.data[0]
-        if hasattr(result_data, 'b64_json') and result_data.b64_json:
-            image_bytes = base64.b64decode(result_data.b64_json)
-            with open(output_path, 'wb') as f:
-                f.write(image_bytes)
-        elif hasattr(result_data, 'url') and result_data.url:
-            img_response = requests.get(result_data.url)
-            img_response.raise_for_status()
-            with open(output_path, 'wb') as f:
-                f.write(img_response.content)
-        else:
-            raise ValueError(f"No image data in response: {result_data}")
+    Args:
+        reference_image_path: Path to source/reference image
+        output_paths: One path per candidate to save to
 
-        logger.info(f"Pixel art generated and saved to {output_path}")
+    Returns:
+        Paths of the candidates the model returned
+    """
+    try:
+        logger.info(f"Generating {len(output_paths)} pixel art candidates with GPT-image-1 + reference")
 
-        # Cleanup temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        paths = await _edit_with_gpt_reference(reference_image_path, output_paths)
 
-        return output_path
+        logger.info(f"{len(paths)} candidates generated")
+        return paths
 
     except Exception as e:
-        logger.error(f"Error generating pixel art with GPT-image-1: {str(e)}")
+        logger.error(f"Error generating pixel art candidates with GPT-image-1: {str(e)}")
         raise
@@ -0,0 +1,162 @@
+"""
+Shared rembg session
+
+rembg.remove() without a session creates a new one on every call, which
+means loading the ONNX model and optimizing its graph each time. The worker
+keeps one session per process, created on first use or by the startup
+warm-up (see image_processing.warm_up).
+
+The Docker build also saves ONNX Runtime's optimized graph next to the
+weights (`python -m utils.background`), so new instances load an already
+optimized model instead of redoing that work.
+
+REMBG_MODEL picks the model. Pixel-art sprites on flat backgrounds rarely
+need full U2Net (176MB); bench/run_rembg_model_bench.py compares the lighter
+ones against it:
+
+- u2net: full model, slowest
+- u2netp: 4.7MB distilled U2Net
+- silueta: 43MB pruned U2Net
+- u2net_int8: U2Net with INT8 weights, quantized from u2net at build time
+"""
+from PIL import Image
+from rembg import new_session, remove
+from rembg.sessions import sessions_class
+import logging
+import os
+import threading
+
+import onnxruntime as ort
+
+from config import REMBG_MODEL, REMBG_OPTIMIZED_MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+# Supported REMBG_MODEL values; quantized models map to the model they're built from
+REMBG_MODELS = ("u2net", "u2netp", "silueta", "u2net_int8")
+QUANTIZED_MODELS = {"u2net_int8": "u2net"}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def optimized_model_path(model_name: str = REMBG_MODEL) -> str:
+    """Where the build step saves the optimized graph for a model"""
+    return os.path.join(REMBG_OPTIMIZED_MODEL_DIR, f"{model_name}.optimized.onnx")
+
+
+def quantized_model_path(model_name: str) -> str:
+    """Where quantize_model() saves a quantized model"""
+    return os.path.join(REMBG_OPTIMIZED_MODEL_DIR, f"{model_name}.onnx")
+
+
+def _stock_model_path(model_name: str) -> str:
+    """Path to a stock rembg model's weights (downloaded if not cached)"""
+    session_class = next(sc for sc in sessions_class if sc.name() == model_name)
+    return str(session_class.download_models())
+
+
+def quantize_model(model_name: str) -> str:
+    """
+    Build an INT8 model from its float source (build step)
+
+    Dynamic quantization: weights are stored as INT8 and activations are
+    quantized on the fly, so no calibration set is needed.
+
+    Args:
+        model_name: A key of QUANTIZED_MODELS
+
+    Returns:
+        Path to the quantized model
+    """
+    # Needs the onnx package, which only the build step uses
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = quantized_model_path(model_name)
+    quantize_dynamic(_stock_model_path(QUANTIZED_MODELS[model_name]), output_path, weight_type=QuantType.QUInt8)
+
+    logger.info(f"Saved quantized {model_name} to {output_path}")
+    return output_path
+
+
+def optimize_model(model_name: str = REMBG_MODEL) -> str:
+    """
+    Save ONNX Runtime's optimized graph for a rembg model (build step)
+
+    Uses the "extended" optimization level; "all" adds layout changes tied to
+    the build machine's CPU, which ONNX Runtime still applies at load time.
+
+    Args:
+        model_name: One of REMBG_MODELS (stock weights are downloaded if not
+            cached; quantized models must have been built first)
+
+    Returns:
+        Path to the optimized model
+    """
+    if model_name in QUANTIZED_MODELS:
+        source_path = quantized_model_path(model_name)
+    else:
+        source_path = _stock_model_path(model_name)
+    output_path = optimized_model_path(model_name)
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = output_path
+    ort.InferenceSession(source_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    logger.info(f"Saved optimized {model_name} graph to {output_path}")
+    return output_path
+
+
+def prepare_model(model_name: str = REMBG_MODEL) -> str:
+    """Build step: quantize (if needed) and optimize a model"""
+    if model_name in QUANTIZED_MODELS:
+        quantize_model(model_name)
+    return optimize_model(model_name)
+
+
+def create_session(model_name: str = REMBG_MODEL):
+    """
+    New rembg session for a model
+
+    Loads the build-time optimized graph when present, else the quantized or
+    stock model. Local files go through rembg's u2net_custom session, which
+    shares the pre/post-processing of u2net, u2netp and silueta.
+    """
+    if model_name not in REMBG_MODELS:
+        raise ValueError(f"Unknown rembg model: {model_name} (expected one of {', '.join(REMBG_MODELS)})")
+
+    local_paths = [optimized_model_path(model_name)]
+    if model_name in QUANTIZED_MODELS:
+        local_paths.append(quantized_model_path(model_name))
+
+    for path in local_paths:
+        if os.path.exists(path):
+            logger.info(f"Loading rembg model {model_name} from {path}")
+            return new_session("u2net_custom", model_path=path)
+
+    if model_name in QUANTIZED_MODELS:
+        raise FileNotFoundError(f"{model_name} has not been built; run `REMBG_MODEL={model_name} python -m utils.background`")
+
+    logger.info(f"Loading rembg model {model_name}")
+    return new_session(model_name)
+
+
+def get_session():
+    """The process-wide rembg session for REMBG_MODEL"""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = create_session(REMBG_MODEL)
+        return _session
+
+
+def cut_out(img: Image.Image) -> Image.Image:
+    """Remove the background with the shared session (blocking; run in a thread)"""
+    return remove(img, session=get_session())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    prepare_model()
@@ -0,0 +1,246 @@
+"""
+Per-instance job concurrency
+
+A job alternates between waiting on I/O (GCS, the image model) and CPU work
+(rembg, ndimage). How many jobs an instance can usefully run at once depends
+on that mix: with W ms of waiting for every C ms of computing, one core stays
+busy with about 1 + W/C jobs in flight, so for N cores at a target
+utilization U:
+
+    concurrency = N * U * (1 + W / C)
+
+Every completed job records its I/O and CPU stage time. A monitor task
+samples process CPU utilization and, with WORKER_CONCURRENCY_AUTOTUNE on,
+moves the number of job slots one step at a time towards the recommendation
+(and down whenever the CPUs are saturated).
+"""
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import math
+import os
+import time
+
+from config import (
+    WORKER_CONCURRENCY,
+    WORKER_MIN_CONCURRENCY,
+    WORKER_MAX_CONCURRENCY,
+    WORKER_CONCURRENCY_AUTOTUNE,
+    WORKER_TARGET_CPU_UTILIZATION,
+    WORKER_AUTOTUNE_INTERVAL_SECONDS,
+    WORKER_AUTOTUNE_MIN_JOBS
+)
+from utils.metrics import get_stats
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages (see pipeline.py) by what they mostly spend time on
+IO_STAGES = ("download", "generate", "upload")
+CPU_STAGES = ("isolate", "pixelate", "watermark", "renditions", "encode")
+
+# Above this CPU utilization the instance is thrashing; shed a slot
+CPU_SATURATED_UTILIZATION = 0.95
+
+
+def _clamp(limit: int) -> int:
+    return max(WORKER_MIN_CONCURRENCY, min(WORKER_MAX_CONCURRENCY, limit))
+
+
+class JobSlots:
+    """Resizable limit on the number of jobs running at once"""
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._active = 0
+        self._waiting = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take a job slot
+
+        Args:
+            timeout: Seconds to wait for a slot (None waits forever)
+
+        Returns:
+            True if a slot was taken, False if none freed up in time
+        """
+        async with self._condition:
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self._active < self._limit),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self._waiting -= 1
+
+            self._active += 1
+            return True
+
+    async def release(self) -> None:
+        """Give a job slot back"""
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    async def resize(self, limit: int) -> None:
+        """
+        Change the number of slots
+
+        Shrinking never interrupts running jobs; new jobs wait until the
+        active count drops below the new limit.
+        """
+        async with self._condition:
+            self._limit = _clamp(limit)
+            self._condition.notify_all()
+
+
+job_slots = JobSlots(_clamp(WORKER_CONCURRENCY))
+
+
+def available_cpus() -> float:
+    """CPUs this container may use (cgroup v2 quota, else CPU affinity)"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        return float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return float(os.cpu_count() or 1)
+
+
+def record_stage_mix(stage_timings: Dict[str, int]) -> None:
+    """Record a completed job's I/O and CPU stage time (ms)"""
+    get_stats("job_io_ms").record(sum(stage_timings.get(stage, 0) for stage in IO_STAGES))
+    get_stats("job_cpu_ms").record(sum(stage_timings.get(stage, 0) for stage in CPU_STAGES))
+
+
+def recommend_concurrency(
+    cpus: float,
+    io_ms: float,
+    cpu_ms: float,
+    target_utilization: float = WORKER_TARGET_CPU_UTILIZATION
+) -> int:
+    """
+    Job slots that keep the CPUs at the target utilization
+
+    Args:
+        cpus: Available CPUs
+        io_ms: Mean time per job spent waiting on I/O
+        cpu_ms: Mean time per job spent computing
+        target_utilization: Share of the CPUs to aim for (0-1)
+
+    Returns:
+        Recommended concurrency, within the configured bounds
+    """
+    if cpu_ms <= 0:
+        return WORKER_MAX_CONCURRENCY
+    return _clamp(math.floor(cpus * target_utilization * (1 + io_ms / cpu_ms)))
+
+
+def recommended_concurrency() -> Optional[int]:
+    """Recommendation from recent jobs, or None until enough have completed"""
+    io_stats = get_stats("job_io_ms")
+    cpu_stats = get_stats("job_cpu_ms")
+    if cpu_stats.count() < WORKER_AUTOTUNE_MIN_JOBS:
+        return None
+    return recommend_concurrency(available_cpus(), io_stats.mean(), cpu_stats.mean())
+
+
+def next_limit(current: int, recommended: Optional[int], cpu_utilization: Optional[float]) -> int:
+    """
+    One autotune step: move at most one slot towards the recommendation
+
+    Never adds a slot while CPU utilization is at or above the target, and
+    sheds one whenever the CPUs are saturated.
+    """
+    if cpu_utilization is not None and cpu_utilization >= CPU_SATURATED_UTILIZATION:
+        return _clamp(current - 1)
+    if recommended is None or recommended == current:
+        return current
+    if recommended > current:
+        if cpu_utilization is not None and cpu_utilization >= WORKER_TARGET_CPU_UTILIZATION:
+            return current
+        return _clamp(current + 1)
+    return _clamp(current - 1)
+
+
+class CpuSampler:
+    """Process CPU utilization (share of available CPUs) between samples"""
+
+    def __init__(self):
+        self._last = (time.monotonic(), time.process_time())
+
+    def sample(self) -> Optional[float]:
+        now, cpu = time.monotonic(), time.process_time()
+        last_wall, last_cpu = self._last
+        self._last = (now, cpu)
+
+        elapsed = now - last_wall
+        if elapsed <= 0:
+            return None
+        return (cpu - last_cpu) / (elapsed * available_cpus())
+
+
+async def run_concurrency_monitor() -> None:
+    """Sample CPU utilization and (optionally) resize job slots, forever"""
+    sampler = CpuSampler()
+
+    while True:
+        await asyncio.sleep(WORKER_AUTOTUNE_INTERVAL_SECONDS)
+
+        try:
+            utilization = sampler.sample()
+            if utilization is not None:
+                utilization = round(utilization, 3)
+                get_stats("cpu_utilization").record(utilization)
+
+            if WORKER_CONCURRENCY_AUTOTUNE:
+                current = job_slots.limit
+                recommended = recommended_concurrency()
+                limit = next_limit(current, recommended, utilization)
+                if limit != current:
+                    logger.info(
+                        f"Autotune: job slots {current} -> {limit} "
+                        f"(recommended {recommended}, cpu {utilization})"
+                    )
+                    await job_slots.resize(limit)
+
+        except Exception as e:
+            logger.warning(f"Concurrency monitor error: {str(e)}")
+
+
+def concurrency_snapshot() -> Dict[str, Any]:
+    """Current slots, load and recommendation for /metrics"""
+    io_mean = get_stats("job_io_ms").mean()
+    cpu_mean = get_stats("job_cpu_ms").mean()
+
+    return {
+        "cpus": available_cpus(),
+        "slots": job_slots.limit,
+        "active": job_slots.active,
+        "waiting": job_slots.waiting,
+        "autotune": WORKER_CONCURRENCY_AUTOTUNE,
+        "io_cpu_ratio": round(io_mean / cpu_mean, 2) if io_mean is not None and cpu_mean else None,
+        "recommended": recommended_concurrency()
+    }
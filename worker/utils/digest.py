@@ -0,0 +1,16 @@
+"""
+Content hashing for local files
+
+Stdlib only, so modules that key work by image content (single-flight,
+the prompt memo) can share it without pulling in cloud clients.
+"""
+import hashlib
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content (hex)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
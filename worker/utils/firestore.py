@@ -2,8 +2,8 @@
 Firestore database helper functions
 """
 from google.cloud import firestore
-from datetime import datetime
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -71,6 +71,254 @@ async def update_job_status(
         raise
 
 
+async def create_job(
+    job_id: str,
+    user_id: str,
+    input_blob: str,
+    lane: str,
+    status: str = "queued",
+    has_watermark: bool = False,
+    batch_id: Optional[str] = None
+) -> None:
+    """
+    Create a job document (the API creates interactive jobs; the worker creates bulk ones)
+
+    Args:
+        job_id: Job ID
+        user_id: User the avatar belongs to
+        input_blob: Input image blob in the upload bucket
+        lane: Priority lane ("paid", "free" or "bulk")
+        status: Initial status
+        has_watermark: Whether to apply the watermark
+        batch_id: Bulk batch the job belongs to
+    """
+    try:
+        job_data = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "status": status,
+            "created_at": datetime.utcnow(),
+            "input_blob": input_blob,
+            "output_image_url": None,
+            "error_message": None,
+            "has_watermark": has_watermark,
+            "lane": lane,
+            "metadata": {}
+        }
+        if batch_id:
+            job_data["batch_id"] = batch_id
+
+        db.collection("jobs").document(job_id).set(job_data)
+        logger.info(f"Created {lane} job: {job_id} for user: {user_id}")
+
+    except Exception as e:
+        logger.error(f"Error creating job {job_id}: {str(e)}")
+        raise
+
+
+async def create_batch(batch_id: str, items: List[Dict[str, Any]]) -> None:
+    """
+    Create a bulk batch document
+
+    Args:
+        batch_id: Batch ID
+        items: One {"job_id", "user_id", "input_blob", "has_watermark"} per job
+    """
+    try:
+        db.collection("batches").document(batch_id).set({
+            "batch_id": batch_id,
+            "status": "submitted",
+            "created_at": datetime.utcnow(),
+            "items": items,
+            "total": len(items),
+            "completed": 0,
+            "failed": 0
+        })
+        logger.info(f"Created batch {batch_id} with {len(items)} jobs")
+
+    except Exception as e:
+        logger.error(f"Error creating batch {batch_id}: {str(e)}")
+        raise
+
+
+async def get_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Get a bulk batch document from Firestore"""
+    try:
+        doc = db.collection("batches").document(batch_id).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        logger.error(f"Error getting batch {batch_id}: {str(e)}")
+        raise
+
+
+async def update_batch(batch_id: str, status: Optional[str] = None, completed: int = 0, failed: int = 0) -> None:
+    """
+    Update a batch's status and/or increment its completed/failed counters
+
+    Args:
+        batch_id: Batch ID
+        status: New status (submitted, running, done)
+        completed: Jobs to add to the completed count
+        failed: Jobs to add to the failed count
+    """
+    try:
+        update_data: Dict[str, Any] = {"updated_at": datetime.utcnow()}
+        if status:
+            update_data["status"] = status
+        if completed:
+            update_data["completed"] = firestore.Increment(completed)
+        if failed:
+            update_data["failed"] = firestore.Increment(failed)
+
+        db.collection("batches").document(batch_id).update(update_data)
+
+    except Exception as e:
+        logger.error(f"Error updating batch {batch_id}: {str(e)}")
+        raise
+
+
+async def count_queued_jobs(lane: Optional[str] = None) -> int:
+    """
+    Count queued jobs with a server-side aggregation query
+
+    Args:
+        lane: Only count jobs on this priority lane ("paid", "free" or "bulk")
+
+    Returns:
+        Number of queued jobs
+    """
+    try:
+        query = db.collection("jobs").where("status", "==", "queued")
+        if lane:
+            query = query.where("lane", "==", lane)
+
+        results = query.count(alias="total").get()
+
+        return int(results[0][0].value) if results else 0
+
+    except Exception as e:
+        logger.error(f"Error counting queued jobs: {str(e)}")
+        raise
+
+
+# Single-flight leases (see utils/single_flight.py)
+#
+# One document per input image hash in "inflight". While a job generates
+# from that image its lease is "running"; afterwards it is "done" and carries
+# the shared result until expires_at, for jobs that were already waiting on
+# it. A done lease never blocks a new job, which takes the lease and generates
+# afresh. Expired documents are ignored (and can be cleaned up with a
+# Firestore TTL policy on expires_at).
+
+@firestore.transactional
+def _acquire_lease_in_transaction(transaction, lease_ref, job_id: str, lease_seconds: float) -> Dict[str, Any]:
+    snapshot = lease_ref.get(transaction=transaction)
+    now = datetime.now(timezone.utc)
+
+    if snapshot.exists:
+        lease = snapshot.to_dict()
+        if lease["status"] == "running" and lease["expires_at"] > now:
+            return lease
+
+    lease = {
+        "owner_job_id": job_id,
+        "status": "running",
+        "expires_at": now + timedelta(seconds=lease_seconds),
+        "result": None
+    }
+    transaction.set(lease_ref, lease)
+    return lease
+
+
+async def acquire_inflight_lease(key: str, job_id: str, lease_seconds: float) -> Dict[str, Any]:
+    """
+    Take the single-flight lease for an input, unless another job is generating from it
+
+    Args:
+        key: Input content hash
+        job_id: Job asking for the lease
+        lease_seconds: How long the lease lasts if taken
+
+    Returns:
+        The current lease: ours if "owner_job_id" is job_id, otherwise another
+        job's running lease
+    """
+    try:
+        lease_ref = db.collection("inflight").document(key)
+        return _acquire_lease_in_transaction(db.transaction(), lease_ref, job_id, lease_seconds)
+    except Exception as e:
+        logger.error(f"Error acquiring lease {key}: {str(e)}")
+        raise
+
+
+async def get_inflight_lease(key: str) -> Optional[Dict[str, Any]]:
+    """Current single-flight lease for an input, or None if there is none or it expired"""
+    try:
+        snapshot = db.collection("inflight").document(key).get()
+        if not snapshot.exists:
+            return None
+        lease = snapshot.to_dict()
+        if lease["expires_at"] <= datetime.now(timezone.utc):
+            return None
+        return lease
+    except Exception as e:
+        logger.error(f"Error getting lease {key}: {str(e)}")
+        raise
+
+
+@firestore.transactional
+def _complete_lease_in_transaction(
+    transaction,
+    lease_ref,
+    job_id: str,
+    result: Dict[str, Any],
+    handoff_seconds: float
+) -> bool:
+    snapshot = lease_ref.get(transaction=transaction)
+    if not snapshot.exists or snapshot.to_dict().get("owner_job_id") != job_id:
+        return False
+
+    transaction.update(lease_ref, {
+        "status": "done",
+        "result": result,
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=handoff_seconds)
+    })
+    return True
+
+
+async def complete_inflight_lease(key: str, job_id: str, result: Dict[str, Any], handoff_seconds: float) -> bool:
+    """
+    Mark a lease done with the result for the jobs waiting on it
+
+    Args:
+        key: Input content hash
+        job_id: Job completing the lease
+        result: Shared result (see utils/single_flight.py)
+        handoff_seconds: How long waiting jobs have to pick the result up
+
+    Returns:
+        False if job_id no longer holds the lease (it expired and another job took it over)
+    """
+    try:
+        lease_ref = db.collection("inflight").document(key)
+        return _complete_lease_in_transaction(db.transaction(), lease_ref, job_id, result, handoff_seconds)
+    except Exception as e:
+        logger.error(f"Error completing lease {key}: {str(e)}")
+        raise
+
+
+async def release_inflight_lease(key: str, job_id: str) -> None:
+    """Drop a lease this job still holds, so a waiting job can take over"""
+    try:
+        lease_ref = db.collection("inflight").document(key)
+        snapshot = lease_ref.get()
+        if snapshot.exists and snapshot.to_dict().get("owner_job_id") == job_id:
+            lease_ref.delete()
+    except Exception as e:
+        logger.error(f"Error releasing lease {key}: {str(e)}")
+        raise
+
+
 async def get_user_for_job(job_id: str) -> Optional[Dict[str, Any]]:
     """Get user associated with a job"""
     try:
@@ -3,15 +3,39 @@ Google Cloud Storage helper functions
 """
 from google.cloud import storage
 from typing import Optional
+import asyncio
 import logging
+import mimetypes
 import os
 
+from utils.digest import file_digest
+
 logger = logging.getLogger(__name__)
 
-# Initialize GCS client
+# Initialize GCS client (synchronous; transfers run in a worker thread)
 storage_client = storage.Client()
 
 
+# Hex digits of the content hash in blob names
+CONTENT_HASH_LENGTH = 16
+
+
+def content_hashed_name(local_path: str, prefix: str) -> str:
+    """
+    Blob name that changes whenever the file's content does (reads the whole
+    file; call it off the event loop)
+
+    Args:
+        local_path: Local file path (its extension is kept)
+        prefix: Name before the hash, e.g. "{job_id}_avatar"
+
+    Returns:
+        "{prefix}.{sha256 prefix}{ext}"
+    """
+    ext = os.path.splitext(local_path)[1]
+    return f"{prefix}.{file_digest(local_path)[:CONTENT_HASH_LENGTH]}{ext}"
+
+
 async def download_from_gcs(bucket_name: str, blob_name: str, local_path: str) -> str:
     """
     Download file from GCS to local path
@@ -31,7 +55,7 @@ async def download_from_gcs(bucket_name: str, blob_name: str, local_path: str) -
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
 
-        blob.download_to_filename(local_path)
+        await asyncio.to_thread(blob.download_to_filename, local_path)
         logger.info(f"Downloaded gs://{bucket_name}/{blob_name} to {local_path}")
 
         return local_path
@@ -41,7 +65,13 @@ async def download_from_gcs(bucket_name: str, blob_name: str, local_path: str) -
         raise
 
 
-async def upload_to_gcs(local_path: str, bucket_name: str, blob_name: str) -> str:
+async def upload_to_gcs(
+    local_path: str,
+    bucket_name: str,
+    blob_name: str,
+    content_type: Optional[str] = None,
+    cache_control: Optional[str] = None
+) -> str:
     """
     Upload file from local path to GCS
 
@@ -49,6 +79,8 @@ async def upload_to_gcs(local_path: str, bucket_name: str, blob_name: str) -> st
         local_path: Local file path
         bucket_name: GCS bucket name
         blob_name: Blob name (file path in bucket)
+        content_type: Content-Type to serve (default: guessed from the file extension)
+        cache_control: Cache-Control to serve (default: none set)
 
     Returns:
         Public HTTP URL (https://storage.googleapis.com/bucket/blob)
@@ -56,8 +88,10 @@ async def upload_to_gcs(local_path: str, bucket_name: str, blob_name: str) -> st
     try:
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
+        blob.cache_control = cache_control
 
-        blob.upload_from_filename(local_path)
+        content_type = content_type or mimetypes.guess_type(local_path)[0]
+        await asyncio.to_thread(blob.upload_from_filename, local_path, content_type=content_type)
         logger.info(f"Uploaded {local_path} to gs://{bucket_name}/{blob_name}")
 
         # Return public HTTP URL instead of gs:// URI
@@ -0,0 +1,120 @@
+"""
+Hedged image model calls
+
+gpt-image-1 usually answers in ~20s but sometimes takes over a minute. A
+hedged call starts one backup request if the first hasn't returned by the
+observed p90 model latency and keeps whichever finishes first, which cuts
+the tail at the cost of a second request for roughly one call in ten.
+
+Hedges are limited to the lanes in HEDGE_LANES and to HEDGE_MAX_PER_HOUR per
+instance, since each one is billed. Every completed call's latency feeds
+the model_call_ms metric the threshold comes from; cancelled backups aren't
+recorded, so the p90 reads slightly low, which errs towards hedging.
+"""
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+import asyncio
+import logging
+import os
+import time
+
+from config import (
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_MAX_PER_HOUR
+)
+from utils.metrics import get_stats
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeBudget:
+    """At most `per_hour` hedges in any rolling hour"""
+
+    def __init__(self, per_hour: int):
+        self.per_hour = per_hour
+        self._spent: Deque[float] = deque()
+
+    def remaining(self) -> int:
+        cutoff = time.monotonic() - 3600
+        while self._spent and self._spent[0] < cutoff:
+            self._spent.popleft()
+        return max(0, self.per_hour - len(self._spent))
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget if any is left"""
+        if self.remaining() == 0:
+            return False
+        self._spent.append(time.monotonic())
+        return True
+
+
+hedge_budget = HedgeBudget(HEDGE_MAX_PER_HOUR)
+
+
+def hedge_delay() -> Optional[float]:
+    """Seconds to wait before hedging, or None until enough calls have been seen"""
+    stats = get_stats("model_call_ms")
+    if stats.count() < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY_SECONDS, stats.percentile(HEDGE_PERCENTILE) / 1000)
+
+
+async def _timed(call: Callable[[str], Awaitable[str]], output_path: str) -> str:
+    start = time.perf_counter()
+    result = await call(output_path)
+    get_stats("model_call_ms").record(int((time.perf_counter() - start) * 1000))
+    return result
+
+
+async def hedged_call(call: Callable[[str], Awaitable[str]], output_path: str, hedge: bool = False) -> str:
+    """
+    Run a model call, hedging it with one backup request if it runs long
+
+    Args:
+        call: Makes one model request writing to the given path
+        output_path: Where the result must end up
+        hedge: Whether this job may hedge (its lane is in HEDGE_LANES)
+
+    Returns:
+        output_path
+    """
+    primary = asyncio.create_task(_timed(call, output_path))
+    delay = hedge_delay() if hedge and HEDGE_ENABLED else None
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or not hedge_budget.try_spend():
+        return await primary
+
+    logger.info(f"Model call still running after {delay:.1f}s, sending a hedge request")
+    base, ext = os.path.splitext(output_path)
+    backup_path = f"{base}_hedge{ext}"
+    backup = asyncio.create_task(_timed(call, backup_path))
+    pending = {primary, backup}
+    error: Optional[BaseException] = None
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+
+                backup_won = task is backup
+                get_stats("hedge_won").record(1 if backup_won else 0)
+                if backup_won:
+                    logger.info("Hedge request finished first")
+                    os.replace(backup_path, output_path)
+                return output_path
+
+        raise error
+
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
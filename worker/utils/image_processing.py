@@ -2,15 +2,26 @@
 Image processing utilities (background removal, compositing, watermark, isolation)
 """
 from PIL import Image, ImageDraw, ImageFont
-from rembg import remove
-from scipy import ndimage
 import numpy as np
-from typing import Tuple
+from typing import Any, Dict, Iterable, Optional
+import asyncio
 import logging
 import os
+import time
+
+from utils.background import get_session, cut_out
+from utils.components import label_components
+from utils.quality import sprite_stats, quality_verdict
 
 logger = logging.getLogger(__name__)
 
+# Watermark font size and margin at _WATERMARK_REFERENCE_HEIGHT; smaller
+# images (renditions) scale both down, but never below the minimum font size
+_WATERMARK_FONT_SIZE = 40
+_WATERMARK_MARGIN = 20
+_WATERMARK_REFERENCE_HEIGHT = 1024
+_WATERMARK_MIN_FONT_SIZE = 9
+
 
 async def remove_background(input_path: str) -> str:
     """
@@ -28,8 +39,8 @@ async def remove_background(input_path: str) -> str:
         # Read input image
         input_img = Image.open(input_path)
 
-        # Remove background (this takes ~2-3 seconds)
-        output_img = remove(input_img)
+        # Remove background (this takes ~2-3 seconds, so run it off the event loop)
+        output_img = await asyncio.to_thread(cut_out, input_img)
 
         # Save output
         output_path = input_path.replace("_input", "_nobg").replace(".jpg", ".png")
@@ -43,7 +54,78 @@ async def remove_background(input_path: str) -> str:
         raise
 
 
-async def isolate_largest_character(input_path: str) -> str:
+def _crop_to_largest_component(img: Image.Image, quality: Optional[Dict[str, Any]] = None) -> Optional[Image.Image]:
+    """
+    Keep only the largest opaque component, cropped to its bounds plus 5% padding
+
+    Args:
+        img: Image with a transparent background
+        quality: If given, updated with sprite_stats() and quality_verdict()
+
+    Returns:
+        Cropped RGBA image, or None if the image has no opaque pixels
+    """
+    # Ensure RGBA
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    # Convert to numpy array
+    arr = np.array(img)
+
+    # Get alpha channel mask (non-transparent pixels)
+    alpha = arr[:, :, 3]
+    mask = alpha > 128
+
+    # Label connected components (areas and bounding boxes in the same pass)
+    components = label_components(mask)
+    num_features = components.count
+
+    if quality is not None:
+        stats = sprite_stats(mask, components)
+        quality.update(stats)
+        quality.update(quality_verdict(stats))
+
+    if num_features == 0:
+        return None
+
+    if num_features == 1:
+        logger.info("Single character detected, no isolation needed")
+        # Still crop to bounds for cleaner output
+    else:
+        logger.info(f"Found {num_features} separate regions, keeping largest")
+
+    # Find the largest component
+    largest = int(np.argmax(components.areas))
+
+    # Create mask for only the largest component
+    largest_mask = components.labeled == largest + 1
+
+    # Bounding box of largest component (inclusive max)
+    y_min, y_max, x_min, x_max = (int(v) for v in components.boxes[largest])
+    y_max -= 1
+    x_max -= 1
+
+    # Add padding (5% of dimensions)
+    pad_x = int((x_max - x_min) * 0.05)
+    pad_y = int((y_max - y_min) * 0.05)
+    x_min = max(0, x_min - pad_x)
+    x_max = min(img.width, x_max + pad_x + 1)
+    y_min = max(0, y_min - pad_y)
+    y_max = min(img.height, y_max + pad_y + 1)
+
+    # Mask out everything except the largest component
+    masked_arr = arr.copy()
+    masked_arr[~largest_mask] = [0, 0, 0, 0]
+
+    # Crop to the bounding box
+    return Image.fromarray(masked_arr[y_min:y_max, x_min:x_max])
+
+
+async def isolate_largest_character(
+    input_path: str,
+    quality: Optional[Dict[str, Any]] = None,
+    png_options: Optional[Dict[str, Any]] = None
+) -> str:
     """
     Isolate the largest character from an image with multiple figures.
     Uses background removal + connected component analysis to handle
@@ -51,6 +133,9 @@ async def isolate_largest_character(input_path: str) -> str:
 
     Args:
         input_path: Path to generated image (may have multiple characters)
+        quality: If given, filled with the component statistics and a
+            quality verdict ({"ok", "reasons"}, see utils/quality.py)
+        png_options: PNG save options (see utils.encoding.save_options)
 
     Returns:
         Path to output image with only the largest character
@@ -70,68 +155,21 @@ async def isolate_largest_character(input_path: str) -> str:
             if min_alpha == max_alpha == 255:
                 needs_bg_removal = True
 
-        # Remove background if needed
+        # Remove background if needed (rembg and ndimage are CPU-bound, so
+        # both run in a worker thread to keep the event loop responsive)
         if needs_bg_removal:
             logger.info("Removing background for isolation analysis...")
-            img = remove(img)
+            img = await asyncio.to_thread(cut_out, img)
 
-        # Ensure RGBA
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-
-        # Convert to numpy array
-        arr = np.array(img)
-
-        # Get alpha channel mask (non-transparent pixels)
-        alpha = arr[:, :, 3]
-        mask = alpha > 128
+        cropped = await asyncio.to_thread(_crop_to_largest_component, img, quality)
 
-        # Label connected components
-        labeled, num_features = ndimage.label(mask)
-
-        if num_features == 0:
+        if cropped is None:
             logger.warning("No characters found in image, returning original")
             return input_path
 
-        if num_features == 1:
-            logger.info("Single character detected, no isolation needed")
-            # Still crop to bounds for cleaner output
-        else:
-            logger.info(f"Found {num_features} separate regions, keeping largest")
-
-        # Find the largest component
-        component_sizes = ndimage.sum(mask, labeled, range(1, num_features + 1))
-        largest_idx = np.argmax(component_sizes) + 1
-
-        # Create mask for only the largest component
-        largest_mask = labeled == largest_idx
-
-        # Find bounding box of largest component
-        rows = np.any(largest_mask, axis=1)
-        cols = np.any(largest_mask, axis=0)
-        y_indices = np.where(rows)[0]
-        x_indices = np.where(cols)[0]
-        y_min, y_max = y_indices[0], y_indices[-1]
-        x_min, x_max = x_indices[0], x_indices[-1]
-
-        # Add padding (5% of dimensions)
-        pad_x = int((x_max - x_min) * 0.05)
-        pad_y = int((y_max - y_min) * 0.05)
-        x_min = max(0, x_min - pad_x)
-        x_max = min(img.width, x_max + pad_x + 1)
-        y_min = max(0, y_min - pad_y)
-        y_max = min(img.height, y_max + pad_y + 1)
-
-        # Mask out everything except the largest component
-        masked_arr = arr.copy()
-        masked_arr[~largest_mask] = [0, 0, 0, 0]
-
-        # Crop to the bounding box
-        cropped = Image.fromarray(masked_arr[y_min:y_max, x_min:x_max])
-
         # Save
         output_path = input_path.replace("_pixel", "_isolated")
-        cropped.save(output_path, "PNG")
+        await asyncio.to_thread(cropped.save, output_path, "PNG", **(png_options or {}))
 
         logger.info(f"Isolated character saved to {output_path} ({cropped.width}x{cropped.height}px)")
         return output_path
@@ -141,6 +179,49 @@ async def isolate_largest_character(input_path: str) -> str:
         raise
 
 
+def _warm_up() -> Dict[str, int]:
+    timings = {}
+
+    start = time.perf_counter()
+    get_session()
+    timings["session_ms"] = int((time.perf_counter() - start) * 1000)
+
+    # Tiny opaque "sprite" so both inference and isolation do real work
+    img = Image.new("RGB", (320, 320), (255, 255, 255))
+    ImageDraw.Draw(img).rectangle((120, 60, 200, 260), fill=(200, 60, 40))
+
+    start = time.perf_counter()
+    cut = cut_out(img)
+    timings["inference_ms"] = int((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    _crop_to_largest_component(cut, {})
+    timings["isolation_ms"] = int((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+async def warm_up() -> Dict[str, int]:
+    """
+    Load the shared rembg session and run one synthetic image through
+    background removal and isolation
+
+    Later calls are cheap (the session already exists), so this is safe to
+    hit from a startup probe as well as the lifespan hook.
+
+    Returns:
+        Milliseconds spent on the session, first inference and isolation
+    """
+    try:
+        timings = await asyncio.to_thread(_warm_up)
+        logger.info(f"Warm-up complete: {timings}")
+        return timings
+
+    except Exception as e:
+        logger.error(f"Error warming up: {str(e)}")
+        raise
+
+
 async def composite_images(
     background_path: str,
     foreground_path: str,
@@ -210,11 +291,60 @@ async def composite_images(
         raise
 
 
+def _draw_watermark(
+    img: Image.Image,
+    text: str,
+    position: str,
+    opacity: float,
+    scale: float = 1.0
+) -> Image.Image:
+    """Composite watermark text onto an RGBA image, with font and margin scaled by `scale`"""
+    watermark = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(watermark)
+
+    font_size = max(_WATERMARK_MIN_FONT_SIZE, round(_WATERMARK_FONT_SIZE * scale))
+    # Try to use a nice font, fall back to default if not available
+    try:
+        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
+    except:
+        font = ImageFont.load_default()
+
+    # Calculate text size and position
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    margin = max(1, round(_WATERMARK_MARGIN * scale))
+
+    if position == "bottom-left":
+        x, y = margin, img.height - text_height - margin
+    elif position == "bottom-right":
+        x, y = img.width - text_width - margin, img.height - text_height - margin
+    elif position == "top-left":
+        x, y = margin, margin
+    elif position == "top-right":
+        x, y = img.width - text_width - margin, margin
+    else:
+        x, y = margin, img.height - text_height - margin
+
+    # Keep the start of the text on narrow images, and place the glyphs
+    # themselves (not the font's line box) at (x, y)
+    x = max(margin, x) - bbox[0]
+    y = y - bbox[1]
+
+    # Draw watermark with opacity
+    alpha = int(255 * opacity)
+    draw.text((x, y), text, fill=(255, 255, 255, alpha), font=font)
+
+    return Image.alpha_composite(img, watermark)
+
+
 async def add_watermark(
     image_path: str,
     text: str = "mini-me",
     position: str = "bottom-left",
-    opacity: float = 0.5
+    opacity: float = 0.5,
+    png_options: Optional[Dict[str, Any]] = None
 ) -> str:
     """
     Add watermark text to image
@@ -224,6 +354,7 @@ async def add_watermark(
         text: Watermark text
         position: Position of watermark
         opacity: Opacity of watermark (0.0 to 1.0)
+        png_options: PNG save options (see utils.encoding.save_options)
 
     Returns:
         Path to watermarked image
@@ -231,51 +362,119 @@ async def add_watermark(
     try:
         logger.info(f"Adding watermark to {image_path}")
 
-        # Load image
-        img = Image.open(image_path).convert("RGBA")
+        img = _draw_watermark(Image.open(image_path).convert("RGBA"), text, position, opacity)
+
+        # Save
+        output_path = image_path.replace("_isolated", "_watermarked").replace(".png", "_watermarked.png")
+        img.save(output_path, "PNG", **(png_options or {}))
 
-        # Create transparent overlay for watermark
-        watermark = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(watermark)
+        logger.info(f"Watermarked image saved to {output_path}")
+        return output_path
 
-        # Try to use a nice font, fall back to default if not available
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 40)
-        except:
-            font = ImageFont.load_default()
+    except Exception as e:
+        logger.error(f"Error adding watermark: {str(e)}")
+        raise
 
-        # Calculate text size and position
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
 
-        margin = 20
+def _subsample(img: Image.Image, step: int) -> Image.Image:
+    """Keep the centre pixel of every step x step block (an exact integer downscale)"""
+    if step == 1:
+        return img
+    arr = np.asarray(img)
+    return Image.fromarray(np.ascontiguousarray(arr[step // 2::step, step // 2::step]), img.mode)
 
-        if position == "bottom-left":
-            x, y = margin, img.height - text_height - margin
-        elif position == "bottom-right":
-            x, y = img.width - text_width - margin, img.height - text_height - margin
-        elif position == "top-left":
-            x, y = margin, margin
-        elif position == "top-right":
-            x, y = img.width - text_width - margin, margin
-        else:
-            x, y = margin, img.height - text_height - margin
 
-        # Draw watermark with opacity
-        alpha = int(255 * opacity)
-        draw.text((x, y), text, fill=(255, 255, 255, alpha), font=font)
+def _scale_to_height(sprite: Image.Image, height: int) -> Image.Image:
+    """
+    Nearest-neighbour scale by a whole factor, to the height closest to `height`
 
-        # Composite watermark onto image
-        img = Image.alpha_composite(img, watermark)
+    The sprite (one image pixel per sprite pixel) is enlarged by an integer
+    multiple or reduced by an integer divisor, so every sprite pixel comes
+    out the same size; the exact height floats to the nearest such factor.
+    """
+    candidates = []
+    for factor in {max(1, height // sprite.height), max(1, -(-height // sprite.height))}:
+        candidates.append((sprite.height * factor, factor, 1))
+    for step in {max(1, sprite.height // height), max(1, -(-sprite.height // height))}:
+        candidates.append((len(range(step // 2, sprite.height, step)), 1, step))
 
-        # Save
-        output_path = image_path.replace("_isolated", "_watermarked").replace(".png", "_watermarked.png")
-        img.save(output_path, "PNG")
+    _, factor, step = min(candidates, key=lambda c: (abs(c[0] - height), c[0]))
+    scaled = _subsample(sprite, step)
+    return scaled.resize((scaled.width * factor, scaled.height * factor), Image.Resampling.NEAREST)
 
-        logger.info(f"Watermarked image saved to {output_path}")
-        return output_path
+
+def _create_renditions(
+    image_path: str,
+    heights: Iterable[int],
+    thumbnail_height: int,
+    thumbnail_quality: int,
+    pixel_size: int,
+    watermark: Optional[Dict[str, Any]],
+    png_options: Optional[Dict[str, Any]]
+) -> Dict[str, str]:
+    # Decode once and drop back to one pixel per sprite pixel; every rendition
+    # is a whole-number scale of that
+    sprite = _subsample(Image.open(image_path).convert("RGBA"), pixel_size)
+    base, _ = os.path.splitext(image_path)
+    outputs = {}
+
+    def render(height: int) -> Image.Image:
+        img = _scale_to_height(sprite, height)
+        if watermark:
+            # Drawn at the rendition's own size; a scaled-down watermark wouldn't survive
+            img = _draw_watermark(img, scale=img.height / _WATERMARK_REFERENCE_HEIGHT, **watermark)
+        return img
+
+    for height in heights:
+        path = f"{base}_{height}.png"
+        render(height).save(path, "PNG", **(png_options or {}))
+        outputs[str(height)] = path
+
+    thumb_path = f"{base}_thumb.webp"
+    render(thumbnail_height).save(thumb_path, "WEBP", quality=thumbnail_quality)
+    outputs["thumbnail"] = thumb_path
+
+    return outputs
+
+
+async def create_renditions(
+    image_path: str,
+    heights: Iterable[int] = (64, 128, 256, 512),
+    thumbnail_height: int = 128,
+    thumbnail_quality: int = 80,
+    pixel_size: int = 1,
+    watermark: Optional[Dict[str, Any]] = None,
+    png_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """
+    Create renditions of an avatar near fixed heights, plus a WebP thumbnail
+
+    Renditions are whole-number nearest-neighbour scales of the sprite, so
+    sprite pixels stay square and even; each height is the achievable one
+    closest to the one asked for (a 100px-tall sprite gives 50px for 64
+    and 500px for 512).
+
+    Args:
+        image_path: Path to the final avatar PNG
+        heights: Target heights (px) of the nearest-neighbour PNG renditions
+        thumbnail_height: Target height (px) of the WebP thumbnail
+        thumbnail_quality: WebP quality (0-100)
+        pixel_size: Image pixels per sprite pixel (the snapped grid's upscale;
+            1 if the image wasn't snapped)
+        watermark: add_watermark arguments (text, position, opacity) to draw
+            on each rendition at its own size; pass the unwatermarked image
+        png_options: PNG save options (see utils.encoding.save_options)
+
+    Returns:
+        Local paths keyed by target height ("64", "128", ...) and "thumbnail"
+    """
+    try:
+        outputs = await asyncio.to_thread(
+            _create_renditions, image_path, heights, thumbnail_height, thumbnail_quality, pixel_size, watermark, png_options
+        )
+        logger.info(f"Created {len(outputs)} renditions of {image_path}")
+        return outputs
 
     except Exception as e:
-        logger.error(f"Error adding watermark: {str(e)}")
+        logger.error(f"Error creating renditions: {str(e)}")
         raise
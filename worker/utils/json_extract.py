@@ -0,0 +1,157 @@
+"""
+JSON object extraction from model responses
+
+Claude usually returns bare JSON, but sometimes wraps it in a markdown fence
+or adds a sentence around it. JsonObjectScanner finds the first JSON object
+in one pass: it tracks brace depth (ignoring braces inside strings) and,
+each time a top-level {...} span closes, parses it with
+json.JSONDecoder.raw_decode at that offset. Nesting depth is unlimited, and
+inputs that made the old regexes backtrack are rejected in milliseconds.
+
+The scanner accepts text in pieces, so a streamed response can be parsed as
+tokens arrive and the stream closed once the object is complete.
+Stdlib only, so test_json_extraction.py can run without the worker's
+dependencies.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import re
+
+_decoder = json.JSONDecoder()
+
+# Characters that change the scanner's state outside and inside strings
+_STRUCTURAL = re.compile(r'[{}"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+# An object opens with a key or closes straight away; other spans aren't worth parsing
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+
+class JsonObjectScanner:
+    """Finds the first JSON object in text that may arrive in pieces"""
+
+    def __init__(self):
+        self.text = ""
+        self.result: Optional[Dict[str, Any]] = None
+        self._pos = 0  # Next character to scan
+        self._open: List[int] = []  # Offsets of unclosed "{"
+        self._spans: List[Tuple[int, int]] = []  # Closed spans inside the current top-level one
+        self._in_string = False
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """
+        Scan more text
+
+        Args:
+            chunk: The next piece of the response
+
+        Returns:
+            The first JSON object, once one has been found (later calls keep returning it)
+        """
+        if self.result is not None:
+            return self.result
+
+        self.text += chunk
+        text = self.text
+        pos = self._pos
+
+        while pos < len(text):
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pos = len(text)
+                    break
+                if match.group() == "\\":
+                    if match.start() + 1 >= len(text):
+                        # Escape split across chunks; rescan it with the next one
+                        pos = match.start()
+                        break
+                    pos = match.start() + 2
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            if not self._open:
+                # Outside any object only "{" matters (prose may contain quotes)
+                pos = text.find("{", pos)
+                if pos == -1:
+                    pos = len(text)
+                    break
+                self._open.append(pos)
+                pos += 1
+                continue
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            char, pos = match.group(), match.end()
+
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._open.append(match.start())
+            else:
+                start = self._open.pop()
+                self._spans.append((start, pos))
+                if not self._open and self._decode_spans():
+                    break
+
+        self._pos = pos
+        return self.result
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """
+        End of text: also try complete objects nested in an unclosed brace
+
+        Returns:
+            The first JSON object, or None if the text has none
+        """
+        if self.result is None and self._open:
+            self._decode_spans()
+        return self.result
+
+    def _decode_spans(self) -> bool:
+        """Parse the closed spans in text order, outermost first; True once one is an object"""
+        spans = sorted(self._spans)
+        self._spans = []
+        skip_until = 0
+
+        for start, end in spans:
+            if start < skip_until:
+                # Part of an object that parsed this far before failing
+                continue
+            if not _OBJECT_START.match(self.text, start):
+                continue
+            try:
+                # Parse just the span: a failed parse's error message counts
+                # lines up to the error, which over the whole text is quadratic
+                value, _ = _decoder.raw_decode(self.text[start:end])
+            except json.JSONDecodeError as e:
+                skip_until = max(skip_until, start + e.pos)
+                continue
+            except RecursionError:
+                skip_until = max(skip_until, end)
+                continue
+
+            if isinstance(value, dict):
+                self.result = value
+                return True
+
+        return False
+
+
+def extract_json_from_text(text: str) -> Optional[Dict]:
+    """
+    Extract JSON from text that may contain markdown code blocks or extra text
+
+    Args:
+        text: Raw text that may contain JSON
+
+    Returns:
+        First JSON object in the text, or None if there is none (a bare JSON
+        array doesn't count)
+    """
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+    return scanner.finish()
@@ -0,0 +1,94 @@
+"""
+Priority lanes for generation jobs
+
+Paid and free-tier jobs arrive on separate Pub/Sub subscriptions. Free jobs
+yield to paid work: while paid jobs are waiting in the queue, a free job is
+nacked (HTTP 429) so Pub/Sub redelivers it later with backoff and the
+instance is free to pick up paid work. A free job that has already waited
+FREE_LANE_MAX_DEFER_SECONDS is processed regardless, so it cannot starve.
+
+Bulk jobs (style refreshes, creator packs) never go through Pub/Sub; the
+bulk runner (bulk.py) processes them and only starts one while neither live
+lane has queued work.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import logging
+import time
+
+from config import (
+    FREE_LANE_YIELD_PAID_BACKLOG,
+    FREE_LANE_MAX_DEFER_SECONDS,
+    LANE_BACKLOG_CACHE_SECONDS
+)
+from utils.firestore import count_queued_jobs
+from utils.metrics import get_stats
+
+logger = logging.getLogger(__name__)
+
+PAID_LANE = "paid"
+FREE_LANE = "free"
+BULK_LANE = "bulk"
+
+# Cached paid backlog: (monotonic timestamp, queued paid jobs)
+_paid_backlog_cache = (0.0, 0)
+
+
+def job_lane(job: Dict[str, Any], message_attributes: Optional[Dict[str, str]] = None) -> str:
+    """Lane of a job (jobs created before lanes existed fall back to the watermark flag)"""
+    lane = job.get("lane") or (message_attributes or {}).get("lane")
+    if lane in (PAID_LANE, FREE_LANE, BULK_LANE):
+        return lane
+    return FREE_LANE if job.get("has_watermark", False) else PAID_LANE
+
+
+def queue_wait_seconds(job: Dict[str, Any]) -> float:
+    """Seconds since the job was created"""
+    created_at = job.get("created_at")
+    if not created_at:
+        return 0.0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - created_at).total_seconds())
+
+
+async def _paid_backlog() -> int:
+    global _paid_backlog_cache
+
+    fetched_at, backlog = _paid_backlog_cache
+    if time.monotonic() - fetched_at < LANE_BACKLOG_CACHE_SECONDS:
+        return backlog
+
+    backlog = await count_queued_jobs(lane=PAID_LANE)
+    _paid_backlog_cache = (time.monotonic(), backlog)
+    return backlog
+
+
+async def should_defer(lane: str, waited_seconds: float) -> bool:
+    """
+    Decide whether a job should be handed back to Pub/Sub for later
+
+    Args:
+        lane: Job lane
+        waited_seconds: How long the job has been queued
+
+    Returns:
+        True if the job should be nacked and retried later
+    """
+    if lane != FREE_LANE or waited_seconds >= FREE_LANE_MAX_DEFER_SECONDS:
+        return False
+
+    try:
+        backlog = await _paid_backlog()
+    except Exception as e:
+        # Never block free jobs on a failed count
+        logger.warning(f"Paid backlog unavailable, not deferring: {str(e)}")
+        return False
+
+    return backlog >= FREE_LANE_YIELD_PAID_BACKLOG
+
+
+def record_queue_wait(lane: str, waited_seconds: float) -> None:
+    """Record how long a job waited on its lane before processing started"""
+    get_stats(f"queue_wait_ms.{lane}").record(waited_seconds * 1000)
+    logger.info(f"queue_wait lane={lane} ms={int(waited_seconds * 1000)}")
@@ -0,0 +1,112 @@
+"""
+In-process rolling metrics (latency percentiles, counters)
+
+Samples are kept per worker instance in a bounded window and exposed through
+the /metrics endpoint. They are also logged so Cloud Logging log-based
+metrics can aggregate across instances.
+"""
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional, Tuple
+import math
+import threading
+import time
+
+# Default sliding window
+DEFAULT_MAX_SAMPLES = 500
+DEFAULT_MAX_AGE_SECONDS = 15 * 60
+
+
+def _nearest_rank(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list"""
+    return sorted_values[max(1, math.ceil(p / 100 * len(sorted_values))) - 1]
+
+
+class RollingStats:
+    """Bounded window of recent samples with percentile queries"""
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        """Add a sample"""
+        with self._lock:
+            self._samples.append((time.monotonic(), value))
+
+    def _values(self):
+        cutoff = time.monotonic() - self.max_age_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return [value for _, value in self._samples]
+
+    def count(self) -> int:
+        """Number of samples in the window"""
+        return len(self._values())
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile (0-100) of the window, or None when empty"""
+        values = sorted(self._values())
+        if not values:
+            return None
+        return _nearest_rank(values, p)
+
+    def mean(self) -> Optional[float]:
+        """Mean of the window, or None when empty"""
+        values = self._values()
+        if not values:
+            return None
+        return sum(values) / len(values)
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Summary of the window for reporting"""
+        values = sorted(self._values())
+        if not values:
+            return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 2),
+            "p50": _nearest_rank(values, 50),
+            "p95": _nearest_rank(values, 95),
+            "p99": _nearest_rank(values, 99),
+            "max": values[-1]
+        }
+
+
+_registry: Dict[str, RollingStats] = {}
+_registry_lock = threading.Lock()
+
+
+def get_stats(name: str) -> RollingStats:
+    """Get (or create) the named rolling metric"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = RollingStats()
+        return _registry[name]
+
+
+def snapshot_all() -> Dict[str, Dict[str, Optional[float]]]:
+    """Summaries of every registered metric"""
+    with _registry_lock:
+        names = list(_registry)
+    return {name: get_stats(name).snapshot() for name in sorted(names)}
+
+
+@contextmanager
+def timed_stage(timings: Dict[str, int], name: str):
+    """
+    Time a pipeline stage
+
+    Adds the duration to ``timings[name]`` (ms; stages that run more than
+    once accumulate) and records it in the ``stage_ms.<name>`` rolling metric.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        timings[name] = timings.get(name, 0) + elapsed_ms
+        get_stats(f"stage_ms.{name}").record(elapsed_ms)
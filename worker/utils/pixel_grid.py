@@ -0,0 +1,258 @@
+"""
+Pixel-grid snapping and palette quantization
+
+gpt-image-1 draws "pixel art" at 1024², so each sprite pixel is a soft-edged
+block of roughly 8-16 output pixels with anti-aliased borders. Finding that
+block size and sampling one colour per block recovers the true sprite; a
+small palette and an indexed PNG then make it tiny and crisp.
+"""
+from PIL import Image
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Colour steps (sum over RGBA) smaller than this are anti-aliasing noise
+_EDGE_THRESHOLD = 48
+
+# A gap between grid lines "fits" a pixel size if it is within this many
+# pixels of a whole number of cells
+_FIT_TOLERANCE = 1.5
+
+# A grid needs at least 8 gaps between edges of 3+ pixels each (see
+# _fit_pixel_size); smaller images can't show one
+_MIN_GRID_IMAGE = 24
+
+
+def _edge_lines(arr: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Positions of colour edges between columns (axis=1) or rows (axis=0)
+
+    Anti-aliasing smears one edge over adjacent lines, so runs of edge lines
+    are merged into one position at their weighted centre.
+    """
+    diff = np.abs(np.diff(arr.astype(np.int16), axis=axis)).sum(axis=2)
+    profile = (diff > _EDGE_THRESHOLD).sum(axis=1 - axis).astype(np.float64)
+
+    # Ignore lines with only a few stray edges
+    active = profile > max(2.0, profile.max() * 0.05)
+    positions = []
+    start = None
+    for i, on in enumerate(np.append(active, False)):
+        if on and start is None:
+            start = i
+        elif not on and start is not None:
+            weights = profile[start:i]
+            # Edge at profile index i lies between pixels i and i + 1
+            positions.append(float(np.average(np.arange(start, i), weights=weights)) + 1)
+            start = None
+    return np.array(positions)
+
+
+def _fit_pixel_size(positions: np.ndarray, min_size: float, max_size: float) -> Tuple[float, float]:
+    """
+    Largest pixel size that explains the gaps between edge lines
+
+    Every gap between neighbouring edges should be a whole number of sprite
+    pixels. Smaller sizes (halves, thirds) explain the gaps just as well, so
+    the largest size within 90% of the best fit wins, then is refined.
+
+    Returns:
+        (size, fraction of gaps that fit)
+    """
+    gaps = np.diff(positions)
+    if len(gaps) < 8:
+        return 1.0, 0.0
+
+    sizes = np.arange(min_size, max_size + 0.001, 0.05)
+    cells = np.maximum(np.round(gaps[None, :] / sizes[:, None]), 1)
+    fits = (np.abs(gaps[None, :] - cells * sizes[:, None]) <= _FIT_TOLERANCE).mean(axis=1)
+
+    best = fits.max()
+    size = float(sizes[np.nonzero(fits >= best * 0.9)[0][-1]])
+
+    # The tolerance lets the coarse pick sit high; refine with a least-squares
+    # fit (total length / total cells) over the gaps that fit
+    for _ in range(3):
+        cells = np.maximum(np.round(gaps / size), 1)
+        fitting = np.abs(gaps - cells * size) <= _FIT_TOLERANCE
+        if not fitting.any():
+            break
+        size = float(gaps[fitting].sum() / cells[fitting].sum())
+
+    cells = np.maximum(np.round(gaps / size), 1)
+    return size, float((np.abs(gaps - cells * size) <= _FIT_TOLERANCE).mean())
+
+
+def _grid_phase(positions: np.ndarray, size: float) -> float:
+    """Where the grid starts (0 <= phase < size), from the circular mean of edge positions"""
+    angles = 2 * np.pi * positions / size
+    phase = np.arctan2(np.sin(angles).mean(), np.cos(angles).mean()) * size / (2 * np.pi)
+    return float(phase % size)
+
+
+def detect_grid(img: Image.Image, max_size: float = 32, min_fit: float = 0.8) -> Tuple[float, float, float]:
+    """
+    Detect the effective pixel size of an upscaled pixel-art image
+
+    The size may be fractional (a 128-pixel sprite drawn at 1000px has
+    7.8px cells).
+
+    Args:
+        img: RGBA image
+        max_size: Largest pixel size to consider
+        min_fit: Share of edge gaps that must fit the grid to accept it
+
+    Returns:
+        (size, x_offset, y_offset) - size 1.0 means no grid was found;
+        offsets are where the grid lines fall modulo the size
+    """
+    if min(img.size) < _MIN_GRID_IMAGE:
+        return 1.0, 0.0, 0.0
+
+    arr = np.asarray(img.convert("RGBA"))
+    columns = _edge_lines(arr, axis=1)
+    rows = _edge_lines(arr, axis=0)
+
+    size_x, fit_x = _fit_pixel_size(columns, 3, max_size)
+    size_y, fit_y = _fit_pixel_size(rows, 3, max_size)
+
+    # Pixels are square; disagreeing axes mean this isn't pixel art
+    if min(fit_x, fit_y) < min_fit or abs(size_x - size_y) > 0.1 * max(size_x, size_y):
+        return 1.0, 0.0, 0.0
+
+    size = round((size_x + size_y) / 2, 2)
+    return size, _grid_phase(columns, size), _grid_phase(rows, size)
+
+
+def _cell_centres(length: int, size: float, offset: float) -> np.ndarray:
+    first = offset + size / 2 - size * np.ceil(offset / size)
+    centres = np.arange(first, length, size)
+    return np.round(centres[centres >= 0]).astype(int).clip(0, length - 1)
+
+
+def snap_to_grid(img: Image.Image, size: float, offset_x: float = 0, offset_y: float = 0) -> Image.Image:
+    """
+    Downsample to one pixel per grid cell by sampling each cell's centre
+
+    Alpha is made binary (pixel art has no partial transparency).
+    """
+    arr = np.asarray(img.convert("RGBA"))
+    ys = _cell_centres(arr.shape[0], size, offset_y)
+    xs = _cell_centres(arr.shape[1], size, offset_x)
+    sprite = arr[np.ix_(ys, xs)].copy()
+    sprite[..., 3] = np.where(sprite[..., 3] > 128, 255, 0)
+    return Image.fromarray(sprite, "RGBA")
+
+
+def quantize_palette(img: Image.Image, colors: int = 32) -> Image.Image:
+    """
+    Reduce an RGBA sprite to an indexed image with at most `colors` entries
+
+    Index 0 is reserved for transparency; the palette is built from opaque
+    pixels only so no entries are spent on the background.
+
+    Returns:
+        "P" mode image with info["transparency"] = 0
+    """
+    arr = np.asarray(img.convert("RGBA"))
+    opaque = arr[..., 3] > 0
+    rgb = Image.fromarray(np.ascontiguousarray(arr[..., :3]), "RGB")
+
+    if opaque.any():
+        # Palette from the opaque pixels, then map the whole image onto it
+        samples = Image.fromarray(arr[opaque][None, :, :3], "RGB")
+        palette_img = samples.quantize(colors - 1, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+        indices = np.asarray(rgb.quantize(palette=palette_img, dither=Image.Dither.NONE)).astype(np.uint8) + 1
+        palette = palette_img.getpalette()[:3 * (colors - 1)]
+    else:
+        indices = np.zeros(opaque.shape, dtype=np.uint8)
+        palette = []
+
+    indices[~opaque] = 0
+    out = Image.fromarray(indices, "P")
+    out.putpalette([0, 0, 0] + palette)
+    out.info["transparency"] = 0
+    return out
+
+
+def _snap_pixel_art(
+    image_path: str,
+    palette_colors: int,
+    max_grid: float,
+    min_fit: float,
+    png_options: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    img = Image.open(image_path).convert("RGBA")
+    size, offset_x, offset_y = detect_grid(img, max_size=max_grid, min_fit=min_fit)
+
+    if size == 1:
+        return {"grid_size": 1}
+
+    sprite = quantize_palette(snap_to_grid(img, size, offset_x, offset_y), palette_colors)
+
+    # Integer upscale back to roughly the original size, for display
+    scale = max(1, round(size))
+    upscaled = sprite.resize((sprite.width * scale, sprite.height * scale), Image.Resampling.NEAREST)
+
+    base, _ = os.path.splitext(image_path)
+    sprite_path = f"{base}_sprite.png"
+    upscaled_path = f"{base}_snapped.png"
+    sprite.save(sprite_path, "PNG", optimize=True, transparency=0)
+    # The upscale is what gets uploaded, so it follows the job's encoding profile
+    upscaled.save(upscaled_path, "PNG", transparency=0, **(png_options or {"optimize": True}))
+
+    return {
+        "grid_size": size,
+        "upscale": scale,
+        "sprite_size": [sprite.width, sprite.height],
+        "palette_colors": len(sprite.getcolors(256) or []),
+        "sprite_path": sprite_path,
+        "upscaled_path": upscaled_path
+    }
+
+
+async def snap_pixel_art(
+    image_path: str,
+    palette_colors: int = 32,
+    max_grid: float = 32,
+    min_fit: float = 0.8,
+    png_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Snap an isolated avatar to its pixel grid and quantize its palette
+
+    Args:
+        image_path: Path to the isolated RGBA avatar
+        palette_colors: Palette size, including the transparent entry
+        max_grid: Largest pixel size to look for
+        min_fit: Share of edge gaps that must fit a grid to treat the image as pixel art
+        png_options: PNG save options for the upscale (see
+            utils.encoding.save_options; default: optimized)
+
+    Returns:
+        grid_size (1 if no grid was found, in which case nothing else is set),
+        upscale factor, sprite_size, palette_colors, and paths to the
+        true-resolution sprite and its integer upscale (both indexed PNGs)
+    """
+    try:
+        result = await asyncio.to_thread(
+            _snap_pixel_art, image_path, palette_colors, max_grid, min_fit, png_options
+        )
+
+        if result["grid_size"] == 1:
+            logger.info(f"No pixel grid found in {image_path}, keeping it as is")
+        else:
+            logger.info(
+                f"Snapped {image_path} to a {result['grid_size']}px grid: "
+                f"{result['sprite_size'][0]}x{result['sprite_size'][1]} sprite, {result['palette_colors']} colours"
+            )
+        return result
+
+    except Exception as e:
+        logger.error(f"Error snapping pixel art: {str(e)}")
+        raise
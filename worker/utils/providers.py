@@ -0,0 +1,235 @@
+"""
+Image provider routing with health tracking and circuit breaking
+
+Three generators can produce an avatar from the input photo:
+
+- gpt_reference: gpt-image-1 edit with the photo as reference (primary)
+- claude_dalle: Claude analyses the photo and writes a prompt for DALL-E 3
+- claude_imagen: the same Claude prompt, rendered by Imagen
+
+The router keeps a rolling p95 latency and error rate per provider. A
+provider's circuit opens after PROVIDER_FAILURE_THRESHOLD consecutive
+failures or a PROVIDER_MAX_ERROR_RATE error rate; while open it is skipped
+for PROVIDER_OPEN_SECONDS, then one trial call is let through (half-open)
+and its result closes or re-opens the circuit. Providers whose p95 exceeds
+PROVIDER_MAX_P95_SECONDS are tried after healthy ones. A brownout of the
+primary then costs one failed or timed-out call per job instead of stalling
+the queue.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from config import (
+    DALLE_MODEL,
+    IMAGEN_MODEL,
+    PROVIDER_ORDER,
+    PROVIDER_TIMEOUT_SECONDS,
+    PROVIDER_MAX_P95_SECONDS,
+    PROVIDER_MAX_ERROR_RATE,
+    PROVIDER_MIN_SAMPLES,
+    PROVIDER_FAILURE_THRESHOLD,
+    PROVIDER_OPEN_SECONDS
+)
+from utils.ai import (
+    generate_prompt_for_image,
+    generate_pixel_art_with_dalle,
+    generate_pixel_art_with_imagen,
+    generate_pixel_art_with_gpt_reference
+)
+from utils.metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+async def _generate_with_claude_dalle(reference_image_path: str, output_path: str, hedge: bool = False) -> str:
+    prompt = await generate_prompt_for_image(reference_image_path)
+    return await generate_pixel_art_with_dalle(prompt, output_path)
+
+
+async def _generate_with_claude_imagen(reference_image_path: str, output_path: str, hedge: bool = False) -> str:
+    prompt = await generate_prompt_for_image(reference_image_path)
+    return await generate_pixel_art_with_imagen(prompt, output_path)
+
+
+# Provider name -> (generator(reference_image_path, output_path, hedge), model recorded in metadata);
+# only gpt_reference hedges, the Claude chains ignore the flag
+PROVIDERS: Dict[str, Tuple[Callable[..., Awaitable[str]], str]] = {
+    "gpt_reference": (generate_pixel_art_with_gpt_reference, "gpt-image-1"),
+    "claude_dalle": (_generate_with_claude_dalle, DALLE_MODEL),
+    "claude_imagen": (_generate_with_claude_imagen, IMAGEN_MODEL)
+}
+
+
+class ProviderHealth:
+    """Rolling latency/error stats and circuit state for one provider"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = RollingStats()  # ms, successful calls
+        self.errors = RollingStats()  # 1 per failed call, 0 per success
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def error_rate(self) -> Optional[float]:
+        if self.errors.count() < PROVIDER_MIN_SAMPLES:
+            return None
+        return self.errors.mean()
+
+    def degraded(self) -> bool:
+        """Slow enough to try other providers first"""
+        p95 = self.latency.percentile(95) if self.latency.count() >= PROVIDER_MIN_SAMPLES else None
+        return p95 is not None and p95 > PROVIDER_MAX_P95_SECONDS * 1000
+
+    def available(self) -> bool:
+        """Whether a call may go through now (claims the half-open trial)"""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= PROVIDER_OPEN_SECONDS:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return self.state != OPEN
+
+    def record_success(self, latency_ms: float) -> None:
+        self.latency.record(latency_ms)
+        self.errors.record(0)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"Provider {self.name} recovered, closing circuit")
+            # Start the error window afresh, or the old failures re-open it
+            self.errors = RollingStats()
+        self.state = CLOSED
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give up a claimed half-open trial without a verdict (the call was cancelled)"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.errors.record(1)
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+
+        error_rate = self.error_rate()
+        if self.state == HALF_OPEN or self.consecutive_failures >= PROVIDER_FAILURE_THRESHOLD or (
+            error_rate is not None and error_rate >= PROVIDER_MAX_ERROR_RATE
+        ):
+            if self.state != OPEN:
+                logger.warning(
+                    f"Opening circuit for provider {self.name} "
+                    f"({self.consecutive_failures} consecutive failures, error rate {error_rate})"
+                )
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "p95_ms": self.latency.percentile(95),
+            "error_rate": self.error_rate(),
+            "consecutive_failures": self.consecutive_failures,
+            "degraded": self.degraded()
+        }
+
+
+class ProviderRouter:
+    """Tries providers in health order until one produces an image"""
+
+    def __init__(self, order: List[str]):
+        unknown = [name for name in order if name not in PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unknown image providers: {unknown}")
+        self.order = order
+        self.health = {name: ProviderHealth(name) for name in order}
+
+    def ranked(self) -> List[str]:
+        """Configured order, healthy providers first and degraded ones after"""
+        return sorted(self.order, key=lambda name: self.health[name].degraded())
+
+    def preferred(self) -> str:
+        """The provider the next call would most likely use (doesn't claim a trial)"""
+        for name in self.ranked():
+            if self.health[name].state != OPEN:
+                return name
+        return self.order[0]
+
+    async def generate(self, reference_image_path: str, output_path: str, hedge: bool = False) -> Tuple[str, str]:
+        """
+        Generate an image with the first provider that succeeds
+
+        Providers with an open circuit are only tried once every other
+        provider has failed.
+
+        Args:
+            reference_image_path: Path to source/reference image
+            output_path: Path to save generated image
+            hedge: Whether the job may hedge slow model calls
+
+        Returns:
+            Tuple of (output path, provider name)
+
+        Raises:
+            Exception: The last provider error if every provider failed
+        """
+        deferred = []
+        last_error: Optional[Exception] = None
+
+        for name in self.ranked():
+            # Checked just before the call, so a claimed half-open trial always runs
+            if not self.health[name].available():
+                deferred.append(name)
+                continue
+            try:
+                return await self._attempt(name, reference_image_path, output_path, hedge), name
+            except Exception as e:
+                last_error = e
+
+        # Last resort: providers whose circuit is open
+        for name in deferred:
+            try:
+                return await self._attempt(name, reference_image_path, output_path, hedge), name
+            except Exception as e:
+                last_error = e
+
+        raise last_error or RuntimeError("No image providers configured")
+
+    async def _attempt(self, name: str, reference_image_path: str, output_path: str, hedge: bool) -> str:
+        generator, _ = PROVIDERS[name]
+        health = self.health[name]
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(generator(reference_image_path, output_path, hedge=hedge), PROVIDER_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            # A lost hedge/speculative race or a job handed back says nothing
+            # about the provider, but a half-open trial must not stay claimed
+            health.release_trial()
+            raise
+        except Exception as e:
+            health.record_failure()
+            reason = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.warning(f"Provider {name} failed ({reason})")
+            raise
+
+        health.record_success((time.perf_counter() - start) * 1000)
+        if name != self.order[0]:
+            logger.info(f"Generated with fallback provider {name}")
+        return output_path
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider health for /metrics"""
+        return {name: health.snapshot() for name, health in self.health.items()}
+
+
+provider_router = ProviderRouter(PROVIDER_ORDER)
+
+
+def provider_model(name: str) -> str:
+    """Model name recorded in job metadata for a provider"""
+    return PROVIDERS[name][1]
@@ -0,0 +1,133 @@
+"""
+Output quality checks for generated sprites
+
+A good avatar is one full-body character: a single large figure, taller than
+it is wide, that covers a reasonable share of the image and doesn't run off
+its edge. The common failures are character sheets (several large figures),
+cropped bodies, and empty or near-empty outputs.
+"""
+from PIL import Image
+from typing import Any, Dict, List, Optional
+import asyncio
+import numpy as np
+
+from config import (
+    QUALITY_CHECK_MAX_SIDE,
+    QUALITY_LARGE_COMPONENT_RATIO,
+    QUALITY_MIN_COVERAGE,
+    QUALITY_MAX_COVERAGE,
+    QUALITY_MIN_MAIN_FRACTION,
+    QUALITY_MIN_ASPECT,
+    QUALITY_MAX_ASPECT
+)
+from utils.components import Components, label_components
+
+# Border colour distance above which an opaque pixel counts as foreground
+_BACKGROUND_TOLERANCE = 40
+
+
+def foreground_mask(img: Image.Image) -> np.ndarray:
+    """
+    Boolean foreground mask
+
+    Uses the alpha channel when the image has transparency. Opaque images
+    (the model ignored "transparent background") are split against the
+    median border colour instead of running rembg, which keeps this cheap.
+    """
+    if img.mode == 'RGBA' and img.getchannel('A').getextrema()[0] < 255:
+        return np.array(img.getchannel('A')) > 128
+
+    arr = np.asarray(img.convert('RGB'), dtype=np.int16)
+    border = np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])
+    background = np.median(border, axis=0)
+    return np.abs(arr - background).max(axis=2) > _BACKGROUND_TOLERANCE
+
+
+def sprite_stats(mask: np.ndarray, components: Optional[Components] = None) -> Dict[str, Any]:
+    """
+    Component statistics of a foreground mask
+
+    Pass `components` from an earlier label_components(mask) to skip
+    labelling again.
+
+    Returns:
+        components: Number of connected components
+        large_components: Components at least QUALITY_LARGE_COMPONENT_RATIO
+            of the largest one (extra characters, not stray pixels)
+        coverage: Foreground share of the image
+        main_fraction: Largest component's share of the image
+        aspect: Height / width of the largest component's bounding box
+        touches_edge: Largest component reaches the image border
+    """
+    height, width = mask.shape
+    if components is None:
+        components = label_components(mask)
+
+    if components.count == 0:
+        return {
+            "components": 0,
+            "large_components": 0,
+            "coverage": 0.0,
+            "main_fraction": 0.0,
+            "aspect": None,
+            "touches_edge": False
+        }
+
+    sizes = components.areas
+    largest_idx = int(np.argmax(sizes))
+    y_min, y_max, x_min, x_max = (int(v) for v in components.boxes[largest_idx])
+
+    return {
+        "components": int(components.count),
+        "large_components": int(np.sum(sizes >= sizes[largest_idx] * QUALITY_LARGE_COMPONENT_RATIO)),
+        "coverage": round(float(mask.sum()) / mask.size, 4),
+        "main_fraction": round(float(sizes[largest_idx]) / mask.size, 4),
+        "aspect": round((y_max - y_min) / (x_max - x_min), 2),
+        "touches_edge": y_min == 0 or x_min == 0 or y_max == height or x_max == width
+    }
+
+
+def quality_verdict(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Judge sprite statistics
+
+    Returns:
+        {"ok": bool, "reasons": [...]} - reasons name each failed check
+    """
+    reasons: List[str] = []
+
+    if stats["coverage"] < QUALITY_MIN_COVERAGE:
+        reasons.append("near_empty")
+    else:
+        if stats["large_components"] > 1:
+            reasons.append("multiple_characters")
+        if stats["main_fraction"] < QUALITY_MIN_MAIN_FRACTION:
+            reasons.append("tiny_character")
+        if stats["touches_edge"]:
+            reasons.append("cropped_at_edge")
+        if stats["coverage"] > QUALITY_MAX_COVERAGE:
+            reasons.append("no_background")
+        if stats["aspect"] is not None and not QUALITY_MIN_ASPECT <= stats["aspect"] <= QUALITY_MAX_ASPECT:
+            reasons.append("unexpected_aspect")
+
+    return {"ok": not reasons, "reasons": reasons}
+
+
+def _quick_check(image_path: str) -> Dict[str, Any]:
+    img = Image.open(image_path)
+    img.thumbnail((QUALITY_CHECK_MAX_SIDE, QUALITY_CHECK_MAX_SIDE), Image.Resampling.NEAREST)
+    stats = sprite_stats(foreground_mask(img))
+    return {**stats, **quality_verdict(stats)}
+
+
+async def quick_check(image_path: str) -> Dict[str, Any]:
+    """
+    Fast quality check of a generated image (downscaled, no rembg)
+
+    Args:
+        image_path: Path to a generated image
+
+    Returns:
+        sprite_stats() fields plus the verdict's "ok" and "reasons"
+    """
+    return await asyncio.to_thread(_quick_check, image_path)
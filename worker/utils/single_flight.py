@@ -0,0 +1,189 @@
+"""
+Single-flight generation for identical inputs
+
+A double-submitted or retried /api/generate uploads the same photo twice,
+and both jobs would pay for their own model calls. Jobs are keyed by the
+SHA-256 of the input photo: the first job with a key generates (the leader),
+and jobs with the same key that arrive while it is still generating wait
+for it and reuse its isolated avatar. Only generation and isolation are
+shared; each job still does its own snapping, watermark, renditions and
+uploads.
+
+Nothing is reused once the leader has finished: this is not a result cache.
+A job that arrives afterwards generates afresh, even for the same photo, so
+a user who re-submits a photo to get a different avatar gets one.
+
+Duplicates on the same instance wait on an in-process future. Across
+instances, the leader holds a Firestore lease (SINGLE_FLIGHT_SHARED); when it
+finishes it copies the isolated image to the upload bucket and marks the
+lease done, and the jobs already waiting on it download it within
+SINGLE_FLIGHT_HANDOFF_SECONDS. New jobs ignore done leases. If the leader
+fails or its lease expires, a waiting job generates itself, and a broken
+lease backend never blocks generation.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import shutil
+
+from config import (
+    GCS_UPLOAD_BUCKET,
+    SINGLE_FLIGHT_SHARED,
+    SINGLE_FLIGHT_LEASE_SECONDS,
+    SINGLE_FLIGHT_HANDOFF_SECONDS,
+    SINGLE_FLIGHT_POLL_SECONDS
+)
+from utils.firestore import (
+    acquire_inflight_lease,
+    get_inflight_lease,
+    complete_inflight_lease,
+    release_inflight_lease
+)
+from utils.gcs import download_from_gcs, upload_to_gcs
+
+logger = logging.getLogger(__name__)
+
+# Shared result: {"path": isolated image, "provider": ..., "quality": ..., "speculation": ...}
+SharedResult = Dict[str, Any]
+
+
+class SingleFlight:
+    """Coalesces concurrent generations of the same input"""
+
+    def __init__(self, shared: bool = SINGLE_FLIGHT_SHARED):
+        self.shared = shared
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def run(
+        self,
+        key: str,
+        job_id: str,
+        output_path: str,
+        generate: Callable[[], Awaitable[SharedResult]]
+    ) -> Tuple[SharedResult, Optional[str]]:
+        """
+        Generate for an input, or reuse a concurrent job's result
+
+        Args:
+            key: Input content hash
+            job_id: Job asking
+            output_path: Where a reused image is copied to
+            generate: Produces this job's own result
+
+        Returns:
+            Tuple of (result, leader job ID or None if this job generated it)
+        """
+        while key in self._inflight:
+            leader_job_id, future = self._inflight[key]
+            logger.info(f"🔗 Job {job_id} waiting on in-flight job {leader_job_id} with the same input")
+            try:
+                result = await asyncio.shield(future)
+            except Exception:
+                # The leader failed; generate ourselves (or wait on whoever took over)
+                continue
+            if result["leader_job_id"]:
+                leader_job_id = result["leader_job_id"]
+            return await self._adopt(result, output_path), leader_job_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (job_id, future)
+        try:
+            result, leader_job_id = await self._lead_or_follow(key, job_id, output_path, generate)
+            future.set_result({**result, "leader_job_id": leader_job_id})
+            return result, leader_job_id
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                # Only the leader was cancelled; waiting jobs should take over, not be cancelled too
+                e = RuntimeError(f"Job {job_id} was cancelled")
+            future.set_exception(e)
+            future.exception()  # Nobody may be waiting; don't log it as unretrieved
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _adopt(self, result: SharedResult, output_path: str) -> SharedResult:
+        """Copy a same-instance leader's image, so later steps don't touch its files"""
+        await asyncio.to_thread(shutil.copyfile, result["path"], output_path)
+        adopted = {name: value for name, value in result.items() if name != "leader_job_id"}
+        return {**adopted, "path": output_path}
+
+    async def _lead_or_follow(
+        self,
+        key: str,
+        job_id: str,
+        output_path: str,
+        generate: Callable[[], Awaitable[SharedResult]]
+    ) -> Tuple[SharedResult, Optional[str]]:
+        if not self.shared:
+            return await generate(), None
+
+        while True:
+            try:
+                lease = await acquire_inflight_lease(key, job_id, SINGLE_FLIGHT_LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Single-flight lease unavailable, generating without it: {str(e)}")
+                return await generate(), None
+
+            if lease["owner_job_id"] == job_id:
+                return await self._lead(key, job_id, generate), None
+
+            leader_job_id = lease["owner_job_id"]
+            logger.info(f"🔗 Job {job_id} waiting on job {leader_job_id} (another instance) with the same input")
+            lease = await self._wait(key, leader_job_id)
+
+            if lease is not None:
+                try:
+                    return await self._fetch(lease["result"], output_path), leader_job_id
+                except Exception as e:
+                    logger.warning(f"Couldn't fetch job {leader_job_id}'s result, generating: {str(e)}")
+                    return await generate(), None
+            # The leader failed or its lease expired; take over (or wait on whoever did)
+
+    async def _wait(self, key: str, leader_job_id: str) -> Optional[Dict[str, Any]]:
+        """Poll a running lease; its done lease, or None if the leader gave it up"""
+        while True:
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+            try:
+                lease = await get_inflight_lease(key)
+            except Exception:
+                return None
+            if lease is None or lease["owner_job_id"] != leader_job_id:
+                return None
+            if lease["status"] == "done":
+                return lease
+
+    async def _lead(self, key: str, job_id: str, generate: Callable[[], Awaitable[SharedResult]]) -> SharedResult:
+        try:
+            result = await generate()
+        except BaseException:
+            # Failed or cancelled: let waiting jobs on other instances take over now
+            try:
+                await release_inflight_lease(key, job_id)
+            except Exception:
+                pass  # The lease expires on its own
+            raise
+
+        # Publish for jobs on other instances; they generate themselves if this fails
+        try:
+            blob_name = f"inflight/{key}_{job_id}.png"
+            await upload_to_gcs(result["path"], GCS_UPLOAD_BUCKET, blob_name)
+            shared = {name: value for name, value in result.items() if name != "path"}
+            if not await complete_inflight_lease(key, job_id, {**shared, "blob": blob_name}, SINGLE_FLIGHT_HANDOFF_SECONDS):
+                logger.info(f"Job {job_id}'s lease was taken over; its result isn't shared")
+        except Exception as e:
+            logger.warning(f"Couldn't publish job {job_id}'s result for duplicates: {str(e)}")
+            try:
+                await release_inflight_lease(key, job_id)
+            except Exception:
+                pass
+
+        return result
+
+    async def _fetch(self, shared: Dict[str, Any], output_path: str) -> SharedResult:
+        """Download another instance's published result"""
+        await download_from_gcs(GCS_UPLOAD_BUCKET, shared["blob"], output_path)
+        fetched = {name: value for name, value in shared.items() if name != "blob"}
+        return {**fetched, "path": output_path}
+
+
+single_flight = SingleFlight()
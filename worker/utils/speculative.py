@@ -0,0 +1,132 @@
+"""
+Speculative generation for paid jobs
+
+Generates several candidates at once, quick-checks each one as it lands
+(see utils/quality.py) and keeps the first good one. A bad output (character
+sheet, cropped body) then costs at most a few extra model calls instead of a
+user regeneration and another ~30s wait.
+
+Cancelling a losing candidate stops waiting on it. A request already sent to
+the model may still be billed.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from config import SPECULATIVE_MAX_CANDIDATES, SPECULATIVE_MODE
+from utils.ai import generate_pixel_art_with_gpt_reference, generate_pixel_art_candidates_with_gpt_reference
+from utils.quality import quick_check
+
+logger = logging.getLogger(__name__)
+
+
+def candidate_paths(output_path: str, candidates: int) -> List[str]:
+    """Per-candidate paths derived from the pipeline's *_pixel.png path"""
+    return [output_path.replace("_pixel", f"_c{i}_pixel") for i in range(candidates)]
+
+
+async def _generate_and_check(reference_image_path: str, output_path: str) -> Dict[str, Any]:
+    await generate_pixel_art_with_gpt_reference(reference_image_path, output_path)
+    return await quick_check(output_path)
+
+
+def _summary(check: Dict[str, Any], index: int) -> Dict[str, Any]:
+    return {"candidate": index, "ok": check["ok"], "reasons": check["reasons"]}
+
+
+async def _first_good_parallel(reference_image_path: str, paths: List[str]) -> Tuple[Optional[int], List[Dict[str, Any]], List[Exception]]:
+    """K separate calls; stop at the first candidate that passes"""
+    tasks = [asyncio.create_task(_generate_and_check(reference_image_path, path)) for path in paths]
+    pending = set(tasks)
+    selected = None
+    checks, errors = [], []
+
+    try:
+        while pending and selected is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = tasks.index(task)
+                try:
+                    check = task.result()
+                except Exception as e:
+                    logger.warning(f"Candidate {index} failed: {str(e)}")
+                    errors.append(e)
+                    continue
+
+                checks.append(_summary(check, index))
+                if check["ok"] and selected is None:
+                    selected = index
+
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return selected, checks, errors
+
+
+async def _first_good_batch(reference_image_path: str, paths: List[str]) -> Tuple[Optional[int], List[Dict[str, Any]], List[Exception]]:
+    """One call with n=K; every candidate arrives together"""
+    generated = await generate_pixel_art_candidates_with_gpt_reference(reference_image_path, paths)
+    results = await asyncio.gather(*(quick_check(path) for path in generated))
+
+    checks = [_summary(check, index) for index, check in enumerate(results)]
+    selected = next((c["candidate"] for c in checks if c["ok"]), None)
+    return selected, checks, []
+
+
+async def generate_first_good(
+    reference_image_path: str,
+    output_path: str,
+    candidates: int,
+    mode: str = SPECULATIVE_MODE
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Generate up to `candidates` images and keep the first that passes the quick check
+
+    If none passes, the first candidate that finished is used so the job
+    still completes (and the regular quality handling applies).
+
+    Args:
+        reference_image_path: Path to source/reference image
+        output_path: Pipeline's pixel art path (candidates are saved next to it)
+        candidates: Number of candidates (capped at SPECULATIVE_MAX_CANDIDATES)
+        mode: "parallel" (separate calls) or "batch" (one call with n > 1)
+
+    Returns:
+        Tuple of (selected candidate path, speculation metadata)
+
+    Raises:
+        Exception: The last model error if every candidate failed
+    """
+    candidates = max(1, min(candidates, SPECULATIVE_MAX_CANDIDATES))
+    paths = candidate_paths(output_path, candidates)
+
+    logger.info(f"Generating {candidates} candidates ({mode})")
+
+    if mode == "batch":
+        selected, checks, errors = await _first_good_batch(reference_image_path, paths)
+    else:
+        selected, checks, errors = await _first_good_parallel(reference_image_path, paths)
+
+    if not checks:
+        raise errors[-1] if errors else RuntimeError("Model returned no candidates")
+
+    selected_ok = selected is not None
+    if not selected_ok:
+        selected = checks[0]["candidate"]
+        logger.warning(f"No candidate passed the quality check, using candidate {selected}: {checks[0]['reasons']}")
+    else:
+        logger.info(f"Selected candidate {selected} after {len(checks)} checked")
+
+    metadata = {
+        "mode": mode,
+        "candidates": candidates,
+        "checked": len(checks),
+        "failed": len(errors),
+        "selected": selected,
+        "selected_ok": selected_ok,
+        "checks": checks
+    }
+
+    return paths[selected], metadata
@@ -0,0 +1,90 @@
+"""
+Cold-start profiling
+
+Records how long each third-party package takes to import (exclusive of
+other packages it pulls in) and how long each initialization step takes, then
+logs the slowest. Kept free of worker imports (config validates API keys at
+import) so main.py can load it first and profile everything after it.
+"""
+from contextlib import contextmanager
+from typing import Dict, List
+import builtins
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Imports faster than this are left out of the summary
+MIN_LOGGED_IMPORT_MS = 10
+
+
+class StartupProfiler:
+    """Per-package import time and per-step init time (ms)"""
+
+    def __init__(self):
+        self.imports: Dict[str, float] = {}
+        self.steps: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        """Time an initialization step (model load, client creation)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round((time.perf_counter() - start) * 1000, 1)
+            logger.info(f"⏱️  {name}: {self.steps[name]}ms")
+
+    @contextmanager
+    def profile_imports(self):
+        """
+        Attribute import time to top-level packages while the block runs
+
+        A package's time excludes the first imports of other packages it
+        triggers, so "rembg" doesn't also count "onnxruntime".
+        """
+        original_import = builtins.__import__
+        stack: List[List[float]] = []  # [start, time spent in nested packages]
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            package = name.partition(".")[0]
+            if level != 0 or package in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+
+            frame = [time.perf_counter(), 0.0]
+            stack.append(frame)
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                stack.pop()
+                elapsed = (time.perf_counter() - frame[0]) * 1000
+                self.imports[package] = self.imports.get(package, 0.0) + elapsed - frame[1]
+                if stack:
+                    stack[-1][1] += elapsed
+
+        builtins.__import__ = timed_import
+        try:
+            with self.step("imports"):
+                yield
+        finally:
+            builtins.__import__ = original_import
+
+    def log_summary(self) -> None:
+        """Log the slowest imports and every init step"""
+        slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+        logged = ", ".join(f"{name} {ms:.0f}ms" for name, ms in slowest if ms >= MIN_LOGGED_IMPORT_MS)
+        logger.info(f"⏱️  Slowest imports: {logged or 'none'}")
+        logger.info(f"⏱️  Startup steps: {self.steps}")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Import and step timings for /metrics"""
+        return {
+            "imports_ms": {
+                name: round(ms, 1) for name, ms in self.imports.items() if ms >= MIN_LOGGED_IMPORT_MS
+            },
+            "steps_ms": dict(self.steps)
+        }
+
+
+startup_profiler = StartupProfiler()